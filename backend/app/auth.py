@@ -3,10 +3,12 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import settings
 from app.database import get_database
 from app.models import UserResponse, UserRole
+from app.cache import document_cache
 from bson import ObjectId
 import logging
 
@@ -67,8 +69,8 @@ async def authenticate_user(email: str, password: str):
         return False
     return user
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user"""
+async def get_user_from_token(token: str) -> UserResponse:
+    """Resolve a JWT access token to its user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -76,18 +78,30 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     )
     
     try:
-        payload = jwt.decode(credentials.credentials, settings.secret_key, algorithms=[settings.algorithm])
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
+    # Every authenticated request resolves its user; serve repeat lookups from the document cache
+    cached = document_cache.get("users", user_id)
+    if cached is not None:
+        return UserResponse.model_validate_json(cached.body)
+    
+    generation = document_cache.generation()
     user = await get_user_by_id(user_id)
     if user is None:
         raise credentials_exception
     
-    return UserResponse(**user)
+    user = UserResponse(**user)
+    document_cache.put("users", user_id, user.model_dump_json(by_alias=True).encode("utf-8"), generation)
+    return user
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get current authenticated user"""
+    return await get_user_from_token(credentials.credentials)
 
 async def get_current_admin_user(current_user: UserResponse = Depends(get_current_user)):
     """Get current authenticated admin user"""
@@ -102,19 +116,27 @@ async def create_admin_user():
     """Create default admin user if it doesn't exist"""
     try:
         db = get_database()
-        admin_exists = await db.users.find_one({"email": settings.admin_email})
+        admin_exists = await db.users.find_one({"email": settings.admin_email}, {"_id": 1})
         
         if not admin_exists:
+            # Prefer a pre-computed hash; otherwise hash off the event loop
+            password_hash = settings.admin_password_hash or await run_in_threadpool(get_password_hash, settings.admin_password)
             admin_user = {
                 "email": settings.admin_email,
-                "password": get_password_hash(settings.admin_password),
+                "password": password_hash,
                 "full_name": "System Administrator",
                 "role": UserRole.ADMIN,
                 "is_active": True,
                 "created_at": datetime.utcnow()
             }
-            await db.users.insert_one(admin_user)
-            logger.info(f"Created admin user: {settings.admin_email}")
+            # Upsert so that several workers starting at once create a single admin
+            result = await db.users.update_one(
+                {"email": settings.admin_email},
+                {"$setOnInsert": admin_user},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                logger.info(f"Created admin user: {settings.admin_email}")
         else:
             logger.info("Admin user already exists")
             
@@ -0,0 +1,117 @@
+"""
+Read-through cache of single documents, keyed by collection and ID.
+
+Entries hold the response JSON already serialized, so a hit skips both the
+``find_one`` and building the Pydantic model. The cache is per worker and
+bounded (LRU eviction). Write handlers invalidate the entries they touch; when
+MongoDB change streams are available, the live-updates watcher invalidates
+entries written by other workers too. Without change streams, other workers'
+writes can be served stale for at most ``DOCUMENT_CACHE_TTL_SECONDS``.
+
+Hits and misses are counted per collection in the metrics registry
+(``cache.<collection>.hit`` / ``.miss``); ``stats()`` adds the hit ratios.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Type
+
+from bson import ObjectId
+from pydantic import BaseModel
+
+from app.config import settings
+from app.metrics import metrics
+from app.reference import reference_data
+
+
+class CachedDocument:
+    __slots__ = ("body", "version", "expires_at")
+
+    def __init__(self, body: bytes, version: Optional[int], expires_at: float):
+        self.body = body
+        self.version = version
+        self.expires_at = expires_at
+
+
+class DocumentCache:
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], CachedDocument]" = OrderedDict()
+        self._generation = 0
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def generation(self) -> int:
+        """Take before reading from the database and pass to ``put``"""
+        return self._generation
+
+    def get(self, collection: str, document_id: str) -> Optional[CachedDocument]:
+        if not self.enabled:
+            return None
+        key = (collection, str(document_id))
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses[collection] = self.misses.get(collection, 0) + 1
+            metrics.incr(f"cache.{collection}.miss")
+            return None
+        self._entries.move_to_end(key)
+        self.hits[collection] = self.hits.get(collection, 0) + 1
+        metrics.incr(f"cache.{collection}.hit")
+        return entry
+
+    def put(self, collection: str, document_id: str, body: bytes, generation: int, version: Optional[int] = None):
+        # A write invalidated something while this document was being read; it may be stale, so don't keep it
+        if not self.enabled or generation != self._generation:
+            return
+        key = (collection, str(document_id))
+        self._entries[key] = CachedDocument(body, version, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, collection: str, document_id: str):
+        self._generation += 1
+        self._entries.pop((collection, str(document_id)), None)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        collections = {}
+        for collection in sorted(set(self.hits) | set(self.misses)):
+            hits, misses = self.hits.get(collection, 0), self.misses.get(collection, 0)
+            collections[collection] = {"hits": hits, "misses": misses, "hit_ratio": round(hits / (hits + misses), 3)}
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "collections": collections}
+
+
+async def cached_document(db, collection: str, document_id: str, model: Type[BaseModel]) -> Optional[CachedDocument]:
+    """The document's response JSON, from the cache or read through from the database (None if it doesn't exist)"""
+    entry = document_cache.get(collection, document_id)
+    if entry is not None:
+        return entry
+    return await load_document(db, collection, document_id, model)
+
+
+async def load_document(db, collection: str, document_id: str, model: Type[BaseModel]) -> Optional[CachedDocument]:
+    """Read the document, serialize it and fill the cache (after ``document_cache.get`` missed)"""
+    generation = document_cache.generation()
+    document = await db[collection].find_one({"_id": ObjectId(document_id)})
+    if document is None:
+        return None
+    await reference_data.expand(db, [document])
+    # Same JSON FastAPI would produce for response_model=model
+    body = model(**document).model_dump_json(by_alias=True).encode("utf-8")
+    version = document.get("version")
+    document_cache.put(collection, document_id, body, generation, version)
+    return CachedDocument(body, version, 0)
+
+
+document_cache = DocumentCache(settings.document_cache_size, settings.document_cache_ttl_seconds)
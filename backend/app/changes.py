@@ -0,0 +1,120 @@
+"""
+Incremental change feed for the directory collections.
+
+Clients keep a local copy current by polling ``/changes?since=<token>``. The
+feed walks documents in ``(updated_at, _id)`` order (indexed), merged with
+tombstones that the delete handlers write to the ``tombstones`` collection.
+The token is an opaque encoding of the last ``(updated_at, _id)`` a client
+has seen; the next page starts strictly after it.
+
+Writes stamp ``updated_at`` on the app server before they commit, so the
+newest ``CHANGE_FEED_LAG_MS`` are held back until concurrent writes with
+slightly older timestamps have landed. Tombstones expire after
+``CHANGE_FEED_RETENTION_DAYS``; a token older than that must resync.
+"""
+import base64
+import heapq
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.config import settings
+from app.reference import reference_data
+
+# Sorts after every real ObjectId, so a token at (time, MAX_OBJECT_ID) excludes everything up to `time`
+MAX_OBJECT_ID = ObjectId("f" * 24)
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(ValueError):
+    pass
+
+
+def encode_token(updated_at: datetime, object_id: ObjectId) -> str:
+    payload = json.dumps({"t": updated_at.isoformat(), "i": str(object_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _to_millis(moment: datetime) -> datetime:
+    # BSON dates have millisecond precision
+    return moment.replace(microsecond=moment.microsecond // 1000 * 1000)
+
+
+def token_at(moment: datetime) -> str:
+    """Token covering everything up to ``moment``, e.g. for a snapshot built at that time"""
+    return encode_token(_to_millis(moment), MAX_OBJECT_ID)
+
+
+def decode_token(token: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), ObjectId(payload["i"])
+    except Exception:
+        raise InvalidToken("Invalid change token")
+
+
+def _after(position: Optional[Tuple[datetime, ObjectId]]) -> dict:
+    """Filter for everything strictly after ``position`` in (updated_at, _id) order"""
+    if position is None:
+        return {}
+    updated_at, object_id = position
+    return {"$or": [
+        {"updated_at": {"$gt": updated_at}},
+        {"updated_at": updated_at, "_id": {"$gt": object_id}},
+    ]}
+
+
+async def record_tombstone(db, collection: str, document_id: ObjectId):
+    """Called by delete handlers so feed clients learn about the delete"""
+    await db.tombstones.insert_one({
+        "collection": collection,
+        "document_id": document_id,
+        "updated_at": datetime.utcnow(),
+    })
+
+
+async def fetch_changes(db, collection: str, since: Optional[str] = None, limit: int = 500) -> dict:
+    """One page of upserts and deletes after ``since``, with the token for the next page"""
+    position = decode_token(since) if since else None
+    now = datetime.utcnow()
+    if position and position[0] < now - timedelta(days=settings.change_feed_retention_days):
+        raise ExpiredToken("Change token is older than the tombstone retention window; resync from scratch")
+
+    cutoff = _to_millis(now - timedelta(milliseconds=settings.change_feed_lag_ms))
+    horizon = {"updated_at": {"$lte": cutoff}}
+    sort = [("updated_at", 1), ("_id", 1)]
+
+    documents = await db[collection].find({"$and": [_after(position), horizon]}).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    tombstones = await db.tombstones.find(
+        {"$and": [{"collection": collection}, _after(position), horizon]}
+    ).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+
+    # Both lists are sorted and past the token, so taking the first `limit` of the merge is a consistent page
+    tagged = [(doc["updated_at"], doc["_id"], "upsert", doc) for doc in documents]
+    tagged_deletes = [(stone["updated_at"], stone["_id"], "delete", stone) for stone in tombstones]
+    merged: List[tuple] = list(heapq.merge(tagged, tagged_deletes, key=lambda item: (item[0], item[1])))
+    page, has_more = merged[:limit], len(merged) > limit
+
+    upserts, deletes = [], []
+    for _, _, kind, doc in page:
+        if kind == "upsert":
+            doc["_id"] = str(doc["_id"])
+            upserts.append(doc)
+        else:
+            deletes.append(str(doc["document_id"]))
+    await reference_data.expand(db, upserts)
+
+    if has_more:
+        last_updated_at, last_id, _, _ = page[-1]
+        next_token = encode_token(last_updated_at, last_id)
+    else:
+        # Caught up: everything up to the cutoff has been seen, which also keeps idle tokens from expiring
+        next_token = token_at(cutoff)
+
+    return {"upserts": upserts, "deletes": deletes, "next_token": next_token, "has_more": has_more}
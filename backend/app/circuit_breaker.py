@@ -0,0 +1,78 @@
+"""
+Circuit breaker and latency tracking for calls to remote services.
+
+A breaker opens after ``failure_threshold`` consecutive failures so callers
+fail fast instead of waiting for timeouts, then half-opens after
+``recovery_timeout`` seconds and lets a limited number of probe requests
+through. A successful probe closes it again; a failed one re-opens it.
+"""
+import math
+import time
+from collections import deque
+from typing import Callable, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go out now; half-open probes are counted when allowed"""
+        if self.state == OPEN:
+            if self.clock() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_max_calls:
+                return False
+            self.probes_in_flight += 1
+
+        return True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.probes_in_flight = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = self.clock()
+            self.probes_in_flight = 0
+
+    def release(self):
+        """Give back a half-open probe slot for a call that was cancelled before finishing"""
+        if self.state == HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies (seconds)"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        if len(self.samples) < max(min_samples, 1):
+            return None
+        ordered = sorted(self.samples)
+        rank = max(math.ceil(pct / 100.0 * len(ordered)), 1)
+        return ordered[min(rank, len(ordered)) - 1]
@@ -0,0 +1,251 @@
+"""
+Response compression (Brotli or gzip), negotiated per request.
+
+``CompressionMiddleware`` picks the encoding the client prefers from
+``Accept-Encoding``. Brotli is offered only when the ``brotli`` package is
+installed; gzip always is. Two kinds of response are sent as they are:
+
+- responses smaller than ``COMPRESSION_MINIMUM_SIZE``;
+- responses that are already encoded (the gzip snapshot), are not text-like
+  (PDFs, images), or are event streams, whose events must not be held back in
+  a compressor's buffer.
+
+A response sent in one piece is compressed in one piece and gets a new
+``Content-Length``. A ``StreamingResponse`` (CSV exports, job artifacts) is
+compressed chunk by chunk without being buffered.
+
+Public responses (``Cache-Control: public``, no ``Authorization`` on the
+request, no ``Set-Cookie``) are usually the same bytes for many requests. Their
+compressed form is kept in a per-worker LRU cache keyed by encoding and a
+digest of the body, bounded by ``COMPRESSION_CACHE_BYTES``. Because the
+compression is done once, it uses the highest Brotli/gzip setting. ETags are
+passed through unchanged, because ``If-Match`` on writes compares them with the
+entry version.
+"""
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml", "image/svg+xml",
+)
+# Held-back events would defeat the point of a stream
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+GZIP_MAX_LEVEL = 9
+BROTLI_MAX_QUALITY = 11
+
+
+def encodings() -> Tuple[str, ...]:
+    """Supported encodings in order of preference"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _weights(accept_encoding: str) -> Dict[str, float]:
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The supported encoding with the highest q-value in ``Accept-Encoding`` (Brotli on ties), or None"""
+    weights = _weights(accept_encoding)
+    best, best_weight = None, 0.0
+    for coding in encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def accepts(accept_encoding: str, coding: str) -> bool:
+    """Whether ``Accept-Encoding`` allows ``coding`` (by name or ``*``)"""
+    weights = _weights(accept_encoding)
+    return weights.get(coding, weights.get("*", 0.0)) > 0
+
+
+def compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if not media_type or media_type.startswith(UNCOMPRESSED_TYPES):
+        return False
+    return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith("+json")
+
+
+class _Compressor:
+    """Incremental compressor with one interface for gzip and Brotli"""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        if not data:
+            return b""
+        return self._brotli.process(data) if self._brotli is not None else self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli is not None else self._zlib.flush()
+
+
+class CompressedCache:
+    """LRU of compressed public bodies, keyed by encoding and body digest, bounded in bytes"""
+
+    def __init__(self, max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        compressed = self._entries.get(key)
+        if compressed is not None:
+            self._entries.move_to_end(key)
+        return compressed
+
+    def put(self, key: Tuple[str, bytes], compressed: bytes):
+        if len(compressed) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = compressed
+        self.size += len(compressed)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 cache_bytes: int = 0):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+        self.cache = CompressedCache(cache_bytes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        encoding = negotiate(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingSend(self, encoding, send, shareable="authorization" not in headers)
+        await self.app(scope, receive, responder)
+
+    def compress(self, body: bytes, encoding: str, shared: bool) -> bytes:
+        """A whole body, through the cache when ``shared``"""
+        if not (shared and self.cache.enabled):
+            compressor = _Compressor(encoding, self.levels[encoding])
+            return compressor.compress(body) + compressor.finish()
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self.cache.get(key)
+        if compressed is not None:
+            metrics.incr("compression.cache.hit")
+            return compressed
+        metrics.incr("compression.cache.miss")
+        compressor = _Compressor(encoding, BROTLI_MAX_QUALITY if encoding == "br" else GZIP_MAX_LEVEL)
+        compressed = compressor.compress(body) + compressor.finish()
+        self.cache.put(key, compressed)
+        return compressed
+
+
+class _CompressingSend:
+    """The ``send`` callable handed to the app; decides on the first body message"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send, shareable: bool):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.shareable = shareable
+        self.start = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    def _should_compress(self, status: int, headers: MutableHeaders, size: Optional[int]) -> bool:
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if "content-encoding" in headers or not compressible(headers.get("content-type", "")):
+            return False
+        if "no-transform" in headers.get("cache-control", "").lower():
+            return False
+        if size is None and "content-length" in headers:
+            size = int(headers["content-length"])
+        return size is None or size >= self.middleware.minimum_size
+
+    def _shared(self, headers: MutableHeaders) -> bool:
+        directives = {directive.strip().lower() for directive in headers.get("cache-control", "").split(",")}
+        return self.shareable and "public" in directives and "set-cookie" not in headers
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(scope=start)
+            if not self._should_compress(start["status"], headers, None if more_body else len(body)):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            metrics.incr(f"compression.{self.encoding}")
+            if not more_body:
+                compressed = self.middleware.compress(body, self.encoding, self._shared(headers))
+                headers["Content-Encoding"] = self.encoding
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            headers["Content-Encoding"] = self.encoding
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            self.compressor = _Compressor(self.encoding, self.middleware.levels[self.encoding])
+            await self.send(start)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
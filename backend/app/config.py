@@ -9,6 +9,14 @@ class Settings(BaseSettings):
     # Database
     mongodb_url: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     database_name: str = os.getenv("DATABASE_NAME", "arain_association")
+    mongo_max_pool_size: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    mongo_min_pool_size: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    mongo_max_idle_time_ms: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    mongo_server_selection_timeout_ms: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    mongo_compressors: str = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+    mongo_retry_writes: bool = os.getenv("MONGO_RETRY_WRITES", "True").lower() == "true"
+    # Route heavy read-only queries (stats, exports, listings) to secondaries on a replica set
+    mongo_read_from_secondaries: bool = os.getenv("MONGO_READ_FROM_SECONDARIES", "True").lower() == "true"
     
     # JWT
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -18,6 +26,27 @@ class Settings(BaseSettings):
     # OpenRouter API
     openrouter_api_key: str = os.getenv("OPENROUTER_API_KEY", "")
     ai_model: str = os.getenv("AI_MODEL", "anthropic/claude-3-haiku")
+    ai_fallback_models: str = os.getenv("AI_FALLBACK_MODELS", "")  # comma separated, tried in order after AI_MODEL
+    openrouter_base_url: str = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+    ai_request_timeout: float = float(os.getenv("AI_REQUEST_TIMEOUT", "10"))
+    ai_breaker_failure_threshold: int = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", "3"))
+    ai_breaker_recovery_seconds: float = float(os.getenv("AI_BREAKER_RECOVERY_SECONDS", "30"))
+    ai_breaker_half_open_calls: int = int(os.getenv("AI_BREAKER_HALF_OPEN_CALLS", "1"))
+    ai_hedge_enabled: bool = os.getenv("AI_HEDGE_ENABLED", "False").lower() == "true"
+    ai_hedge_percentile: float = float(os.getenv("AI_HEDGE_PERCENTILE", "95"))
+    ai_hedge_min_samples: int = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+    
+    # Local FAQ knowledge base
+    faq_answer_threshold: float = float(os.getenv("FAQ_ANSWER_THRESHOLD", "0.6"))  # answer directly above this cosine score
+    faq_answer_margin: float = float(os.getenv("FAQ_ANSWER_MARGIN", "0.1"))  # ...and this far ahead of the runner-up
+    faq_context_threshold: float = float(os.getenv("FAQ_CONTEXT_THRESHOLD", "0.2"))  # pass to the LLM as context above this
+    faq_top_k: int = int(os.getenv("FAQ_TOP_K", "3"))
+    faq_refresh_seconds: float = float(os.getenv("FAQ_REFRESH_SECONDS", "60"))
+    
+    @property
+    def ai_models(self) -> List[str]:
+        fallbacks = [model.strip() for model in self.ai_fallback_models.split(",") if model.strip()]
+        return [self.ai_model] + [model for model in fallbacks if model != self.ai_model]
     
     # Application
     app_name: str = os.getenv("APP_NAME", "Arain Association Youth Wing Pakistan")
@@ -26,6 +55,48 @@ class Settings(BaseSettings):
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
     
+    # Production server
+    web_concurrency: int = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = one worker per available CPU
+    preload_app: bool = os.getenv("PRELOAD_APP", "True").lower() == "true"
+    graceful_timeout: int = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+    keepalive_timeout: int = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+    
+    @property
+    def worker_count(self) -> int:
+        if self.web_concurrency > 0:
+            return self.web_concurrency
+        try:
+            # Respect CPU affinity / container cpusets where the platform exposes them
+            return max(len(os.sched_getaffinity(0)), 1)
+        except AttributeError:
+            return max(os.cpu_count() or 1, 1)
+    
+    # Response compression
+    compression_minimum_size: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))  # bytes; smaller responses go out as they are
+    compression_gzip_level: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    compression_brotli_quality: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))  # needs the brotli package
+    compression_cache_bytes: int = int(os.getenv("COMPRESSION_CACHE_BYTES", "16777216"))  # compressed public responses per worker; 0 disables
+
+    # Idempotency-Key on public create endpoints
+    idempotency_ttl_seconds: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))  # how long a key replays its response
+    idempotency_cache_size: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))  # recent responses per worker; 0 = Mongo only
+    idempotency_wait_seconds: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))  # a duplicate waits this long for the original, then 409
+
+    # Rate limiting (per client IP) and load shedding for public endpoints
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory (per worker) or mongo (shared)
+    rate_limit_chat_per_minute: int = int(os.getenv("RATE_LIMIT_CHAT_PER_MINUTE", "10"))  # 0 turns a limit off
+    rate_limit_login_per_minute: int = int(os.getenv("RATE_LIMIT_LOGIN_PER_MINUTE", "10"))
+    rate_limit_register_per_hour: int = int(os.getenv("RATE_LIMIT_REGISTER_PER_HOUR", "10"))
+    rate_limit_contact_per_hour: int = int(os.getenv("RATE_LIMIT_CONTACT_PER_HOUR", "20"))
+    rate_limit_directory_writes_per_hour: int = int(os.getenv("RATE_LIMIT_DIRECTORY_WRITES_PER_HOUR", "20"))
+    rate_limit_directory_reads_per_minute: int = int(os.getenv("RATE_LIMIT_DIRECTORY_READS_PER_MINUTE", "120"))
+    max_concurrent_requests: int = int(os.getenv("MAX_CONCURRENT_REQUESTS", "200"))  # per worker, before shedding; 0 = never shed
+
+    # Query profiler (only active when DEBUG is on)
+    query_profiler: bool = os.getenv("QUERY_PROFILER", "False").lower() == "true"
+    slow_query_ms: float = float(os.getenv("SLOW_QUERY_MS", "50"))
+    
     # CORS
     allowed_origins: str = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000")
     
@@ -40,7 +111,58 @@ class Settings(BaseSettings):
     # Admin
     admin_email: str = os.getenv("ADMIN_EMAIL", "admin@arainyouthwing.org")
     admin_password: str = os.getenv("ADMIN_PASSWORD", "admin123")
+    admin_password_hash: str = os.getenv("ADMIN_PASSWORD_HASH", "")  # bcrypt hash; skips hashing at startup
     
+    # Startup
+    warm_exports: bool = os.getenv("WARM_EXPORTS", "False").lower() == "true"
+
+    # Background jobs
+    jobs_enabled: bool = os.getenv("JOBS_ENABLED", "True").lower() == "true"
+    job_workers: int = int(os.getenv("JOB_WORKERS", "2"))  # concurrent jobs per server worker
+    job_process_workers: int = int(os.getenv("JOB_PROCESS_WORKERS", "1"))  # processes for CPU-heavy steps
+    job_lease_seconds: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    job_max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    job_poll_interval: float = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+    # Data migrations (app.migrations)
+    migrations_auto_run: bool = os.getenv("MIGRATIONS_AUTO_RUN", "True").lower() == "true"  # queue unfinished migrations after startup
+    migration_batch_size: int = int(os.getenv("MIGRATION_BATCH_SIZE", "500"))  # documents per bulk_write
+    migration_duty_cycle: float = float(os.getenv("MIGRATION_DUTY_CYCLE", "0.5"))  # share of time spent writing; pauses fill the rest
+
+    # Change feed
+    change_feed_lag_ms: int = int(os.getenv("CHANGE_FEED_LAG_MS", "1000"))  # hold back the newest writes this long
+    change_feed_retention_days: int = int(os.getenv("CHANGE_FEED_RETENTION_DAYS", "30"))  # tombstone lifetime
+
+    # Offline directory snapshot
+    snapshot_dir: str = os.getenv("SNAPSHOT_DIR", "snapshots")
+    snapshot_interval_seconds: float = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "900"))  # 0 = build on first request only
+
+    # Live admin dashboard
+    live_coalesce_ms: int = int(os.getenv("LIVE_COALESCE_MS", "250"))  # batch counter recomputes over this window
+    live_resync_seconds: float = float(os.getenv("LIVE_RESYNC_SECONDS", "30"))  # recount interval without change streams
+    live_ticket_seconds: float = float(os.getenv("LIVE_TICKET_SECONDS", "10"))  # how long a stream ticket can wait to be used
+
+    # Per-document read cache
+    document_cache_size: int = int(os.getenv("DOCUMENT_CACHE_SIZE", "5000"))  # entries per worker; 0 disables the cache
+    document_cache_ttl_seconds: float = float(os.getenv("DOCUMENT_CACHE_TTL_SECONDS", "60"))  # bounds staleness from other workers' writes
+
+    # Typeahead suggestions for city/district/profession/caste
+    suggest_reload_interval_seconds: float = float(os.getenv("SUGGEST_RELOAD_INTERVAL_SECONDS", "3600"))  # full reload; 0 = startup only
+    suggest_normalize_writes: bool = os.getenv("SUGGEST_NORMALIZE_WRITES", "True").lower() == "true"  # store known values in their usual spelling
+
+    # Listing facet counts (?facets=true)
+    facet_cache_size: int = int(os.getenv("FACET_CACHE_SIZE", "1000"))  # query shapes per worker; 0 disables the cache
+    facet_cache_ttl_seconds: float = float(os.getenv("FACET_CACHE_TTL_SECONDS", "60"))  # bounds staleness from other workers' writes
+
+    # Analytics rollup cube
+    rollup_rebuild_interval_seconds: float = float(os.getenv("ROLLUP_REBUILD_INTERVAL_SECONDS", "86400"))  # full rebuild; 0 = writes only
+
+    # Blood donor index
+    donor_index_rebuild_interval_seconds: float = float(os.getenv("DONOR_INDEX_REBUILD_INTERVAL_SECONDS", "86400"))  # full re-sync; 0 = writes only
+
+    # Registration time series
+    timeseries_backfill_interval_seconds: float = float(os.getenv("TIMESERIES_BACKFILL_INTERVAL_SECONDS", "604800"))  # full recount; 0 = writes only
+
     class Config:
         env_file = ".env"
 
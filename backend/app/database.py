@@ -1,31 +1,174 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReadPreference, monitoring
 from beanie import init_beanie
 from app.config import settings
+from app.profiler import wrap_database
+from app.metrics import metrics
+from app.knowledge_base import FAQ_INDEXES
+from app.rollup import CUBE_INDEXES
+from app.donors import DONOR_INDEXES
+from app.timeseries import BUCKET_INDEXES
+from app.reference import REFERENCE_INDEXES
+from app.idempotency import IDEMPOTENCY_INDEXES
+from app.ratelimit import RATE_LIMIT_INDEXES
+from app.events import LIVE_TICKET_INDEXES
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 class Database:
     client: AsyncIOMotorClient = None
     database = None
+    read_database = None  # same database with secondaryPreferred reads on a replica set
 
 database = Database()
 
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Records how long operations wait to check a connection out of the pool"""
+
+    def __init__(self):
+        self._started = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._started.at = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            started = getattr(self._started, "at", None)
+            duration = time.perf_counter() - started if started is not None else None
+        if duration is not None:
+            metrics.observe("mongo.pool_wait_ms", duration * 1000)
+
+    def connection_check_out_failed(self, event):
+        metrics.incr(f"mongo.pool_checkout_failed.{event.reason}")
+
+    def connection_created(self, event):
+        metrics.incr("mongo.connections_created")
+
+    def connection_closed(self, event):
+        metrics.incr("mongo.connections_closed")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        metrics.incr("mongo.pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+def client_options() -> dict:
+    """Pool, timeout and compression options for the Motor client, from Settings"""
+    options = {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+        "retryWrites": settings.mongo_retry_writes,
+        "event_listeners": [PoolWaitListener()],
+    }
+    if settings.mongo_max_idle_time_ms > 0:
+        options["maxIdleTimeMS"] = settings.mongo_max_idle_time_ms
+    if settings.mongo_compressors:
+        # Compressors the server or the installed libraries don't support are skipped by the driver
+        options["compressors"] = settings.mongo_compressors
+    return options
+
 async def connect_to_mongo():
-    """Create database connection"""
+    """Create database connection (the client connects lazily; see ping_database)"""
     try:
-        database.client = AsyncIOMotorClient(settings.mongodb_url)
+        database.client = AsyncIOMotorClient(settings.mongodb_url, **client_options())
         database.database = database.client[settings.database_name]
-        
-        # Test the connection
-        await database.client.admin.command('ping')
+        database.read_database = database.database
+        return database.database
+    except Exception as e:
+        logger.error(f"Could not connect to MongoDB: {e}")
+        raise
+
+async def ping_database():
+    """Test the connection and route heavy reads to secondaries when running against a replica set"""
+    try:
+        hello = await database.client.admin.command('hello')
         logger.info(f"Connected to MongoDB database: {settings.database_name}")
         
-        return database.database
+        if hello.get("setName") and settings.mongo_read_from_secondaries:
+            database.read_database = database.client.get_database(
+                settings.database_name,
+                read_preference=ReadPreference.SECONDARY_PREFERRED
+            )
+            logger.info(f"Replica set {hello['setName']} detected; heavy reads use secondaryPreferred")
     except Exception as e:
         logger.error(f"Could not connect to MongoDB: {e}")
         raise
 
+async def ensure_indexes():
+    """Create the indexes the routers' queries rely on (no-op when they already exist)"""
+    indexes = {
+        "directory": [
+            IndexModel([("city", ASCENDING)]),
+            IndexModel([("profession", ASCENDING)]),
+            IndexModel([("caste", ASCENDING)]),
+            IndexModel([("province", ASCENDING)]),
+            IndexModel([("membership_type", ASCENDING)]),
+            IndexModel([("created_at", DESCENDING)]),
+            IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("blood_group", ASCENDING), ("city", ASCENDING)]),
+        ],
+        "family_directory": [
+            IndexModel([("total_members", ASCENDING)]),
+            IndexModel([("membership_type", ASCENDING)]),
+            IndexModel([("caste", ASCENDING)]),
+            IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)]),
+            # Multikey: one index entry per member blood group
+            IndexModel([("family_members.blood_group", ASCENDING), ("city", ASCENDING)]),
+        ],
+        "tombstones": [
+            IndexModel([("collection", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=settings.change_feed_retention_days * 86400),
+        ],
+        "users": [
+            IndexModel([("email", ASCENDING)], unique=True),
+        ],
+        "contact_messages": [
+            IndexModel([("is_read", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel([("created_at", DESCENDING)]),
+        ],
+        "faq_entries": FAQ_INDEXES,
+        "conversations": [
+            IndexModel([("session_id", ASCENDING)]),
+            IndexModel([("timestamp", DESCENDING)]),
+        ],
+        "rollup_cube": CUBE_INDEXES,
+        "donors": DONOR_INDEXES,
+        "timeseries_buckets": BUCKET_INDEXES,
+        "reference_data": REFERENCE_INDEXES,
+        "idempotency_keys": IDEMPOTENCY_INDEXES,
+        "rate_limits": RATE_LIMIT_INDEXES,
+        "live_tickets": LIVE_TICKET_INDEXES,
+        "jobs": [
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+            IndexModel([("created_at", DESCENDING)]),
+        ],
+    }
+    db = database.database
+    for collection, models in indexes.items():
+        try:
+            await db[collection].create_indexes(models)
+        except Exception as e:
+            # An index that cannot be built (e.g. duplicate emails) must not block startup
+            logger.warning(f"Could not ensure indexes on {collection}: {e}")
+
 async def close_mongo_connection():
     """Close database connection"""
     try:
@@ -36,5 +179,12 @@ async def close_mongo_connection():
         logger.error(f"Error closing MongoDB connection: {e}")
 
 def get_database():
-    """Get database instance"""
-    return database.database
+    """Get database instance (wrapped by the query profiler when it is enabled)"""
+    return wrap_database(database.database)
+
+def get_read_database():
+    """Get database instance for heavy read-only queries (stats, exports, listings).
+
+    Reads may be served by a secondary, so results can lag the most recent writes slightly.
+    """
+    return wrap_database(database.read_database or database.database)
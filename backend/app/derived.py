@@ -0,0 +1,121 @@
+"""
+Data derived from directory and family entries: the analytics rollup cube
+(``app.rollup``) and the blood donor index (``app.donors``), plus the
+registration time-series buckets (``app.timeseries``), which are counted
+inline by the handlers but share the rebuild scheduling.
+
+Write handlers call ``derived_data.touch(source, id)`` after changing an
+entry; a background task then runs each refresher for that entry, so the write
+itself doesn't wait. Touches are de-duplicated while they wait.
+
+Each derived collection also has a rebuild job, queued every
+``*_REBUILD_INTERVAL_SECONDS``. The rebuild corrects drift from writes made
+outside the API or lost when a worker stops. Workers share one schedule
+document per job type in ``derived_schedules``; a worker queues the job only
+after moving that document's ``next_run_at`` forward itself, so all the
+workers starting at once still queue one rebuild. On first start there is no
+schedule document yet and the rebuild is queued right away.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Set, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from app import donors, rollup, timeseries
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+REFRESHERS = {"rollup cube": rollup.refresh, "donor index": donors.refresh}
+
+SCHEDULES = "derived_schedules"
+SCHEDULE_POLL_SECONDS = 60
+
+# job type -> rebuild interval
+REBUILDS = {
+    "rollup_rebuild": settings.rollup_rebuild_interval_seconds,
+    "donor_index_rebuild": settings.donor_index_rebuild_interval_seconds,
+    "timeseries_backfill": settings.timeseries_backfill_interval_seconds,
+}
+REBUILD_FUNCTIONS = {
+    "rollup_rebuild": rollup.rebuild,
+    "donor_index_rebuild": donors.rebuild,
+    "timeseries_backfill": timeseries.backfill,
+}
+
+
+class DerivedData:
+    def __init__(self):
+        self._db = None
+        self._pending: Set[Tuple[str, str]] = set()
+        self._changed: Optional[asyncio.Event] = None
+        self._tasks = []
+
+    def touch(self, source: str, document_id):
+        """Called by write handlers after a directory ("directory") or family ("family") entry changed"""
+        if self._changed is None:
+            return
+        self._pending.add((source, str(document_id)))
+        self._changed.set()
+
+    async def _refresh_loop(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            pending, self._pending = self._pending, set()
+            for source, document_id in pending:
+                for name, refresh in REFRESHERS.items():
+                    try:
+                        await refresh(self._db, source, document_id)
+                    except Exception as e:
+                        logger.warning(f"Could not refresh {name} for {source} {document_id}: {e}")
+
+    async def _claim(self, job_type: str, interval: float) -> bool:
+        """Move the job type's next run forward if it is due; True for the one worker that did"""
+        now = datetime.utcnow()
+        try:
+            # A schedule that isn't due fails the filter, and the upsert then collides with its _id
+            await self._db[SCHEDULES].find_one_and_update(
+                {"_id": job_type, "next_run_at": {"$lte": now}},
+                {"$set": {"next_run_at": now + timedelta(seconds=interval), "claimed_at": now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def _schedule_rebuilds(self, job_type: str, interval: float):
+        from app.jobs import job_runner, QUEUED, RUNNING
+        while True:
+            try:
+                if await self._claim(job_type, interval):
+                    if not settings.jobs_enabled:
+                        await REBUILD_FUNCTIONS[job_type](self._db)
+                    # One that an admin queued already does the job
+                    elif await self._db.jobs.find_one({"type": job_type, "status": {"$in": [QUEUED, RUNNING]}}) is None:
+                        await job_runner.submit(self._db, job_type, submitted_by="scheduler")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not schedule {job_type}: {e}")
+            await asyncio.sleep(min(interval, SCHEDULE_POLL_SECONDS))
+
+    def start(self, db):
+        self._db = db
+        self._changed = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._refresh_loop())]
+        for job_type, interval in REBUILDS.items():
+            if interval > 0:
+                self._tasks.append(asyncio.create_task(self._schedule_rebuilds(job_type, interval)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._changed = None
+
+
+derived_data = DerivedData()
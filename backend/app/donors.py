@@ -0,0 +1,201 @@
+"""
+Blood donor lookup across directory entries and family members.
+
+People with a blood group are copied into a flat ``donors`` collection, one
+document per person: a directory entry (``_id`` ``directory:<id>``) or a family
+member (``family:<family id>:<member id>``), with their contact details and
+lower-cased location keys. ``refresh`` re-syncs one source document after a
+write (run in the background by ``app.derived``); ``rebuild`` recomputes the
+whole collection next to the live one and renames it over it, as the rollup
+cube does. A refresh that lands while a rebuild runs is overwritten by the
+swap and redone by the entry's next write or the next rebuild.
+
+``find_donors`` searches location tiers in order (same city, same district,
+same province, anywhere). Within a tier it lists the exact blood group before
+other compatible groups, so O- stock is not suggested before it is needed.
+Every query is an indexed equality lookup that stops once ``limit`` donors are
+found, so it stays fast however large the directory grows.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+
+from app.reference import reference_data
+
+logger = logging.getLogger(__name__)
+
+DONORS = "donors"
+SOURCES = {"directory": "directory", "family": "family_directory"}
+REBUILD_BATCH_SIZE = 1000
+
+# recipient -> blood groups it can receive red cells from
+COMPATIBLE_DONORS: Dict[str, List[str]] = {
+    "O-": ["O-"],
+    "O+": ["O+", "O-"],
+    "A-": ["A-", "O-"],
+    "A+": ["A+", "A-", "O+", "O-"],
+    "B-": ["B-", "O-"],
+    "B+": ["B+", "B-", "O+", "O-"],
+    "AB-": ["AB-", "A-", "B-", "O-"],
+    "AB+": ["AB+", "AB-", "A+", "A-", "B+", "B-", "O+", "O-"],
+}
+
+DONOR_INDEXES = [
+    IndexModel([("city_key", ASCENDING), ("blood_group", ASCENDING)]),
+    IndexModel([("district_key", ASCENDING), ("blood_group", ASCENDING)]),
+    IndexModel([("province_key", ASCENDING), ("blood_group", ASCENDING)]),
+    IndexModel([("blood_group", ASCENDING)]),
+    IndexModel([("source_id", ASCENDING)]),
+]
+
+
+def location_key(value) -> Optional[str]:
+    return " ".join(value.split()).lower() if isinstance(value, str) and value.strip() else None
+
+
+def _value(value):
+    return getattr(value, "value", value)
+
+
+def donor_records(source: str, document: dict) -> List[dict]:
+    """Flattened donor documents for one directory or family entry"""
+    location = {
+        "city": document.get("city"),
+        "district": document.get("district"),
+        "province": document.get("province"),
+        "city_key": location_key(document.get("city")),
+        "district_key": location_key(document.get("district")),
+        "province_key": location_key(document.get("province")),
+        "membership_type": _value(document.get("membership_type")),
+        "updated_at": document.get("updated_at"),
+    }
+    source_id = str(document["_id"])
+    if source == "directory":
+        if not document.get("blood_group"):
+            return []
+        return [{
+            "_id": f"directory:{source_id}",
+            "source": source,
+            "source_id": source_id,
+            "member_id": None,
+            "name": document.get("full_name"),
+            "gender": _value(document.get("gender")),
+            "age": None,
+            "blood_group": _value(document["blood_group"]),
+            "phone": document.get("phone"),
+            "email": document.get("email"),
+            **location,
+        }]
+
+    records = []
+    for member in document.get("family_members") or []:
+        if not member.get("blood_group") or not member.get("member_id"):
+            continue
+        records.append({
+            "_id": f"family:{source_id}:{member['member_id']}",
+            "source": source,
+            "source_id": source_id,
+            "member_id": member["member_id"],
+            "name": member.get("name"),
+            "gender": _value(member.get("gender")),
+            "age": member.get("age"),
+            "blood_group": _value(member["blood_group"]),
+            # Members without their own number are reached through the household
+            "phone": member.get("phone") or document.get("phone"),
+            "email": member.get("email") or document.get("email"),
+            **location,
+        })
+    return records
+
+
+async def _sync(db, source: str, source_id: str, records: List[dict], stamp: datetime):
+    for record in records:
+        await db[DONORS].replace_one({"_id": record["_id"]}, {**record, "synced_at": stamp}, upsert=True)
+    # Members removed from the family, or whose blood group was cleared
+    await db[DONORS].delete_many({"source_id": source_id, "_id": {"$nin": [record["_id"] for record in records]}})
+
+
+async def refresh(db, source: str, document_id) -> int:
+    """Bring one entry's donors in line with its current state; returns the number of donors kept"""
+    document = await db[SOURCES[source]].find_one({"_id": ObjectId(document_id)})
+    if document:
+        await reference_data.expand(db, [document])
+    records = donor_records(source, document) if document else []
+    await _sync(db, source, str(document_id), records, datetime.utcnow())
+    return len(records)
+
+
+async def rebuild(db, progress=None) -> dict:
+    """Recompute the donor index from every entry and swap it in"""
+    stamp = datetime.utcnow()
+    staging = db[f"{DONORS}_build"]
+    await staging.drop()
+    scanned = donors = 0
+    for source, collection in SOURCES.items():
+        cursor = db[collection].find({}).sort("_id", 1)
+        while True:
+            batch = await cursor.to_list(length=REBUILD_BATCH_SIZE)
+            if not batch:
+                break
+            await reference_data.expand(db, batch)
+            records = [{**record, "synced_at": stamp} for document in batch for record in donor_records(source, document)]
+            if records:
+                await staging.insert_many(records, ordered=False)
+            donors += len(records)
+            scanned += len(batch)
+            if progress is not None:
+                await progress(scanned)
+    # Build next to the live index, then rename over it: donors of deleted entries are simply not copied,
+    # and searches never see a half-built index. The rename replaces the live indexes with the staging ones.
+    await staging.create_indexes(DONOR_INDEXES)
+    if donors:
+        await staging.rename(DONORS, dropTarget=True)
+    else:
+        await db[DONORS].delete_many({})
+    logger.info(f"Donor index rebuilt: {scanned} entries, {donors} donors")
+    return {"documents": scanned, "donors": donors}
+
+
+async def find_donors(db, blood_group: str, city: Optional[str] = None, district: Optional[str] = None,
+                      province: Optional[str] = None, limit: int = 50) -> List[dict]:
+    """Donors compatible with ``blood_group``, nearest location tier first"""
+    compatible = COMPATIBLE_DONORS[blood_group]
+    city_key, district_key, province_key = location_key(city), location_key(district), location_key(province)
+
+    # Each tier excludes the ones before it, so no donor is listed twice
+    tiers = []
+    if city_key:
+        tiers.append(("city", {"city_key": city_key}))
+    if district_key:
+        tiers.append(("district", {"district_key": district_key, **({"city_key": {"$ne": city_key}} if city_key else {})}))
+    if province_key:
+        tiers.append(("province", {
+            "province_key": province_key,
+            **({"district_key": {"$ne": district_key}} if district_key else {}),
+            **({"city_key": {"$ne": city_key}} if city_key else {}),
+        }))
+    elsewhere = {}
+    for field, key in (("province_key", province_key), ("district_key", district_key), ("city_key", city_key)):
+        if key:
+            elsewhere[field] = {"$ne": key}
+    tiers.append(("elsewhere", elsewhere))
+
+    projection = {"city_key": 0, "district_key": 0, "province_key": 0, "synced_at": 0}
+    results = []
+    for match, location in tiers:
+        for groups in ([blood_group], compatible[1:]):
+            remaining = limit - len(results)
+            if remaining <= 0:
+                return results
+            if not groups:
+                continue
+            cursor = db[DONORS].find({**location, "blood_group": {"$in": groups}}, projection).limit(remaining)
+            for donor in await cursor.to_list(length=remaining):
+                donor["id"] = donor.pop("_id")
+                donor["location_match"] = match
+                donor["exact_match"] = donor["blood_group"] == blood_group
+                results.append(donor)
+    return results
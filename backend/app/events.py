@@ -0,0 +1,224 @@
+"""
+Live updates for the admin dashboard.
+
+Writes to the watched collections are picked up from a MongoDB change stream
+when the server is a replica set. On a standalone mongod (no change streams)
+the routers report their own writes through ``live_updates.notify``; in that
+mode writes made by other server workers are caught by a periodic recount.
+
+Changes only mark counters dirty. A flush loop recomputes the dirty counters
+at most once per ``LIVE_COALESCE_MS`` and broadcasts just the values that
+moved, so a burst of writes costs a handful of count queries rather than one
+per write per connected admin. New contact messages are pushed immediately.
+
+``EventSource`` can't send an ``Authorization`` header, and a token in the URL
+ends up in access and proxy logs. The dashboard therefore trades its token for
+a ticket (``issue_ticket``) that opens one stream and expires after
+``LIVE_TICKET_SECONDS``. Tickets live in ``live_tickets`` so that any worker
+can redeem them.
+"""
+import asyncio
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.cache import document_cache
+from app.config import settings
+from app.facets import facet_cache
+from app.models import UserRole
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ("contact_messages", "directory", "family_directory", "users")
+
+CHANGE_STREAM = "change_stream"
+LOCAL = "local"
+
+LIVE_TICKETS = "live_tickets"
+# Redeemed tickets are deleted; the TTL index only sweeps unused ones
+LIVE_TICKET_INDEXES = [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)]
+
+
+async def issue_ticket(db, user_id: str) -> str:
+    """A single-use ticket for opening the live stream as ``user_id``"""
+    ticket = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.live_ticket_seconds)
+    await db[LIVE_TICKETS].insert_one({"_id": ticket, "user_id": user_id, "expires_at": expires_at})
+    return ticket
+
+
+async def redeem_ticket(db, ticket: str) -> Optional[str]:
+    """The user ID a ticket was issued to, or None if it is unknown, used or expired"""
+    record = await db[LIVE_TICKETS].find_one_and_delete({"_id": ticket, "expires_at": {"$gt": datetime.utcnow()}})
+    return record["user_id"] if record else None
+
+
+async def compute_counters(db, collections) -> Dict[str, int]:
+    """Dashboard counters for the given collections"""
+    counters = {}
+    if "directory" in collections:
+        counters["directory_total"] = await db.directory.count_documents({})
+        # Same figure as GET /api/directory/community_strength, which the dashboard card loads first
+        result = await db.directory.aggregate([
+            {"$group": {"_id": None, "total": {"$sum": "$family_members_count"}}}
+        ]).to_list(length=1)
+        counters["community_strength"] = result[0]["total"] if result else 0
+    if "family_directory" in collections:
+        counters["family_total"] = await db.family_directory.count_documents({})
+    if "contact_messages" in collections:
+        counters["contact_total"] = await db.contact_messages.count_documents({})
+        counters["contact_unread"] = await db.contact_messages.count_documents({"is_read": False})
+    if "users" in collections:
+        counters["users_total"] = await db.users.count_documents({})
+        counters["users_active"] = await db.users.count_documents({"is_active": True})
+        counters["admin_users"] = await db.users.count_documents({"role": UserRole.ADMIN})
+    return counters
+
+
+def contact_summary(document: dict) -> dict:
+    created_at = document.get("created_at")
+    return {
+        "id": str(document.get("_id")),
+        "name": document.get("name"),
+        "email": document.get("email"),
+        "subject": document.get("subject"),
+        "is_read": document.get("is_read", False),
+        "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+    }
+
+
+class EventBus:
+    """Fan-out to connected dashboards; each subscriber has a small bounded queue"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        for queue in self.subscribers:
+            if queue.full():
+                # A stalled client loses its oldest event rather than holding up everyone else
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+class LiveUpdates:
+    def __init__(self, bus: Optional[EventBus] = None, coalesce_ms: int = 250, resync_seconds: float = 30):
+        self.bus = bus or EventBus()
+        self.coalesce_ms = coalesce_ms
+        self.resync_seconds = resync_seconds
+        self.mode = LOCAL
+        self.counters: Dict[str, int] = {}
+        self._db = None
+        self._dirty: Set[str] = set()
+        self._changed: Optional[asyncio.Event] = None
+        self._tasks = []
+
+    def notify(self, collection: str, operation: str, document: Optional[dict] = None):
+        """Called by write handlers; ignored while a change stream is delivering the same writes"""
+        if self.mode == LOCAL:
+            self._on_change(collection, operation, document)
+
+    def _on_change(self, collection: str, operation: str, document: Optional[dict] = None):
+        if not self.bus.subscribers:
+            self.counters = {}  # nobody is watching: recompute from scratch for the next subscriber
+            return
+        if collection == "contact_messages" and operation == "insert" and document:
+            self.bus.publish({"type": "contact_message", "message": contact_summary(document)})
+        self._dirty.add(collection)
+        if self._changed is not None:
+            self._changed.set()
+
+    async def current_counters(self) -> Dict[str, int]:
+        if not self.counters and self._db is not None:
+            self.counters = await compute_counters(self._db, WATCHED_COLLECTIONS)
+        return dict(self.counters)
+
+    async def flush(self):
+        """Recompute dirty counters and broadcast the ones that changed"""
+        dirty, self._dirty = self._dirty, set()
+        if not dirty or self._db is None:
+            return
+        fresh = await compute_counters(self._db, dirty)
+        changed = {name: value for name, value in fresh.items() if self.counters.get(name) != value}
+        if not changed:
+            return
+        deltas = {name: value - self.counters[name] for name, value in changed.items() if name in self.counters}
+        self.counters.update(changed)
+        self.bus.publish({"type": "counters", "counters": changed, "deltas": deltas})
+
+    async def _flush_loop(self):
+        while True:
+            await self._changed.wait()
+            await asyncio.sleep(self.coalesce_ms / 1000)
+            self._changed.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Could not recompute live counters: {e}")
+
+    async def _resync_loop(self):
+        # Without a change stream, writes handled by other server workers are only seen by recounting
+        while True:
+            await asyncio.sleep(self.resync_seconds)
+            if self.mode == LOCAL and self.bus.subscribers:
+                self._dirty.update(WATCHED_COLLECTIONS)
+                self._changed.set()
+
+    async def _watch_loop(self):
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": list(WATCHED_COLLECTIONS)},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+        }}]
+        while True:
+            try:
+                async with self._db.watch(pipeline) as stream:
+                    if self.mode != CHANGE_STREAM:
+                        logger.info("Live dashboard updates use a MongoDB change stream")
+                    self.mode = CHANGE_STREAM
+                    async for change in stream:
+                        # Also catches other workers' writes, which their own invalidation can't reach
+                        document_cache.invalidate(change["ns"]["coll"], change["documentKey"]["_id"])
+                        facet_cache.bump(change["ns"]["coll"])
+                        self._on_change(change["ns"]["coll"], change["operationType"], change.get("fullDocument"))
+            except asyncio.CancelledError:
+                raise
+            except (OperationFailure, NotImplementedError) as e:
+                # Standalone mongod (or a test double): change streams are unavailable, stay on in-process events
+                logger.info(f"Change streams unavailable ({e}); live updates use in-process events")
+                self.mode = LOCAL
+                return
+            except Exception as e:
+                logger.warning(f"Change stream interrupted ({e}); falling back to in-process events and retrying")
+                self.mode = LOCAL
+                await asyncio.sleep(self.resync_seconds)
+
+    def start(self, db):
+        self._db = db
+        self._changed = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._resync_loop()),
+            asyncio.create_task(self._watch_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+live_updates = LiveUpdates(coalesce_ms=settings.live_coalesce_ms, resync_seconds=settings.live_resync_seconds)
@@ -0,0 +1,59 @@
+"""
+Directory export builders.
+
+pandas and reportlab take several hundred milliseconds to import, so they are
+only imported here, on first use. ``warm_up`` can import them in a background
+thread after startup so the first export request doesn't pay that cost.
+"""
+import asyncio
+import logging
+from io import BytesIO
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+def build_csv(entries: List[dict]) -> str:
+    """Render directory entries as CSV text"""
+    import pandas as pd
+
+    df = pd.DataFrame(entries)
+    return df.to_csv(index=False)
+
+
+def build_pdf(entries: List[dict]) -> bytes:
+    """Render directory entries as a simple one-line-per-entry PDF"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    p.setFont("Helvetica", 10)
+
+    y = height - 30
+    for entry in entries:
+        if y < 40:
+            p.showPage()
+            p.setFont("Helvetica", 10)
+            y = height - 30
+        p.drawString(30, y, str(entry))
+        y -= 12
+
+    p.save()
+    return buffer.getvalue()
+
+
+def _import_export_libraries():
+    import pandas  # noqa: F401
+    import reportlab.pdfgen.canvas  # noqa: F401
+
+
+async def warm_up():
+    """Import the export libraries in a worker thread so the event loop stays free"""
+    try:
+        await asyncio.to_thread(_import_export_libraries)
+        logger.info("Export libraries warmed up")
+    except Exception as e:
+        logger.warning(f"Could not warm up export libraries: {e}")
@@ -0,0 +1,135 @@
+"""
+Per-value filter counts ("facets") for the directory and family listings.
+
+With ``facets=true`` a listing runs one ``$facet`` aggregation that returns the
+requested page, the total and, for every filter dimension, the number of
+matching entries per value (most common first, at most ``FACET_VALUES``
+values). The counts are within the current filters, so they show how the
+current results split up.
+
+Facet counts are cached per worker, keyed by collection and query shape (the
+filters without page/limit). Each collection has a write version that write
+handlers (and the change-stream watcher, for other workers' writes) bump with
+``facet_cache.bump``. An entry is only used while its collection's version is
+unchanged, so paging through a filtered listing after the first page costs a
+single indexed ``find``. Without change streams, other workers' writes can be
+missed for at most ``FACET_CACHE_TTL_SECONDS``.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.metrics import metrics
+from app.reference import reference_data
+
+FACET_VALUES = 50
+
+DIMENSIONS = {
+    "directory": ["city", "profession", "caste", "province", "gender", "membership_type"],
+    "family_directory": ["city", "caste", "province", "district", "membership_type"],
+}
+
+
+def query_shape(collection: str, query: dict) -> str:
+    return json.dumps([collection, query], sort_keys=True, default=str)
+
+
+def facet_pipeline(collection: str, query: dict, skip: int, limit: int) -> List[dict]:
+    facets = {
+        "page": [{"$skip": skip}, {"$limit": limit}],
+        "total": [{"$count": "count"}],
+    }
+    for name in DIMENSIONS[collection]:
+        facets[name] = [
+            {"$group": {"_id": f"${name}", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": FACET_VALUES},
+        ]
+    return [{"$match": query}, {"$facet": facets}]
+
+
+def _merge(buckets: List[dict]) -> List[dict]:
+    """Facet values with codes expanded; unmigrated entries' strings count towards the same name"""
+    counts: Dict = {}
+    for bucket in buckets:
+        value = reference_data.name(bucket["_id"])
+        counts[value] = counts.get(value, 0) + bucket["count"]
+    return [{"value": value, "count": count} for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))]
+
+
+class CachedFacets:
+    __slots__ = ("version", "total", "facets", "expires_at")
+
+    def __init__(self, version: int, total: int, facets: Dict[str, List[dict]], expires_at: float):
+        self.version = version
+        self.total = total
+        self.facets = facets
+        self.expires_at = expires_at
+
+
+class FacetCache:
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedFacets]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def version(self, collection: str) -> int:
+        """Take before reading from the database and pass to ``put``"""
+        return self._versions.get(collection, 0)
+
+    def bump(self, collection: str):
+        """Called after every write to ``collection``; makes its cached facets stale"""
+        self._versions[collection] = self._versions.get(collection, 0) + 1
+
+    def get(self, collection: str, shape: str) -> Optional[CachedFacets]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(shape)
+        if entry is not None and (entry.version != self.version(collection) or entry.expires_at <= time.monotonic()):
+            del self._entries[shape]
+            entry = None
+        if entry is None:
+            metrics.incr(f"facets.{collection}.miss")
+            return None
+        self._entries.move_to_end(shape)
+        metrics.incr(f"facets.{collection}.hit")
+        return entry
+
+    def put(self, collection: str, shape: str, version: int, total: int, facets: Dict[str, List[dict]]):
+        # A write landed while the aggregation ran; its counts may not include it
+        if not self.enabled or version != self.version(collection):
+            return
+        self._entries[shape] = CachedFacets(version, total, facets, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(shape)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+async def faceted_page(db, collection: str, query: dict, skip: int, limit: int) -> Tuple[List[dict], int, Dict[str, List[dict]]]:
+    """One page of ``collection`` matching ``query``, the total and the facet counts"""
+    shape = query_shape(collection, query)
+    cached = facet_cache.get(collection, shape)
+    if cached is not None:
+        page = await db[collection].find(query).skip(skip).limit(limit).to_list(length=limit)
+        return await reference_data.expand(db, page), cached.total, cached.facets
+
+    version = facet_cache.version(collection)
+    result = (await db[collection].aggregate(facet_pipeline(collection, query, skip, limit)).to_list(length=1))[0]
+    total = result["total"][0]["count"] if result["total"] else 0
+    await reference_data.resolve(db, (bucket["_id"] for name in DIMENSIONS[collection] for bucket in result[name]))
+    facets = {name: _merge(result[name]) for name in DIMENSIONS[collection]}
+    facet_cache.put(collection, shape, version, total, facets)
+    return await reference_data.expand(db, result["page"]), total, facets
+
+
+facet_cache = FacetCache(settings.facet_cache_size, settings.facet_cache_ttl_seconds)
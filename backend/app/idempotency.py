@@ -0,0 +1,279 @@
+"""
+``Idempotency-Key`` support for the public create endpoints.
+
+Mobile clients retry a POST when the network drops, and without a key every
+retry creates another entry. With ``Idempotency-Key: <client-chosen id>``, the
+first request with a key runs normally and its successful (2xx) response is
+stored. Any retry with the same key and path gets that stored response back,
+marked ``Idempotent-Replayed: true``. The retry never reaches validation or the
+database write. Reusing a key with a different body is rejected with 422.
+
+Stored responses live in the ``idempotency_keys`` collection for
+``IDEMPOTENCY_TTL_SECONDS`` (a TTL index removes them). Each worker also keeps
+a hot LRU of recent ones, so most retries are answered without a query.
+
+A duplicate that arrives while the first request is still running waits for it
+rather than running twice:
+
+- on the same worker, it awaits the first request's in-process future;
+- on another worker, it sees the first request's ``in_flight`` claim and polls
+  until the response is stored. After ``IDEMPOTENCY_WAIT_SECONDS`` it gets 409
+  and can retry later.
+
+A claim whose worker died is taken over once it is ``LOCK_SECONDS`` old.
+Non-2xx responses aren't stored and release the claim, so a retry after an
+error runs again, and so does a duplicate that was waiting on the failed
+request. If MongoDB can't be reached, requests go through without
+de-duplication.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY = "idempotency_keys"
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+LOCK_SECONDS = 60
+POLL_INTERVAL = 0.05
+
+IDEMPOTENCY_INDEXES = [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)]
+
+# POST paths that create something; the header is ignored everywhere else
+ROUTES = {"/api/directory/", "/api/directory/family", "/api/contact/", "/api/auth/register"}
+
+IN_FLIGHT = "in_flight"
+COMPLETED = "completed"
+
+
+class KeyReused(Exception):
+    """The key was first used with a different request body"""
+
+
+class StoredResponse:
+    __slots__ = ("status", "headers", "body", "fingerprint", "expires_at")
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, fingerprint: str, expires_at: datetime):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_record(cls, record: dict) -> "StoredResponse":
+        response = record["response"]
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response["headers"]]
+        return cls(response["status"], headers, bytes(response["body"]), record["fingerprint"], record["expires_at"])
+
+    def to_record(self) -> dict:
+        return {
+            "status": self.status,
+            "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in self.headers],
+            "body": self.body,
+        }
+
+    async def replay(self, send):
+        await send({"type": "http.response.start", "status": self.status, "headers": self.headers + [(b"idempotent-replayed", b"true")]})
+        await send({"type": "http.response.body", "body": self.body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replaying(body: bytes, receive):
+    """A ``receive`` that hands the already-read body to the app, then defers to the real one"""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    return replay
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, routes=ROUTES, ttl_seconds: float = 86400, cache_size: int = 10000, wait_seconds: float = 10):
+        self.app = app
+        self.routes = set(routes)
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self.wait_seconds = wait_seconds
+        self._cache: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get(HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key.strip() or len(key) > MAX_KEY_LENGTH:
+            await JSONResponse({"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"}, status_code=400)(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        record_id = hashlib.sha256(f"{scope['path']}\n{key}".encode("utf-8")).hexdigest()
+        try:
+            await self._handle(scope, _replaying(body, receive), send, record_id, fingerprint)
+        except KeyReused:
+            await JSONResponse({"detail": "Idempotency-Key was already used with a different request"}, status_code=422)(scope, receive, send)
+
+    def _cached(self, record_id: str) -> Optional[StoredResponse]:
+        stored = self._cache.get(record_id)
+        if stored is not None and stored.expires_at <= datetime.utcnow():
+            del self._cache[record_id]
+            stored = None
+        if stored is not None:
+            self._cache.move_to_end(record_id)
+        return stored
+
+    def _remember(self, record_id: str, stored: StoredResponse):
+        if self.cache_size <= 0:
+            return
+        self._cache[record_id] = stored
+        self._cache.move_to_end(record_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _replay(self, stored: StoredResponse, fingerprint: str, send):
+        if stored.fingerprint != fingerprint:
+            raise KeyReused()
+        metrics.incr("idempotency.replayed")
+        await stored.replay(send)
+
+    async def _handle(self, scope, receive, send, record_id: str, fingerprint: str):
+        stored = self._cached(record_id)
+        if stored is not None:
+            await self._replay(stored, fingerprint, send)
+            return
+        pending = self._in_flight.get(record_id)
+        if pending is not None:
+            metrics.incr("idempotency.coalesced")
+            stored = await asyncio.shield(pending)
+            if stored is None:
+                # The first request failed or got an error response; this one runs on its own
+                await self._handle(scope, receive, send, record_id, fingerprint)
+            else:
+                await self._replay(stored, fingerprint, send)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[record_id] = future
+        stored = None
+        try:
+            stored = await self._execute(scope, receive, send, record_id, fingerprint)
+        finally:
+            del self._in_flight[record_id]
+            future.set_result(stored)
+
+    async def _claim(self, db, record_id: str, fingerprint: str) -> Union[bool, StoredResponse, None]:
+        """True once this request owns the key; the stored response if another one completed; None after waiting"""
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            now = datetime.utcnow()
+            try:
+                await db[IDEMPOTENCY].insert_one({
+                    "_id": record_id, "status": IN_FLIGHT, "fingerprint": fingerprint, "created_at": now,
+                    "locked_until": now + timedelta(seconds=LOCK_SECONDS), "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                })
+                return True
+            except DuplicateKeyError:
+                pass
+            record = await db[IDEMPOTENCY].find_one({"_id": record_id})
+            if record is None:
+                continue  # released by a failed first request
+            if record["fingerprint"] != fingerprint:
+                raise KeyReused()
+            if record["status"] == COMPLETED:
+                return StoredResponse.from_record(record)
+            if record["locked_until"] <= now:
+                # The worker that claimed the key died mid-request
+                taken = await db[IDEMPOTENCY].find_one_and_update(
+                    {"_id": record_id, "status": IN_FLIGHT, "locked_until": record["locked_until"]},
+                    {"$set": {"locked_until": now + timedelta(seconds=LOCK_SECONDS)}}
+                )
+                if taken is not None:
+                    return True
+                continue
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _execute(self, scope, receive, send, record_id: str, fingerprint: str) -> Optional[StoredResponse]:
+        from app.database import get_database
+        db = get_database()
+        try:
+            claimed = await self._claim(db, record_id, fingerprint)
+        except PyMongoError as e:
+            logger.warning(f"Idempotency store unavailable, running request without it: {e}")
+            await self.app(scope, receive, send)
+            return None
+        if claimed is None:
+            await JSONResponse({"detail": "A request with this Idempotency-Key is still in progress"}, status_code=409)(scope, receive, send)
+            return None
+        if isinstance(claimed, StoredResponse):
+            self._remember(record_id, claimed)
+            await self._replay(claimed, fingerprint, send)
+            return claimed
+
+        captured = {"status": 500, "headers": [], "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except BaseException:
+            await db[IDEMPOTENCY].delete_one({"_id": record_id, "status": IN_FLIGHT})
+            raise
+
+        stored = StoredResponse(
+            captured["status"], captured["headers"], b"".join(captured["body"]), fingerprint,
+            datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+        )
+        try:
+            if not 200 <= stored.status < 300:
+                # Waiting duplicates run on their own instead of replaying the error
+                await db[IDEMPOTENCY].delete_one({"_id": record_id, "status": IN_FLIGHT})
+                return None
+            await db[IDEMPOTENCY].update_one(
+                {"_id": record_id},
+                {"$set": {"status": COMPLETED, "response": stored.to_record(), "expires_at": stored.expires_at}, "$unset": {"locked_until": ""}}
+            )
+        except PyMongoError as e:
+            # The response is already sent; the claim expires after LOCK_SECONDS
+            logger.warning(f"Could not store idempotent response: {e}")
+        self._remember(record_id, stored)
+        return stored
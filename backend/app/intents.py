@@ -0,0 +1,376 @@
+"""
+Multilingual intent classification for the AI agent's fallback replies and
+suggested actions.
+
+All keywords (English, Urdu script and Roman Urdu) are compiled once into a
+single Aho–Corasick automaton, so classifying a message is one pass over its
+characters regardless of how many keywords the tables hold.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+ENGLISH = "en"
+URDU = "ur"
+ROMAN_URDU = "roman_ur"
+
+# Intents in priority order: when a message matches several, the first one wins
+INTENTS = ["register", "contact", "education", "health", "donate"]
+
+KEYWORDS: Dict[str, Dict[str, List[str]]] = {
+    ENGLISH: {
+        "register": ["volunteer", "join", "register", "directory", "membership"],
+        "contact": ["contact", "help", "support"],
+        "education": ["education", "scholarship", "study", "student"],
+        "health": ["health", "medical", "healthcare", "doctor", "hospital"],
+        "donate": ["donate", "donation", "contribute", "charity"],
+    },
+    URDU: {
+        "register": ["رجسٹر", "رجسٹریشن", "شامل", "شمولیت", "رکن", "رکنیت", "رضاکار", "ڈائریکٹری"],
+        "contact": ["رابطہ", "مدد", "سپورٹ"],
+        "education": ["تعلیم", "وظیفہ", "اسکالرشپ", "سکالرشپ", "پڑھائی", "طالب علم"],
+        "health": ["صحت", "طبی", "میڈیکل", "علاج", "ڈاکٹر", "ہسپتال"],
+        "donate": ["عطیہ", "عطیات", "چندہ", "زکوٰۃ", "زکوۃ", "خیرات"],
+    },
+    ROMAN_URDU: {
+        "register": ["shamil", "rukn", "rukniyat", "razakar", "razakaar", "rajistar"],
+        "contact": ["rabta", "raabta", "madad", "rabita"],
+        "education": ["taleem", "taaleem", "parhai", "wazifa", "wazeefa"],
+        "health": ["sehat", "sehet", "ilaj", "ilaaj", "tibbi", "dawai", "haspatal"],
+        "donate": ["atiya", "atiyah", "chanda", "zakat", "khairat", "sadqa"],
+    },
+}
+
+# Common Roman Urdu function words: they carry no intent but identify the language
+ROMAN_URDU_MARKERS = [
+    "hai", "hain", "kya", "kaise", "kaisay", "mein", "mujhe", "aap", "ap", "chahta", "chahti",
+    "karna", "karni", "karein", "krna", "kahan", "kab", "nahi", "bhai", "ji",
+]
+
+# Arabic code points that are commonly typed in place of the Urdu letters
+URDU_NORMALIZATION = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "ە": "ہ"})
+
+RESPONSES: Dict[str, Dict[str, str]] = {
+    "register": {
+        ENGLISH: """Thank you for your interest in joining Arain Association Youth Wing Pakistan!
+
+To register as a member/volunteer, I'll need some information from you:
+
+1. Your full name
+2. Father's name
+3. CNIC number
+4. Contact details (phone & email)
+5. Education and profession
+6. Location (city, district, province)
+
+Would you like to start the registration process? Please share your full name first.""",
+        URDU: """آرائیں ایسوسی ایشن یوتھ ونگ پاکستان میں شمولیت میں دلچسپی کا شکریہ!
+
+رکن/رضاکار کے طور پر رجسٹریشن کے لیے مجھے آپ سے یہ معلومات درکار ہوں گی:
+
+1. آپ کا پورا نام
+2. والد کا نام
+3. شناختی کارڈ نمبر
+4. رابطے کی تفصیلات (فون اور ای میل)
+5. تعلیم اور پیشہ
+6. مقام (شہر، ضلع، صوبہ)
+
+کیا آپ رجسٹریشن شروع کرنا چاہیں گے؟ براہ کرم پہلے اپنا پورا نام بتائیں۔""",
+        ROMAN_URDU: """Arain Association Youth Wing Pakistan mein shamil hone mein dilchaspi ka shukriya!
+
+Member/volunteer registration ke liye mujhe aap se yeh maloomat chahiye hongi:
+
+1. Aap ka poora naam
+2. Walid ka naam
+3. CNIC number
+4. Rabte ki tafseelat (phone aur email)
+5. Taleem aur pesha
+6. Maqam (shehar, zila, soba)
+
+Kya aap registration shuru karna chahenge? Pehle apna poora naam batayein.""",
+    },
+    "contact": {
+        ENGLISH: """I'm here to help! You can:
+
+1. Register as a member/volunteer/donor
+2. Get information about our services
+3. Submit a contact message
+4. Learn about our welfare projects
+
+What would you like to know more about?""",
+        URDU: """میں آپ کی مدد کے لیے حاضر ہوں! آپ:
+
+1. رکن/رضاکار/ڈونر کے طور پر رجسٹر ہو سکتے ہیں
+2. ہماری خدمات کے بارے میں معلومات لے سکتے ہیں
+3. رابطہ فارم کے ذریعے پیغام بھیج سکتے ہیں
+4. ہمارے فلاحی منصوبوں کے بارے میں جان سکتے ہیں
+
+آپ کس بارے میں مزید جاننا چاہیں گے؟""",
+        ROMAN_URDU: """Main aap ki madad ke liye haazir hoon! Aap:
+
+1. Member/volunteer/donor ke taur par register ho sakte hain
+2. Hamari khidmaat ke bare mein maloomat le sakte hain
+3. Contact form se paigham bhej sakte hain
+4. Hamare falahi mansoobon ke bare mein jaan sakte hain
+
+Aap kis bare mein mazeed jaanna chahenge?""",
+    },
+    "education": {
+        ENGLISH: """Arain Association Youth Wing Pakistan provides:
+
+📚 Educational scholarships for deserving students
+📖 Learning centers and educational resources
+🎓 Career guidance and mentorship
+📝 Educational workshops and training
+
+Would you like to know more about our educational programs or apply for support?""",
+        URDU: """آرائیں ایسوسی ایشن یوتھ ونگ پاکستان فراہم کرتی ہے:
+
+📚 مستحق طلبہ کے لیے تعلیمی وظائف
+📖 تعلیمی مراکز اور وسائل
+🎓 کیریئر رہنمائی اور مینٹرشپ
+📝 تعلیمی ورکشاپس اور تربیت
+
+کیا آپ ہمارے تعلیمی پروگراموں کے بارے میں مزید جاننا یا مدد کے لیے درخواست دینا چاہیں گے؟""",
+        ROMAN_URDU: """Arain Association Youth Wing Pakistan faraham karti hai:
+
+📚 Mustahiq talaba ke liye taleemi wazaif
+📖 Taleemi marakiz aur wasail
+🎓 Career rehnumai aur mentorship
+📝 Taleemi workshops aur tarbiyat
+
+Kya aap hamare taleemi programs ke bare mein mazeed jaanna ya madad ke liye darkhwast dena chahenge?""",
+    },
+    "health": {
+        ENGLISH: """Our healthcare services include:
+
+🏥 Free medical camps in underserved areas
+💊 Basic healthcare services
+🩺 Health awareness programs
+🚑 Emergency medical assistance
+
+We organize regular medical camps. Would you like information about upcoming camps?""",
+        URDU: """ہماری طبی خدمات میں شامل ہیں:
+
+🏥 پسماندہ علاقوں میں مفت میڈیکل کیمپ
+💊 بنیادی طبی سہولیات
+🩺 صحت سے متعلق آگاہی پروگرام
+🚑 ہنگامی طبی امداد
+
+ہم باقاعدگی سے میڈیکل کیمپ لگاتے ہیں۔ کیا آپ آنے والے کیمپوں کے بارے میں معلومات چاہیں گے؟""",
+        ROMAN_URDU: """Hamari tibbi khidmaat mein shamil hain:
+
+🏥 Pasmanda ilaqon mein muft medical camps
+💊 Bunyadi sehat ki sahuliyat
+🩺 Sehat ki aagahi ke programs
+🚑 Hangami tibbi imdad
+
+Hum baqaidagi se medical camps lagate hain. Kya aap aane wale camps ke bare mein maloomat chahenge?""",
+    },
+    "donate": {
+        ENGLISH: """Thank you for considering a donation to support our cause!
+
+Your contributions help us:
+✅ Provide educational scholarships
+✅ Organize medical camps
+✅ Run community welfare projects
+✅ Support families in need
+
+Would you like to know more about donation methods or submit a contact form?""",
+        URDU: """ہمارے مقصد کی حمایت میں عطیہ دینے پر غور کرنے کا شکریہ!
+
+آپ کے عطیات سے ہم:
+✅ تعلیمی وظائف فراہم کرتے ہیں
+✅ میڈیکل کیمپ لگاتے ہیں
+✅ کمیونٹی کے فلاحی منصوبے چلاتے ہیں
+✅ ضرورت مند خاندانوں کی مدد کرتے ہیں
+
+کیا آپ عطیہ دینے کے طریقوں کے بارے میں جاننا یا رابطہ فارم جمع کروانا چاہیں گے؟""",
+        ROMAN_URDU: """Hamare maqsad ki himayat mein atiya dene par ghaur karne ka shukriya!
+
+Aap ke atiyaat se hum:
+✅ Taleemi wazaif dete hain
+✅ Medical camps lagate hain
+✅ Community ke falahi mansoobay chalate hain
+✅ Zaroorat mand khandanon ki madad karte hain
+
+Kya aap atiya dene ke tareeqon ke bare mein jaanna ya contact form jama karwana chahenge?""",
+    },
+    "default": {
+        ENGLISH: """Hello! I'm here to help you with Arain Association Youth Wing Pakistan.
+
+I can assist you with:
+🔹 Joining as a member/volunteer/donor
+🔹 Information about our services
+🔹 Educational programs and scholarships
+🔹 Healthcare services and medical camps
+🔹 Donation and contribution options
+
+How can I help you today?""",
+        URDU: """السلام علیکم! میں آرائیں ایسوسی ایشن یوتھ ونگ پاکستان کے حوالے سے آپ کی مدد کے لیے حاضر ہوں۔
+
+میں ان امور میں آپ کی مدد کر سکتا ہوں:
+🔹 رکن/رضاکار/ڈونر کے طور پر شمولیت
+🔹 ہماری خدمات کے بارے میں معلومات
+🔹 تعلیمی پروگرام اور وظائف
+🔹 طبی خدمات اور میڈیکل کیمپ
+🔹 عطیات اور تعاون کے طریقے
+
+آج میں آپ کی کیا مدد کر سکتا ہوں؟""",
+        ROMAN_URDU: """Assalam-o-Alaikum! Main Arain Association Youth Wing Pakistan ke hawale se aap ki madad ke liye haazir hoon.
+
+Main in umoor mein madad kar sakta hoon:
+🔹 Member/volunteer/donor ke taur par shamooliyat
+🔹 Hamari khidmaat ke bare mein maloomat
+🔹 Taleemi programs aur wazaif
+🔹 Tibbi khidmaat aur medical camps
+🔹 Atiyaat aur taawun ke tareeqay
+
+Aaj main aap ki kya madad kar sakta hoon?""",
+    },
+}
+
+ACTIONS: Dict[str, Dict[str, List[str]]] = {
+    "register": {
+        ENGLISH: ["Start Registration", "Learn More About Membership"],
+        URDU: ["رجسٹریشن شروع کریں", "رکنیت کے بارے میں جانیں"],
+        ROMAN_URDU: ["Registration shuru karein", "Membership ke bare mein janein"],
+    },
+    "contact": {
+        ENGLISH: ["Submit Contact Form"],
+        URDU: ["رابطہ فارم جمع کروائیں"],
+        ROMAN_URDU: ["Contact form jama karwayein"],
+    },
+    "education": {
+        ENGLISH: ["View Educational Programs"],
+        URDU: ["تعلیمی پروگرام دیکھیں"],
+        ROMAN_URDU: ["Taleemi programs dekhein"],
+    },
+    "health": {
+        ENGLISH: ["Find Medical Camps"],
+        URDU: ["میڈیکل کیمپ تلاش کریں"],
+        ROMAN_URDU: ["Medical camps talash karein"],
+    },
+    "donate": {
+        ENGLISH: ["Make a Donation"],
+        URDU: ["عطیہ دیں"],
+        ROMAN_URDU: ["Atiya dein"],
+    },
+    "default": {
+        ENGLISH: ["Join Directory", "Contact Us", "Learn More"],
+        URDU: ["ڈائریکٹری میں شامل ہوں", "ہم سے رابطہ کریں", "مزید جانیں"],
+        ROMAN_URDU: ["Directory mein shamil hon", "Hum se rabta karein", "Mazeed janein"],
+    },
+}
+
+
+class AhoCorasick:
+    """
+    Aho–Corasick automaton over whole keywords.
+
+    A match must start at a word boundary; it may end inside a word, so
+    "volunteer" still matches "volunteering" as the old substring checks did.
+    """
+
+    def __init__(self, keywords: Dict[str, Tuple[Optional[str], str]]):
+        # keyword -> (intent or None for language markers, language)
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, Optional[str], str]]] = [[]]
+
+        for keyword, (intent, language) in keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append((len(keyword), intent, language))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def matches(self, text: str) -> List[Tuple[Optional[str], str]]:
+        """Return (intent, language) for every keyword occurrence that starts at a word boundary"""
+        found = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, intent, language in self.output[state]:
+                start = position - length + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    found.append((intent, language))
+        return found
+
+
+@dataclass
+class Classification:
+    language: str
+    intents: List[str] = field(default_factory=list)
+
+    @property
+    def intent(self) -> str:
+        return self.intents[0] if self.intents else "default"
+
+
+def normalize(text: str) -> str:
+    return text.casefold().translate(URDU_NORMALIZATION)
+
+
+def has_urdu_script(text: str) -> bool:
+    return any("؀" <= char <= "ۿ" for char in text)
+
+
+class IntentEngine:
+    def __init__(self, keywords: Dict[str, Dict[str, List[str]]] = KEYWORDS,
+                 markers: List[str] = ROMAN_URDU_MARKERS):
+        table: Dict[str, Tuple[Optional[str], str]] = {}
+        for language, intents in keywords.items():
+            for intent, terms in intents.items():
+                for term in terms:
+                    table.setdefault(normalize(term), (intent, language))
+        for marker in markers:
+            table.setdefault(normalize(marker), (None, ROMAN_URDU))
+        self.automaton = AhoCorasick(table)
+
+    def classify(self, text: str) -> Classification:
+        matches = self.automaton.matches(normalize(text))
+        found = {intent for intent, _ in matches if intent}
+
+        if has_urdu_script(text):
+            language = URDU
+        elif any(language == ROMAN_URDU for _, language in matches):
+            language = ROMAN_URDU
+        else:
+            language = ENGLISH
+
+        return Classification(language=language, intents=[intent for intent in INTENTS if intent in found])
+
+    def response_for(self, text: str) -> str:
+        classification = self.classify(text)
+        return RESPONSES[classification.intent][classification.language]
+
+    def actions_for(self, user_message: str, ai_response: str, limit: int = 3) -> List[str]:
+        """Actions for the intents mentioned in the reply, in the user's language"""
+        language = self.classify(user_message).language
+        actions = []
+        for intent in self.classify(ai_response).intents:
+            actions.extend(ACTIONS[intent][language])
+        return (actions or ACTIONS["default"][language])[:limit]
+
+
+intent_engine = IntentEngine()
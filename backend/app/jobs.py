@@ -0,0 +1,374 @@
+"""
+Background jobs for long-running admin work (exports, and later imports or scans).
+
+Jobs are documents in the ``jobs`` collection. Each server worker runs a few
+asyncio job workers that claim queued jobs with an atomic
+``find_one_and_update`` and hold a lease on them, renewed by a heartbeat while
+the job runs. A job whose lease expires (its worker crashed or was killed) is
+claimed again by any worker, up to ``JOB_MAX_ATTEMPTS`` attempts. A job
+interrupted by a clean shutdown is handed back to the queue at once instead,
+without counting the attempt.
+
+Database reads stay on the event loop; CPU-heavy steps (building a CSV/PDF)
+run in a process pool so the HTTP tier stays responsive. Finished artifacts
+are stored in GridFS (``job_artifacts`` bucket) and streamed back on download.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app import donors, exports, migrations, rollup, timeseries
+from app.config import settings
+from app.metrics import metrics
+from app.reference import reference_data
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+EXPORT_BATCH_SIZE = 1000
+
+
+@dataclass
+class Artifact:
+    filename: str
+    content_type: str
+    data: bytes
+
+
+class GridFSArtifacts:
+    """Job artifacts stored in a GridFS bucket"""
+
+    bucket_name = "job_artifacts"
+
+    def _bucket(self, db):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+        # GridFS needs the Motor database itself, not the query profiler's wrapper
+        return AsyncIOMotorGridFSBucket(getattr(db, "_db", db), bucket_name=self.bucket_name)
+
+    async def save(self, db, job_id: ObjectId, artifact: Artifact) -> ObjectId:
+        return await self._bucket(db).upload_from_stream(
+            artifact.filename,
+            artifact.data,
+            metadata={"job_id": job_id, "content_type": artifact.content_type}
+        )
+
+    async def open(self, db, artifact_id: ObjectId):
+        """Return an async iterator over the artifact's chunks"""
+        grid_out = await self._bucket(db).open_download_stream(artifact_id)
+
+        async def chunks():
+            while True:
+                chunk = await grid_out.readchunk()
+                if not chunk:
+                    break
+                yield chunk
+
+        return chunks()
+
+
+class JobContext:
+    """What a job handler gets: the job, the database, progress reporting and the process pool"""
+
+    def __init__(self, runner: "JobRunner", db, job: dict):
+        self.runner = runner
+        self.db = db
+        self.job = job
+        self.params = job.get("params") or {}
+        self._reported = 0.0
+        self.lease_lost = False
+
+    async def progress(self, fraction: float):
+        # Only write when progress moved noticeably, to keep job updates cheap
+        fraction = min(max(fraction, 0.0), 1.0)
+        if fraction - self._reported < 0.05 and fraction < 1.0:
+            return
+        self._reported = fraction
+        await self.db.jobs.update_one(
+            self.runner.fence(self.job),
+            {"$set": {"progress": round(fraction, 3), "updated_at": datetime.utcnow()}}
+        )
+
+    async def run_cpu(self, func: Callable, *args):
+        """Run a picklable function in the process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.runner.process_pool(), func, *args)
+
+
+async def _fetch_directory(context: JobContext) -> list:
+    """Read the directory in batches, reporting progress for the first 80% of the job"""
+    total = await context.db.directory.count_documents({})
+    cursor = context.db.directory.find().sort("_id", 1)
+    entries = []
+    while True:
+        batch = await cursor.to_list(length=EXPORT_BATCH_SIZE)
+        if not batch:
+            break
+        entries.extend(await reference_data.expand(context.db, batch))
+        await context.progress(0.8 * len(entries) / max(total, 1))
+    return entries
+
+
+async def export_csv(context: JobContext) -> Artifact:
+    entries = await _fetch_directory(context)
+    csv_data = await context.run_cpu(exports.build_csv, entries)
+    return Artifact("directory_export.csv", "text/csv", csv_data.encode("utf-8"))
+
+
+async def export_pdf(context: JobContext) -> Artifact:
+    entries = await _fetch_directory(context)
+    pdf_data = await context.run_cpu(exports.build_pdf, entries)
+    return Artifact("directory_export.pdf", "application/pdf", pdf_data)
+
+
+async def _rebuild(context: JobContext, rebuild, name: str) -> Artifact:
+    total = sum([await context.db[collection].estimated_document_count() for collection in ("directory", "family_directory")])
+
+    async def progress(scanned: int):
+        await context.progress(0.9 * scanned / max(total, 1))
+
+    summary = await rebuild(context.db, progress)
+    return Artifact(f"{name}.json", "application/json", json.dumps(summary).encode("utf-8"))
+
+
+async def rollup_rebuild(context: JobContext) -> Artifact:
+    return await _rebuild(context, rollup.rebuild, "rollup_rebuild")
+
+
+async def donor_index_rebuild(context: JobContext) -> Artifact:
+    return await _rebuild(context, donors.rebuild, "donor_index_rebuild")
+
+
+async def timeseries_backfill(context: JobContext) -> Artifact:
+    summary = await timeseries.backfill(context.db, context.progress)
+    return Artifact("timeseries_backfill.json", "application/json", json.dumps(summary).encode("utf-8"))
+
+
+async def migration(context: JobContext) -> Artifact:
+    """One migration (``{"migration": id}``), or every unfinished one"""
+    if context.params.get("migration"):
+        migration_id = context.params["migration"]
+        summary = {migration_id: await migrations.run(context.db, migrations.get(migration_id), context.progress)}
+    else:
+        summary = await migrations.run_pending(context.db, context.progress)
+    return Artifact("migration.json", "application/json", json.dumps(summary).encode("utf-8"))
+
+
+JOB_HANDLERS: Dict[str, Callable[[JobContext], Awaitable[Artifact]]] = {
+    "export_csv": export_csv,
+    "export_pdf": export_pdf,
+    "rollup_rebuild": rollup_rebuild,
+    "donor_index_rebuild": donor_index_rebuild,
+    "timeseries_backfill": timeseries_backfill,
+    "migration": migration,
+}
+
+
+class JobRunner:
+    def __init__(self, concurrency: int = 2, process_workers: int = 1, lease_seconds: float = 60,
+                 max_attempts: int = 3, poll_interval: float = 2, handlers=None, artifacts=None):
+        self.concurrency = concurrency
+        self.process_workers = process_workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.handlers = handlers or JOB_HANDLERS
+        self.artifacts = artifacts or GridFSArtifacts()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._db = None
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the server process has an event loop and driver threads running
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def fence(self, job: dict) -> dict:
+        """Filter that only matches while this worker still holds this attempt's lease"""
+        return {"_id": job["_id"], "worker_id": self.worker_id, "attempts": job["attempts"], "status": RUNNING}
+
+    async def submit(self, db, job_type: str, params: Optional[dict] = None, submitted_by: Optional[str] = None) -> ObjectId:
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        now = datetime.utcnow()
+        result = await db.jobs.insert_one({
+            "type": job_type,
+            "params": params or {},
+            "status": QUEUED,
+            "progress": 0.0,
+            "attempts": 0,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "error": None,
+            "artifact_id": None,
+            "artifact_filename": None,
+            "artifact_content_type": None,
+            "submitted_by": submitted_by,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None,
+        })
+        metrics.incr(f"jobs.submitted.{job_type}")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return result.inserted_id
+
+    async def claim(self, db) -> Optional[dict]:
+        """Atomically take the oldest queued job, or one whose lease has expired"""
+        now = datetime.utcnow()
+        # Jobs that keep losing their lease (e.g. crash the worker) are given up on
+        await db.jobs.update_many(
+            {"status": RUNNING, "lease_expires_at": {"$lt": now}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": FAILED, "error": "Lease expired too many times", "finished_at": now, "updated_at": now}}
+        )
+        return await db.jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": QUEUED},
+                    {"status": RUNNING, "lease_expires_at": {"$lt": now}},
+                ],
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _heartbeat(self, db, job: dict, context: JobContext, task: asyncio.Task):
+        """Renew the lease while the job runs; cancel it if another worker took the job over"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            result = await db.jobs.update_one(
+                self.fence(job),
+                {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+            )
+            if result.matched_count == 0:
+                logger.warning(f"Lost lease on job {job['_id']}; abandoning it")
+                context.lease_lost = True
+                task.cancel()
+                return
+
+    async def run(self, db, job: dict):
+        """Run one claimed job to completion, failure or retry"""
+        handler = self.handlers.get(job["type"])
+        if handler is None:
+            await self._finish_failed(db, job, f"Unknown job type: {job['type']}", retry=False)
+            return
+
+        context = JobContext(self, db, job)
+        work = asyncio.create_task(handler(context))
+        heartbeat = asyncio.create_task(self._heartbeat(db, job, context, work))
+        try:
+            artifact = await work
+            artifact_id = await self.artifacts.save(db, job["_id"], artifact)
+            now = datetime.utcnow()
+            await db.jobs.update_one(self.fence(job), {"$set": {
+                "status": COMPLETED,
+                "progress": 1.0,
+                "artifact_id": artifact_id,
+                "artifact_filename": artifact.filename,
+                "artifact_content_type": artifact.content_type,
+                "error": None,
+                "finished_at": now,
+                "updated_at": now,
+            }})
+            metrics.incr(f"jobs.completed.{job['type']}")
+        except asyncio.CancelledError:
+            if context.lease_lost:
+                return  # the worker that took the job over owns it now
+            # Shutting down: hand the job back without counting this attempt
+            await db.jobs.update_one(self.fence(job), {
+                "$set": {"status": QUEUED, "worker_id": None, "lease_expires_at": None, "updated_at": datetime.utcnow()},
+                "$inc": {"attempts": -1},
+            })
+            raise
+        except Exception as e:
+            logger.error(f"Job {job['_id']} ({job['type']}) failed on attempt {job['attempts']}: {e}")
+            await self._finish_failed(db, job, str(e), retry=job["attempts"] < self.max_attempts)
+        finally:
+            heartbeat.cancel()
+
+    async def _finish_failed(self, db, job: dict, error: str, retry: bool):
+        now = datetime.utcnow()
+        await db.jobs.update_one(self.fence(job), {"$set": {
+            "status": QUEUED if retry else FAILED,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "error": error,
+            "finished_at": None if retry else now,
+            "updated_at": now,
+        }})
+        metrics.incr(f"jobs.failed.{job['type']}")
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.claim(self._db)
+            except Exception as e:
+                logger.warning(f"Could not claim a job: {e}")
+                job = None
+
+            if job is not None:
+                await self.run(self._db, job)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, db):
+        self._db = db
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} job workers ({self.worker_id})")
+
+    async def stop(self):
+        """Stop claiming jobs; running jobs are requeued without counting the attempt, or retried once their lease expires if that write fails"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+job_runner = JobRunner(
+    concurrency=settings.job_workers,
+    process_workers=settings.job_process_workers,
+    lease_seconds=settings.job_lease_seconds,
+    max_attempts=settings.job_max_attempts,
+    poll_interval=settings.job_poll_interval
+)
@@ -0,0 +1,266 @@
+"""
+Local FAQ knowledge base for the AI agent.
+
+FAQ entries live in the ``faq_entries`` collection. Each worker keeps them in
+memory as an L2-normalised matrix of hashed word and character n-gram
+features, so a question is answered with one matrix-vector product (cosine
+similarity) and a top-k selection. Confident matches are returned directly
+without calling the LLM; weaker matches are passed to the LLM as context.
+
+Admin edits are soft deletes/updates stamped with ``updated_at``; workers pick
+them up incrementally on their next refresh instead of rebuilding the index.
+
+The default corpus is seeded with one upsert per question, and a unique index
+on the question of live entries backs it up, so workers starting together
+can't seed it twice. Duplicate questions would tie on score and never pass the
+confidence margin.
+"""
+import asyncio
+import math
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+FAQ_INDEXES = [
+    IndexModel([("updated_at", ASCENDING)]),
+    IndexModel([("question", ASCENDING)], unique=True, partialFilterExpression={"deleted": False}),
+]
+
+DIMENSIONS = 4096
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "can", "do", "does", "for", "how", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "the", "to", "what", "when", "where", "which", "who", "with", "you", "your",
+}
+
+DEFAULT_FAQS = [
+    {
+        "question": "How do I register as a member of the directory?",
+        "answer": "You can register through the Directory Registration page. You will need your full name, father's name, CNIC (12345-1234567-1), phone (+92XXXXXXXXXX), email, qualification, profession, city, district, province, caste and marital status. Choose member, volunteer or donor as your membership type.",
+        "tags": ["registration", "join", "directory", "membership"],
+    },
+    {
+        "question": "How can I register my whole family?",
+        "answer": "Use the family registration form to add the head of family, your address and each family member with their name, age, gender and relation. The total number of family members is calculated automatically.",
+        "tags": ["family", "registration", "members"],
+    },
+    {
+        "question": "What is the difference between a member, volunteer and donor?",
+        "answer": "Members are part of the community directory, volunteers help run our education, healthcare and welfare activities, and donors support our programs financially. You can pick any of these when you register.",
+        "tags": ["membership", "volunteer", "donor"],
+    },
+    {
+        "question": "Do you offer scholarships for students?",
+        "answer": "Yes. Arain Association Youth Wing Pakistan provides educational scholarships for deserving students, along with learning resources, career guidance, mentorship and educational workshops. Send us a message through the Contact page to apply.",
+        "tags": ["education", "scholarship", "study"],
+    },
+    {
+        "question": "When is the next free medical camp?",
+        "answer": "We organize free medical camps regularly in underserved areas, together with basic healthcare services and health awareness programs. Camp dates are announced by local chapters; contact us to find the next camp near you.",
+        "tags": ["health", "medical", "camp"],
+    },
+    {
+        "question": "How can I donate to the association?",
+        "answer": "Thank you for supporting our cause! Donations fund scholarships, medical camps and community welfare projects. Please submit the contact form with the subject 'Donation' and our team will share the donation methods with you.",
+        "tags": ["donate", "donation", "contribute"],
+    },
+    {
+        "question": "How do I contact the association?",
+        "answer": "Use the Contact Us page to send us a message with your name, email, phone number and subject. Our team reads every message and replies as soon as possible.",
+        "tags": ["contact", "help", "support"],
+    },
+    {
+        "question": "Can I become a blood donor?",
+        "answer": "Yes. Add your blood group when you register in the directory, or for each family member in a family registration. In emergencies we use this to find compatible donors near the patient.",
+        "tags": ["blood", "donor", "emergency"],
+    },
+    {
+        "question": "Is the association only for the Arain community?",
+        "answer": "Our focus is the Arain community, but our education, healthcare and welfare programs help everyone in need.",
+        "tags": ["about", "community"],
+    },
+]
+
+
+def _features(text: str) -> Dict[int, float]:
+    """Hash word unigrams, word bigrams and character trigrams into feature counts"""
+    tokens = [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+    grams = list(tokens)
+    grams.extend(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    for token in tokens:
+        padded = f"#{token}#"
+        grams.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+
+    counts: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % DIMENSIONS
+        counts[index] = counts.get(index, 0.0) + 1.0
+    return counts
+
+
+def vectorize(text: str) -> np.ndarray:
+    """Sublinear term frequency, L2-normalised hashed feature vector"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for index, count in _features(text).items():
+        vector[index] = 1.0 + math.log(count)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def entry_text(entry: dict) -> str:
+    # Match against what an entry answers, not the (long) answer text itself
+    return " ".join([entry.get("question", "")] + list(entry.get("tags") or []))
+
+
+@dataclass
+class FAQMatch:
+    id: str
+    question: str
+    answer: str
+    score: float
+
+
+class KnowledgeBase:
+    def __init__(self, capacity: int = 64):
+        self.matrix = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        self.entries: List[dict] = []
+        self.positions: Dict[str, int] = {}
+        self.last_synced_at: Optional[datetime] = None
+        self.last_refresh = 0.0
+        self._refresh_task = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def upsert(self, entry: dict):
+        """Add or replace a single entry; only that row of the matrix is (re)computed"""
+        entry_id = str(entry["_id"])
+        vector = vectorize(entry_text(entry))
+        position = self.positions.get(entry_id)
+        if position is None:
+            position = len(self.entries)
+            if position >= self.matrix.shape[0]:
+                grown = np.zeros((self.matrix.shape[0] * 2, DIMENSIONS), dtype=np.float32)
+                grown[:position] = self.matrix[:position]
+                self.matrix = grown
+            self.entries.append(entry)
+            self.positions[entry_id] = position
+        else:
+            self.entries[position] = entry
+        self.matrix[position] = vector
+
+    def remove(self, entry_id: str):
+        """Remove an entry by moving the last row into its slot"""
+        position = self.positions.pop(str(entry_id), None)
+        if position is None:
+            return
+        last = len(self.entries) - 1
+        if position != last:
+            moved = self.entries[last]
+            self.entries[position] = moved
+            self.matrix[position] = self.matrix[last]
+            self.positions[str(moved["_id"])] = position
+        self.entries.pop()
+        self.matrix[last] = 0
+
+    def search(self, query: str, k: int = 3) -> List[FAQMatch]:
+        """Top-k entries by cosine similarity"""
+        count = len(self.entries)
+        if count == 0 or not query.strip():
+            return []
+        scores = self.matrix[:count] @ vectorize(query)
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            FAQMatch(
+                id=str(self.entries[i]["_id"]),
+                question=self.entries[i]["question"],
+                answer=self.entries[i]["answer"],
+                score=float(scores[i])
+            )
+            for i in top
+        ]
+
+    def apply(self, documents: List[dict]):
+        """Apply changed documents from the collection (soft-deleted ones are removed)"""
+        for document in documents:
+            if document.get("deleted"):
+                self.remove(str(document["_id"]))
+            else:
+                self.upsert(document)
+            updated_at = document.get("updated_at")
+            if updated_at and (self.last_synced_at is None or updated_at > self.last_synced_at):
+                self.last_synced_at = updated_at
+
+    async def seed(self, db):
+        """Insert the default FAQs whose question isn't stored yet (a soft-deleted default stays deleted)"""
+        try:
+            # Before the upserts: concurrent upserts only stay single with the unique index in place
+            await db.faq_entries.create_indexes(FAQ_INDEXES)
+        except PyMongoError as e:
+            logger.warning(f"Could not ensure FAQ indexes (duplicate questions?): {e}")
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"question": faq["question"]},
+                {"$setOnInsert": {"answer": faq["answer"], "tags": faq["tags"], "deleted": False, "created_at": now, "updated_at": now}},
+                upsert=True
+            )
+            for faq in DEFAULT_FAQS
+        ]
+        try:
+            await db.faq_entries.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Another worker inserted the same question first
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    async def load(self, db):
+        """Load every entry, seeding the default FAQ corpus first"""
+        try:
+            await self.seed(db)
+            documents = await db.faq_entries.find({"deleted": {"$ne": True}}).to_list(length=None)
+            self.apply(documents)
+            self.last_refresh = time.monotonic()
+            logger.info(f"Loaded {len(self)} FAQ entries")
+        except Exception as e:
+            logger.error(f"Error loading FAQ knowledge base: {e}")
+
+    async def refresh(self, db):
+        """Pull entries changed since the last sync (including edits made by other workers)"""
+        query = {"updated_at": {"$gt": self.last_synced_at}} if self.last_synced_at else {}
+        documents = await db.faq_entries.find(query).sort("updated_at", 1).to_list(length=None)
+        self.apply(documents)
+
+    def maybe_refresh(self, db):
+        """Schedule a background refresh when the local copy is older than FAQ_REFRESH_SECONDS"""
+        if db is None or time.monotonic() - self.last_refresh < settings.faq_refresh_seconds:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self.last_refresh = time.monotonic()
+        self._refresh_task = asyncio.create_task(self._safe_refresh(db))
+
+    async def _safe_refresh(self, db):
+        try:
+            await self.refresh(db)
+        except Exception as e:
+            logger.warning(f"Could not refresh FAQ knowledge base: {e}")
+
+
+knowledge_base = KnowledgeBase()
@@ -1,14 +1,75 @@
+import asyncio
 import logging
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import connect_to_mongo, close_mongo_connection
+from app.compression import CompressionMiddleware
+from app.idempotency import IdempotencyMiddleware
+from app.ratelimit import RateLimitMiddleware, backend_from_settings
+from app.database import connect_to_mongo, ping_database, ensure_indexes, close_mongo_connection, get_database
 from app.auth import create_admin_user
-from app.routers import directory, contact, agent, auth
+from app import exports
+from app.knowledge_base import knowledge_base
+from app.jobs import job_runner
+from app.snapshot import directory_snapshot
+from app.events import live_updates
+from app.derived import derived_data
+from app.suggest import suggestions
+from app.reference import reference_data
+from app.migrations import migration_runner
+from app.routers import directory, contact, agent, auth, admin, live, analytics, reference
 
 logger = logging.getLogger("uvicorn.error")
-app = FastAPI(title=settings.app_name, version=settings.app_version, debug=settings.debug)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting up...")
+    # Each worker process creates its own client here, after any fork
+    await connect_to_mongo()
+    # Independent startup steps run concurrently; the ping still fails startup if Mongo is down
+    await asyncio.gather(ping_database(), ensure_indexes(), create_admin_user(), knowledge_base.load(get_database()), reference_data.load(get_database()))
+    # The vocabulary expands reference codes, so it loads once the table is in memory
+    await suggestions.load(get_database())
+    if settings.warm_exports:
+        app.state.warm_exports_task = asyncio.create_task(exports.warm_up())
+    if settings.jobs_enabled:
+        job_runner.start(get_database())
+    directory_snapshot.start(get_database(), settings.snapshot_interval_seconds)
+    live_updates.start(get_database())
+    derived_data.start(get_database())
+    suggestions.start(get_database(), settings.suggest_reload_interval_seconds)
+    # Backfills run in the background as jobs; startup doesn't wait for them
+    migration_runner.start(get_database())
+    logger.info("Startup complete.")
+
+    yield
+
+    logger.info("Shutting down...")
+    await migration_runner.stop()
+    await job_runner.stop()
+    await directory_snapshot.stop()
+    await live_updates.stop()
+    await derived_data.stop()
+    await suggestions.stop()
+    await agent.ai_agent.aclose()
+    await close_mongo_connection()
+    logger.info("Shutdown complete.")
+
+app = FastAPI(title=settings.app_name, version=settings.app_version, debug=settings.debug, lifespan=lifespan)
+
+# Idempotency-Key replays (innermost, so CORS and compression apply to replayed responses too)
+app.add_middleware(
+    IdempotencyMiddleware,
+    ttl_seconds=settings.idempotency_ttl_seconds,
+    cache_size=settings.idempotency_cache_size,
+    wait_seconds=settings.idempotency_wait_seconds
+)
+
+# Rate limits and load shedding, ahead of idempotency replays, validation and database work
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware, backend=backend_from_settings(), max_concurrent=settings.max_concurrent_requests)
 
 # CORS
 app.add_middleware(
@@ -19,25 +80,24 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-# Start-up and shutdown events
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting up...")
-    await connect_to_mongo()
-    await create_admin_user()
-    logger.info("Startup complete.")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down...")
-    await close_mongo_connection()
-    logger.info("Shutdown complete.")
+# Compression (added last, so it wraps everything else)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+    cache_bytes=settings.compression_cache_bytes
+)
 
 # Routers
 app.include_router(directory.directory_router, prefix="/api/directory", tags=["Directory"])
 app.include_router(contact.contact_router, prefix="/api/contact", tags=["Contact"])
 app.include_router(agent.agent_router, prefix="/api/agent", tags=["AI Agent"])
 app.include_router(auth.auth_router, prefix="/api/auth", tags=["Authentication"])
+app.include_router(admin.admin_router, prefix="/api/admin", tags=["Admin"])
+app.include_router(live.live_router, prefix="/api/admin", tags=["Admin"])
+app.include_router(analytics.analytics_router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(reference.reference_router, prefix="/api/reference", tags=["Reference Data"])
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host=settings.host, port=settings.port, reload=True)
@@ -0,0 +1,71 @@
+"""
+Minimal in-process metrics registry.
+
+Counters and latency summaries are kept per worker process and exposed
+through the admin router. Observations may come from driver threads (e.g.
+PyMongo monitoring listeners), so updates are guarded by a lock.
+"""
+import threading
+from collections import deque
+from typing import Dict
+
+
+class Summary:
+    """Count, sum and max of observations plus a sliding window for percentiles"""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def snapshot(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(int(p / 100.0 * len(ordered)), len(ordered) - 1)]
+
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "p50": round(pct(50), 3),
+            "p95": round(pct(95), 3),
+            "p99": round(pct(99), 3),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self.summaries: Dict[str, Summary] = {}
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self.summaries.get(name)
+            if summary is None:
+                summary = self.summaries[name] = Summary()
+            summary.observe(value)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "summaries": {name: summary.snapshot() for name, summary in self.summaries.items()},
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,358 @@
+"""
+Online data migrations: rewriting documents stored in an older shape.
+
+A ``Migration`` names a collection and a ``pending`` filter that matches the
+documents still in the old shape. Its async ``transform`` returns the update
+for one document, or None to leave the document alone. Migrated documents drop
+out of ``pending``, so running a migration again is a no-op.
+
+Each migration has one state document in the ``migrations`` collection:
+
+    {"_id": "family_member_ids", "status": "running", "checkpoint": ObjectId(...),
+     "total": 50000, "scanned": 1500, "modified": 1480, "skipped": 20, ...}
+
+Documents are read in ``_id`` order in batches of ``MIGRATION_BATCH_SIZE`` and
+written back with one unordered ``bulk_write`` per batch. After every batch the
+last ``_id`` is saved as the checkpoint. A run that was interrupted (worker
+restart, failed batch) resumes from the checkpoint rather than rescanning.
+Between batches the runner sleeps so that it is busy for at most
+``MIGRATION_DUTY_CYCLE`` of the time. At the default 0.5, a batch that took
+200 ms is followed by a 200 ms pause, so a large backfill slows down by itself
+when Mongo is busy.
+
+Each write is filtered on ``pending`` and on the ``guard`` fields as they were
+read. A document that was migrated or edited in the meantime is left alone
+(counted as skipped) and is picked up by a later run.
+
+Migrations run as ``migration`` jobs (``app.jobs``), so a run is leased to one
+worker, reports progress and is retried after a crash. After startup each worker
+queues a job for the migrations that haven't completed (``MIGRATIONS_AUTO_RUN``);
+startup doesn't wait for it. Admins can list, dry-run and queue migrations under
+``/api/admin/migrations``, or from a shell:
+
+    python -m app.migrations status
+    python -m app.migrations dry-run family_member_ids
+    python -m app.migrations run [family_member_ids]
+"""
+import asyncio
+import copy
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.reference import FIELDS as REFERENCE_FIELDS, reference_data
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = "migrations"
+SAMPLE_SIZE = 5
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+@dataclass
+class Migration:
+    id: str
+    description: str
+    collection: str
+    pending: dict
+    # (db, document, dry_run) -> update document, or None to leave the document as it is
+    transform: Callable[[Any, dict, bool], Awaitable[Optional[dict]]]
+    fields: List[str] = field(default_factory=list)  # read for the transform; all fields if empty
+    guard: List[str] = field(default_factory=list)  # must still hold the values read when the update is written
+    rebuilds: Tuple[str, ...] = ()  # derived-data rebuild jobs to queue once documents were modified
+
+    def projection(self) -> Optional[dict]:
+        if not self.fields:
+            return None
+        return {name: 1 for name in self.fields + self.guard}
+
+
+async def _start_version(db, document: dict, dry_run: bool) -> dict:
+    return {"$set": {"version": 1}}
+
+
+async def _assign_member_ids(db, family: dict, dry_run: bool) -> dict:
+    members = family.get("family_members") or []
+    for member in members:
+        if not member.get("member_id"):
+            member["member_id"] = str(ObjectId())
+    return {"$set": {"family_members": members}, "$inc": {"version": 1}}
+
+
+async def _count_members(db, family: dict, dry_run: bool) -> dict:
+    return {"$set": {"total_members": len(family.get("family_members") or [])}}
+
+
+async def _drop_duplicate_faq(db, entry: dict, dry_run: bool) -> Optional[dict]:
+    # Keep the oldest live entry for each question
+    original = await db.faq_entries.find_one(
+        {"question": entry.get("question"), "deleted": {"$ne": True}, "_id": {"$lt": entry["_id"]}}, {"_id": 1}
+    )
+    if original is None:
+        return None
+    return {"$set": {"deleted": True, "updated_at": datetime.utcnow()}}
+
+
+async def _encode_reference_fields(db, document: dict, dry_run: bool) -> Optional[dict]:
+    return await reference_data.migration_update(db, document, dry_run)
+
+
+REFERENCE_PENDING = {"$or": [{name: {"$type": "string"}} for name in REFERENCE_FIELDS]}
+
+# Run in this order
+REGISTRY: List[Migration] = [
+    Migration(
+        "directory_versions", "Start the optimistic-concurrency version at 1 on entries created before versions",
+        "directory", {"version": {"$exists": False}}, _start_version, fields=["_id"],
+    ),
+    Migration(
+        "family_versions", "Start the optimistic-concurrency version at 1 on families created before versions",
+        "family_directory", {"version": {"$exists": False}}, _start_version, fields=["_id"],
+    ),
+    Migration(
+        "family_member_ids", "Give family members stored before member IDs a stable member_id",
+        "family_directory", {"family_members": {"$elemMatch": {"member_id": None}}}, _assign_member_ids,
+        fields=["family_members"], guard=["updated_at"],
+    ),
+    Migration(
+        "family_total_members", "Set total_members on legacy families from their family_members",
+        "family_directory", {"total_members": None}, _count_members,
+        fields=["family_members"], guard=["updated_at"], rebuilds=("rollup_rebuild",),
+    ),
+    Migration(
+        "reference_codes", "Store province, district, city and caste as reference-data codes",
+        "directory", REFERENCE_PENDING, _encode_reference_fields,
+        fields=list(REFERENCE_FIELDS), guard=list(REFERENCE_FIELDS), rebuilds=("rollup_rebuild", "donor_index_rebuild"),
+    ),
+    Migration(
+        "family_reference_codes", "Store family province, district, city and caste as reference-data codes",
+        "family_directory", REFERENCE_PENDING, _encode_reference_fields,
+        fields=list(REFERENCE_FIELDS), guard=list(REFERENCE_FIELDS), rebuilds=("rollup_rebuild", "donor_index_rebuild"),
+    ),
+    Migration(
+        "faq_duplicates", "Soft-delete FAQ entries seeded more than once by workers starting together",
+        "faq_entries", {"deleted": {"$ne": True}}, _drop_duplicate_faq, fields=["question"], guard=["updated_at"],
+    ),
+]
+
+
+def get(migration_id: str) -> Migration:
+    """The registered migration; raises KeyError for an unknown ID"""
+    for migration in REGISTRY:
+        if migration.id == migration_id:
+            return migration
+    raise KeyError(migration_id)
+
+
+def throttle_pause(elapsed: float, duty_cycle: float) -> float:
+    """Seconds to sleep after a batch that took ``elapsed`` seconds to stay busy ``duty_cycle`` of the time"""
+    if duty_cycle >= 1:
+        return 0.0
+    return elapsed * (1 - duty_cycle) / max(duty_cycle, 0.01)
+
+
+async def statuses(db) -> List[dict]:
+    """Every registered migration in run order, with its state (``pending`` if it never ran)"""
+    states = {state["_id"]: state for state in await db[MIGRATIONS].find({}).to_list(length=None)}
+    for state in states.values():
+        if state.get("checkpoint") is not None:
+            state["checkpoint"] = str(state["checkpoint"])
+    return [
+        {
+            "id": migration.id,
+            "description": migration.description,
+            "collection": migration.collection,
+            "status": PENDING,
+            **{key: value for key, value in states.get(migration.id, {}).items() if key != "_id"},
+        }
+        for migration in REGISTRY
+    ]
+
+
+async def dry_run(db, migration: Migration, sample_size: int = SAMPLE_SIZE) -> dict:
+    """How many documents the migration would visit, with the updates for the first few; writes nothing"""
+    collection = db[migration.collection]
+    documents = await collection.find(migration.pending, migration.projection()).sort("_id", 1).to_list(length=sample_size)
+    samples = []
+    for document in documents:
+        before = {key: value for key, value in document.items() if key != "_id"}
+        update = await migration.transform(db, copy.deepcopy(document), True)
+        samples.append({"_id": str(document["_id"]), "before": before, "update": update})
+    return {"id": migration.id, "pending": await collection.count_documents(migration.pending), "samples": samples}
+
+
+async def _queue_rebuilds(db, migration: Migration):
+    from app.derived import REBUILD_FUNCTIONS
+    from app.jobs import job_runner
+    for job_type in migration.rebuilds:
+        if settings.jobs_enabled:
+            await job_runner.submit(db, job_type, submitted_by=f"migration:{migration.id}")
+        else:
+            await REBUILD_FUNCTIONS[job_type](db)
+
+
+async def run(db, migration: Migration, progress=None, batch_size: Optional[int] = None,
+              duty_cycle: Optional[float] = None) -> dict:
+    """Apply ``migration`` in throttled batches, resuming from the checkpoint of an unfinished run"""
+    batch_size = batch_size or settings.migration_batch_size
+    duty_cycle = settings.migration_duty_cycle if duty_cycle is None else duty_cycle
+    collection = db[migration.collection]
+    state = await db[MIGRATIONS].find_one({"_id": migration.id}) or {}
+    checkpoint = state.get("checkpoint") if state.get("status") in (RUNNING, FAILED) else None
+    counts = {key: state.get(key, 0) if checkpoint is not None else 0 for key in ("scanned", "modified", "skipped")}
+    total = state.get("total") if checkpoint is not None else await collection.count_documents(migration.pending)
+    if checkpoint is not None:
+        logger.info(f"Resuming migration {migration.id} after {checkpoint}")
+
+    now = datetime.utcnow()
+    started_at = state.get("started_at") if checkpoint is not None else now
+    await db[MIGRATIONS].update_one(
+        {"_id": migration.id},
+        {"$set": {
+            "status": RUNNING, "checkpoint": checkpoint, "total": total, **counts, "error": None,
+            "started_at": started_at, "finished_at": None, "updated_at": now,
+        }},
+        upsert=True
+    )
+    try:
+        while True:
+            batch_started = time.monotonic()
+            query = migration.pending if checkpoint is None else {"$and": [migration.pending, {"_id": {"$gt": checkpoint}}]}
+            batch = await collection.find(query, migration.projection()).sort("_id", 1).limit(batch_size).to_list(length=None)
+            if not batch:
+                break
+            operations = []
+            for document in batch:
+                update = await migration.transform(db, document, False)
+                if update is None:
+                    counts["skipped"] += 1
+                    continue
+                guard = {"_id": document["_id"], **{name: document.get(name) for name in migration.guard}}
+                operations.append(UpdateOne({"$and": [guard, migration.pending]}, update))
+            if operations:
+                result = await collection.bulk_write(operations, ordered=False)
+                counts["modified"] += result.modified_count
+                counts["skipped"] += len(operations) - result.modified_count
+            counts["scanned"] += len(batch)
+            checkpoint = batch[-1]["_id"]
+            await db[MIGRATIONS].update_one(
+                {"_id": migration.id},
+                {"$set": {"checkpoint": checkpoint, **counts, "updated_at": datetime.utcnow()}}
+            )
+            if progress is not None:
+                await progress(min(counts["scanned"] / max(total, 1), 1.0))
+            await asyncio.sleep(throttle_pause(time.monotonic() - batch_started, duty_cycle))
+    except Exception as e:
+        await db[MIGRATIONS].update_one(
+            {"_id": migration.id}, {"$set": {"status": FAILED, "error": str(e), "updated_at": datetime.utcnow()}}
+        )
+        raise
+
+    now = datetime.utcnow()
+    await db[MIGRATIONS].update_one(
+        {"_id": migration.id},
+        {"$set": {"status": COMPLETED, "checkpoint": None, **counts, "finished_at": now, "updated_at": now}}
+    )
+    summary = {"total": total, **counts}
+    logger.info(f"Migration {migration.id}: {summary}")
+    if counts["modified"]:
+        await _queue_rebuilds(db, migration)
+    return summary
+
+
+async def run_pending(db, progress=None) -> Dict[str, dict]:
+    """Run every migration that hasn't completed, in registry order"""
+    completed = {state["id"] for state in await statuses(db) if state["status"] == COMPLETED}
+    remaining = [migration for migration in REGISTRY if migration.id not in completed]
+    summaries = {}
+    for index, migration in enumerate(remaining):
+        async def step(fraction: float, index=index):
+            if progress is not None:
+                await progress((index + fraction) / len(remaining))
+        summaries[migration.id] = await run(db, migration, step)
+    return summaries
+
+
+class MigrationRunner:
+    """Queues the unfinished migrations after startup, without holding startup up"""
+
+    def __init__(self):
+        self._task = None
+
+    async def _schedule(self, db):
+        from app.jobs import job_runner, QUEUED, RUNNING as JOB_RUNNING
+        try:
+            if all(state["status"] == COMPLETED for state in await statuses(db)):
+                return
+            if not settings.jobs_enabled:
+                await run_pending(db)
+                return
+            # Every worker starts up at once; only one of them needs to queue the run
+            if await db.jobs.find_one({"type": "migration", "status": {"$in": [QUEUED, JOB_RUNNING]}}) is None:
+                await job_runner.submit(db, "migration", submitted_by="startup")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Could not run pending migrations: {e}")
+
+    def start(self, db):
+        if settings.migrations_auto_run:
+            self._task = asyncio.create_task(self._schedule(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+migration_runner = MigrationRunner()
+
+
+async def _main(argv=None):
+    import argparse
+    import json
+    from app.database import connect_to_mongo, close_mongo_connection, database
+
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Inspect and run data migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="List migrations and their progress")
+    preview = commands.add_parser("dry-run", help="Count pending documents and show sample updates")
+    preview.add_argument("migration")
+    apply = commands.add_parser("run", help="Run one migration, or every unfinished one")
+    apply.add_argument("migration", nargs="?")
+    apply.add_argument("--batch-size", type=int)
+    apply.add_argument("--duty-cycle", type=float)
+    args = parser.parse_args(argv)
+
+    await connect_to_mongo()
+    db = database.database
+    try:
+        await reference_data.load(db)
+        if args.command == "status":
+            result = await statuses(db)
+        elif args.command == "dry-run":
+            result = await dry_run(db, get(args.migration))
+        elif args.migration:
+            async def report(fraction: float):
+                print(f"{args.migration}: {fraction:.0%}", flush=True)
+            result = await run(db, get(args.migration), report, args.batch_size, args.duty_cycle)
+        else:
+            result = await run_pending(db)
+        print(json.dumps(result, indent=2, default=str))
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
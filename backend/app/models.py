@@ -123,6 +123,7 @@ class DirectoryResponse(BaseModel):
     family_members_count: Optional[int]  # New field for number of family members
     created_at: datetime
     updated_at: datetime
+    version: int = 1
     
     class Config:
         populate_by_name = True
@@ -146,6 +147,7 @@ class DirectoryUpdate(BaseModel):
     family_members_count: Optional[int] = Field(None, ge=1, le=50)  # New field for number of family members
     notes: Optional[str] = Field(None, max_length=500)
     profile_image: Optional[str] = None
+    version: Optional[int] = Field(None, ge=1)  # expected current version; the update fails with 412 if it changed
 
 # Contact Models
 class ContactCreate(BaseModel):
@@ -226,6 +228,89 @@ class ConversationResponse(BaseModel):
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str, datetime: lambda v: v.isoformat()}
 
+# FAQ Knowledge Base Models
+class FAQCreate(BaseModel):
+    question: str = Field(..., min_length=5, max_length=300)
+    answer: str = Field(..., min_length=5, max_length=2000)
+    tags: List[str] = Field(default_factory=list)
+
+class FAQResponse(BaseModel):
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    question: str
+    answer: str
+    tags: List[str] = []
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str, datetime: lambda v: v.isoformat()}
+
+# Background Job Models
+class JobType(str, Enum):
+    EXPORT_CSV = "export_csv"
+    EXPORT_PDF = "export_pdf"
+    ROLLUP_REBUILD = "rollup_rebuild"
+    DONOR_INDEX_REBUILD = "donor_index_rebuild"
+    TIMESERIES_BACKFILL = "timeseries_backfill"
+    MIGRATION = "migration"
+
+class SuggestField(str, Enum):
+    CITY = "city"
+    DISTRICT = "district"
+    PROFESSION = "profession"
+    CASTE = "caste"
+
+class ReferenceKind(str, Enum):
+    PROVINCE = "province"
+    DISTRICT = "district"
+    CITY = "city"
+    CASTE = "caste"
+
+class RollupSource(str, Enum):
+    DIRECTORY = "directory"
+    FAMILY = "family"
+
+class TimeSeries(str, Enum):
+    DIRECTORY = "directory"
+    FAMILY_DIRECTORY = "family_directory"
+    CONTACT_MESSAGES = "contact_messages"
+    CONVERSATIONS = "conversations"
+
+class Granularity(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class JobCreate(BaseModel):
+    type: JobType
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class JobResponse(BaseModel):
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    type: JobType
+    status: JobStatus
+    progress: float = 0.0
+    attempts: int = 0
+    error: Optional[str] = None
+    artifact_filename: Optional[str] = None
+    submitted_by: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str, datetime: lambda v: v.isoformat()}
+
 # Generic Response Models
 class APIResponse(BaseModel):
     success: bool
@@ -240,9 +325,11 @@ class PaginatedResponse(BaseModel):
     page: int
     limit: int
     total_pages: int
+    facets: Optional[Dict[str, List[dict]]] = None  # only with ?facets=true: {dimension: [{"value", "count"}]}
 
 # Family Member Model
 class FamilyMember(BaseModel):
+    member_id: Optional[str] = None  # assigned by the server; a full update may send existing IDs back to keep them
     name: str = Field(..., min_length=2, max_length=100)
     age: int = Field(..., ge=0, le=120)
     gender: Gender
@@ -255,6 +342,19 @@ class FamilyMember(BaseModel):
     blood_group: Optional[BloodGroup] = None
     notes: Optional[str] = Field(None, max_length=500)
 
+class FamilyMemberUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=2, max_length=100)
+    age: Optional[int] = Field(None, ge=0, le=120)
+    gender: Optional[Gender] = None
+    relation: Optional[Relation] = None
+    cnic: Optional[str] = Field(None, pattern=r'^\d{5}-\d{7}-\d{1}$')
+    profession: Optional[str] = Field(None, max_length=100)
+    qualification: Optional[str] = Field(None, max_length=100)
+    phone: Optional[str] = Field(None, pattern=r'^\+92\d{10}$')
+    email: Optional[EmailStr] = None
+    blood_group: Optional[BloodGroup] = None
+    notes: Optional[str] = Field(None, max_length=500)
+
 # Family Directory Models
 class FamilyDirectoryCreate(BaseModel):
     head_of_family_name: str = Field(..., min_length=2, max_length=100)
@@ -296,6 +396,7 @@ class FamilyDirectoryResponse(BaseModel):
     family_photo: Optional[str]
     created_at: datetime
     updated_at: datetime
+    version: int = 1
     
     class Config:
         populate_by_name = True
@@ -316,6 +417,7 @@ class FamilyDirectoryUpdate(BaseModel):
     membership_type: Optional[MembershipType] = None
     notes: Optional[str] = Field(None, max_length=500)
     family_photo: Optional[str] = None
+    version: Optional[int] = Field(None, ge=1)  # expected current version; the update fails with 412 if it changed
 
 # Population Response Model
 class PopulationResponse(BaseModel):
@@ -334,6 +436,8 @@ class CasteStatsResponse(BaseModel):
     data: List[CasteStats]
     total_families: int
     total_population: int
+    # Last full rollup rebuild; changes since are applied in the background and can lag. None when counted live.
+    as_of: Optional[datetime] = None
 
 # Filter Models
 class DirectoryFilter(BaseModel):
@@ -345,6 +449,7 @@ class DirectoryFilter(BaseModel):
     membership_type: Optional[MembershipType] = None
     page: int = Field(default=1, ge=1)
     limit: int = Field(default=10, ge=1, le=100)
+    facets: bool = False
     
 class FamilyDirectoryFilter(BaseModel):
     city: Optional[str] = None
@@ -356,3 +461,7 @@ class FamilyDirectoryFilter(BaseModel):
     max_members: Optional[int] = Field(None, le=50)
     page: int = Field(default=1, ge=1)
     limit: int = Field(default=10, ge=1, le=100)
+    facets: bool = False
+
+class ReferenceAliasCreate(BaseModel):
+    aliases: List[str] = Field(..., min_length=1, max_length=20)
@@ -0,0 +1,345 @@
+"""
+Debug-only query profiler.
+
+When enabled, ``get_database()`` hands out a thin wrapper around the Motor
+database that times every query issued by the routers, groups them by a
+normalized query shape and, for queries slower than the configured threshold,
+runs ``explain`` in the background to capture docs examined and whether the
+winning plan was a COLLSCAN. Results are exposed through the admin router.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Operators whose argument is a list of sub-queries rather than a value
+LOGICAL_OPERATORS = {"$and", "$or", "$nor"}
+# Operators that can be served by an index as a range scan
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$ne", "$regex", "$exists"}
+
+
+def normalize_shape(value: Any) -> Any:
+    """Replace literal values in a query with placeholders, keeping field names and operators."""
+    if isinstance(value, dict):
+        return {key: normalize_shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, list):
+        # Pipelines and $and/$or lists keep their structure; value lists collapse
+        if value and all(isinstance(item, dict) for item in value):
+            return [normalize_shape(item) for item in value]
+        return ["?"]
+    return "?"
+
+
+def normalize_sort(sort: Any) -> Optional[List[Tuple[str, int]]]:
+    """Normalize the various sort spellings accepted by Motor into a list of pairs."""
+    if not sort:
+        return None
+    if isinstance(sort, str):
+        return [(sort, 1)]
+    if isinstance(sort, dict):
+        return list(sort.items())
+    return [(key, direction) for key, direction in sort]
+
+
+def suggest_index(filter_spec: Optional[dict], sort: Optional[List[Tuple[str, int]]] = None) -> Optional[Dict[str, int]]:
+    """Suggest a compound index following the equality, sort, range (ESR) rule."""
+    equality: List[str] = []
+    ranges: List[str] = []
+
+    def visit(spec: dict):
+        for field, condition in spec.items():
+            if field in LOGICAL_OPERATORS:
+                for clause in condition:
+                    visit(clause)
+            elif field.startswith("$"):
+                continue
+            elif isinstance(condition, dict) and any(op in RANGE_OPERATORS for op in condition):
+                ranges.append(field)
+            else:
+                equality.append(field)
+
+    visit(filter_spec or {})
+
+    index: Dict[str, int] = {}
+    for field in equality:
+        index.setdefault(field, 1)
+    for field, direction in sort or []:
+        index.setdefault(field, direction)
+    for field in ranges:
+        index.setdefault(field, 1)
+
+    if not index or list(index) == ["_id"]:
+        return None
+    return index
+
+
+def summarize_explain(explain: dict) -> Dict[str, Any]:
+    """Pull docs/keys examined and plan stages out of an explain document of any command type."""
+    summary = {"docs_examined": None, "keys_examined": None, "stages": []}
+
+    def walk(node: Any):
+        if isinstance(node, dict):
+            if "totalDocsExamined" in node and summary["docs_examined"] is None:
+                summary["docs_examined"] = node["totalDocsExamined"]
+            if "totalKeysExamined" in node and summary["keys_examined"] is None:
+                summary["keys_examined"] = node["totalKeysExamined"]
+            stage = node.get("stage")
+            if isinstance(stage, str) and stage not in summary["stages"]:
+                summary["stages"].append(stage)
+            for item in node.values():
+                walk(item)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    summary["collscan"] = "COLLSCAN" in summary["stages"]
+    return summary
+
+
+def index_inputs(operation: str, spec: dict) -> Tuple[Optional[dict], Optional[List[Tuple[str, int]]]]:
+    """Return the filter and sort an index would have to serve for a recorded query."""
+    if operation != "aggregate":
+        return spec.get("filter"), normalize_sort(spec.get("sort"))
+
+    # Only a leading $match (optionally followed by $sort) can use an index
+    pipeline = spec.get("pipeline") or []
+    filter_spec, sort = None, None
+    if pipeline and "$match" in pipeline[0]:
+        filter_spec = pipeline[0]["$match"]
+        if len(pipeline) > 1 and "$sort" in pipeline[1]:
+            sort = normalize_sort(pipeline[1]["$sort"])
+    elif pipeline and "$sort" in pipeline[0]:
+        sort = normalize_sort(pipeline[0]["$sort"])
+    return filter_spec, sort
+
+
+class QueryProfiler:
+    """In-memory store of query timings grouped by (collection, operation, shape)."""
+
+    def __init__(self, slow_query_ms: float, max_shapes: int = 500):
+        self.slow_query_ms = slow_query_ms
+        self.max_shapes = max_shapes
+        self.shapes: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._explained = set()
+        self._explain_tasks = set()
+
+    def reset(self):
+        self.shapes.clear()
+        self._explained.clear()
+
+    def record(self, db, collection: str, operation: str, spec: dict, duration_ms: float):
+        """Record a finished query and schedule an explain when it was slow."""
+        filter_spec, sort = index_inputs(operation, spec)
+        shape_spec = {key: value for key, value in spec.items() if value is not None}
+        if sort:
+            # Keep sort field names in the shape; only the directions are literals
+            shape_spec["sort"] = {field: direction for field, direction in sort}
+        shape = json.dumps(normalize_shape(shape_spec), sort_keys=True)
+        key = (collection, operation, shape)
+
+        entry = self.shapes.get(key)
+        if entry is None:
+            if len(self.shapes) >= self.max_shapes:
+                return
+            entry = self.shapes[key] = {
+                "collection": collection,
+                "operation": operation,
+                "shape": json.loads(shape),
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "slow_count": 0,
+                "docs_examined": None,
+                "keys_examined": None,
+                "stages": [],
+                "collscan": None,
+                "suggested_index": suggest_index(filter_spec, sort),
+            }
+
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+
+        if duration_ms >= self.slow_query_ms:
+            entry["slow_count"] += 1
+            if key not in self._explained:
+                self._explained.add(key)
+                task = asyncio.create_task(self._explain(db, collection, operation, spec, entry))
+                self._explain_tasks.add(task)
+                task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain(self, db, collection: str, operation: str, spec: dict, entry: dict):
+        """Run explain for a slow query and attach the plan summary to its shape."""
+        command = build_explain_command(collection, operation, spec)
+        if command is None:
+            return
+        try:
+            explain = await db.command({"explain": command, "verbosity": "executionStats"})
+            entry.update(summarize_explain(explain))
+        except Exception as e:
+            logger.warning(f"Could not explain {operation} on {collection}: {e}")
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Return recorded shapes, slowest total time first."""
+        rows = []
+        for entry in self.shapes.values():
+            row = dict(entry)
+            row["avg_ms"] = round(entry["total_ms"] / entry["count"], 3) if entry["count"] else 0.0
+            row["total_ms"] = round(entry["total_ms"], 3)
+            row["max_ms"] = round(entry["max_ms"], 3)
+            rows.append(row)
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def build_explain_command(collection: str, operation: str, spec: dict) -> Optional[dict]:
+    """Translate a recorded query into the equivalent command for ``explain``."""
+    filter_spec = spec.get("filter") or {}
+    if operation in ("find", "find_one"):
+        command = {"find": collection, "filter": filter_spec}
+        sort = normalize_sort(spec.get("sort"))
+        if sort:
+            command["sort"] = dict(sort)
+        if spec.get("skip"):
+            command["skip"] = spec["skip"]
+        if spec.get("limit"):
+            command["limit"] = spec["limit"]
+        if operation == "find_one":
+            command["limit"] = 1
+        return command
+    if operation == "count_documents":
+        return {"count": collection, "query": filter_spec}
+    if operation == "distinct":
+        return {"distinct": collection, "key": spec.get("key"), "query": filter_spec}
+    if operation == "aggregate":
+        return {"aggregate": collection, "pipeline": spec.get("pipeline") or [], "cursor": {}}
+    if operation in ("update_one", "update_many"):
+        return {"update": collection, "updates": [{"q": filter_spec, "u": spec.get("update") or {}, "multi": operation == "update_many"}]}
+    if operation in ("delete_one", "delete_many"):
+        return {"delete": collection, "deletes": [{"q": filter_spec, "limit": 1 if operation == "delete_one" else 0}]}
+    return None
+
+
+class ProfiledCursor:
+    """Wraps a Motor cursor so that ``to_list`` is timed against the accumulated find spec."""
+
+    def __init__(self, cursor, collection: "ProfiledCollection", operation: str, spec: dict):
+        self._cursor = cursor
+        self._collection = collection
+        self._operation = operation
+        self._spec = spec
+
+    def sort(self, key_or_list, direction=None):
+        self._spec["sort"] = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else key_or_list
+        self._cursor = self._cursor.sort(key_or_list, direction) if direction is not None else self._cursor.sort(key_or_list)
+        return self
+
+    def skip(self, skip: int):
+        self._spec["skip"] = skip
+        self._cursor = self._cursor.skip(skip)
+        return self
+
+    def limit(self, limit: int):
+        self._spec["limit"] = limit
+        self._cursor = self._cursor.limit(limit)
+        return self
+
+    async def to_list(self, length=None):
+        started = time.perf_counter()
+        try:
+            return await self._cursor.to_list(length=length)
+        finally:
+            self._collection._record(self._operation, self._spec, started)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ProfiledCollection:
+    """Wraps a Motor collection, timing the read and write helpers used by the routers."""
+
+    def __init__(self, collection, db, profiler: QueryProfiler):
+        self._collection = collection
+        self._db = db
+        self._profiler = profiler
+
+    def _record(self, operation: str, spec: dict, started: float):
+        duration_ms = (time.perf_counter() - started) * 1000
+        self._profiler.record(self._db, self._collection.name, operation, spec, duration_ms)
+
+    async def _timed(self, operation: str, spec: dict, call):
+        started = time.perf_counter()
+        try:
+            return await call
+        finally:
+            self._record(operation, spec, started)
+
+    def find(self, filter=None, *args, **kwargs):
+        spec = {"filter": filter or {}, "sort": kwargs.get("sort"), "skip": kwargs.get("skip"), "limit": kwargs.get("limit")}
+        return ProfiledCursor(self._collection.find(filter, *args, **kwargs), self, "find", spec)
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        return ProfiledCursor(self._collection.aggregate(pipeline, *args, **kwargs), self, "aggregate", {"pipeline": pipeline})
+
+    async def find_one(self, filter=None, *args, **kwargs):
+        return await self._timed("find_one", {"filter": filter or {}, "sort": kwargs.get("sort")}, self._collection.find_one(filter, *args, **kwargs))
+
+    async def count_documents(self, filter, *args, **kwargs):
+        return await self._timed("count_documents", {"filter": filter}, self._collection.count_documents(filter, *args, **kwargs))
+
+    async def distinct(self, key, filter=None, *args, **kwargs):
+        return await self._timed("distinct", {"key": key, "filter": filter or {}}, self._collection.distinct(key, filter, *args, **kwargs))
+
+    async def update_one(self, filter, update, *args, **kwargs):
+        return await self._timed("update_one", {"filter": filter, "update": update}, self._collection.update_one(filter, update, *args, **kwargs))
+
+    async def update_many(self, filter, update, *args, **kwargs):
+        return await self._timed("update_many", {"filter": filter, "update": update}, self._collection.update_many(filter, update, *args, **kwargs))
+
+    async def delete_one(self, filter, *args, **kwargs):
+        return await self._timed("delete_one", {"filter": filter}, self._collection.delete_one(filter, *args, **kwargs))
+
+    async def delete_many(self, filter, *args, **kwargs):
+        return await self._timed("delete_many", {"filter": filter}, self._collection.delete_many(filter, *args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+class ProfiledDatabase:
+    """Wraps a Motor database so that every collection it hands out is profiled."""
+
+    def __init__(self, db, profiler: QueryProfiler):
+        self._db = db
+        self._profiler = profiler
+
+    def __getitem__(self, name):
+        return ProfiledCollection(self._db[name], self._db, self._profiler)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            return getattr(self._db, name)
+        attr = getattr(self._db, name)
+        if isinstance(attr, AsyncIOMotorCollection):
+            return ProfiledCollection(attr, self._db, self._profiler)
+        return attr
+
+
+query_profiler = QueryProfiler(slow_query_ms=settings.slow_query_ms)
+
+
+def profiler_enabled() -> bool:
+    """The profiler only ever runs in debug mode, and only when explicitly switched on."""
+    return settings.debug and settings.query_profiler
+
+
+def wrap_database(db):
+    """Return a profiled view of ``db`` when the profiler is enabled."""
+    if db is None or not profiler_enabled():
+        return db
+    return ProfiledDatabase(db, query_profiler)
@@ -0,0 +1,247 @@
+"""
+Rate limiting and load shedding for the public endpoints.
+
+``RateLimitMiddleware`` sits in front of the routers, so a rejected request
+never reaches body validation, bcrypt or MongoDB.
+
+Load shedding: each worker counts the requests it is serving. Requests have a
+priority, and each priority is admitted only while the count is below its
+share of ``MAX_CONCURRENT_REQUESTS``. Anything above gets ``503`` with
+``Retry-After`` at once, instead of queueing behind work the worker can't
+finish. Shedding starts with the cheapest to retry and most expensive to serve:
+
+- low (50%): chat, which may call the paid LLM, and public directory reads;
+- normal (80%): everything else, such as login, registration and contact;
+- high (100%): requests from admins.
+
+Rate limits: each rule (``default_rules``) gives every client a token bucket
+that holds ``limit`` requests and refills at ``limit`` per ``period``. So a
+client can burst up to the limit, then continues at the average rate. Over the
+limit, a request gets ``429`` with ``Retry-After``. Anonymous clients are keyed
+by IP; requests with a valid access token are keyed by its user ID, since
+anyone can register and log in. Only admins (the token's ``role`` claim) aren't
+rate limited. Behind a reverse proxy the client IP comes from
+``X-Forwarded-For``, via Uvicorn's proxy headers.
+
+Buckets are per worker by default (``RATE_LIMIT_BACKEND=memory``), which
+multiplies the effective limit by the worker count. ``RATE_LIMIT_BACKEND=mongo``
+shares them through the ``rate_limits`` collection, refilling and taking in a
+single atomic update. If Mongo is unreachable, requests are let through.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from jose import JWTError, jwt
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.metrics import metrics
+from app.models import UserRole
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITS = "rate_limits"
+RATE_LIMIT_INDEXES = [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)]
+
+LOW = "low"
+NORMAL = "normal"
+HIGH = "high"
+PRIORITY_SHARES = {LOW: 0.5, NORMAL: 0.8, HIGH: 1.0}
+
+# (method, path prefix) of requests shed first
+LOW_PRIORITY = [("POST", "/api/agent/chat"), ("GET", "/api/directory")]
+# Long-lived streams would hold a concurrency slot for as long as the dashboard is open
+UNCOUNTED = ["/api/admin/live"]
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    method: str
+    path: str
+    limit: int
+    period: float
+    prefix: bool = False
+
+    def matches(self, method: str, path: str) -> bool:
+        if method != self.method:
+            return False
+        return path.startswith(self.path) if self.prefix else path == self.path
+
+
+def default_rules() -> List[Rule]:
+    """The configured rules; a limit of 0 turns a rule off"""
+    rules = [
+        Rule("chat", "POST", "/api/agent/chat", settings.rate_limit_chat_per_minute, 60),
+        Rule("login", "POST", "/api/auth/login", settings.rate_limit_login_per_minute, 60),
+        Rule("register", "POST", "/api/auth/register", settings.rate_limit_register_per_hour, 3600),
+        Rule("contact", "POST", "/api/contact/", settings.rate_limit_contact_per_hour, 3600),
+        Rule("directory_write", "POST", "/api/directory/", settings.rate_limit_directory_writes_per_hour, 3600, prefix=True),
+        Rule("directory_read", "GET", "/api/directory", settings.rate_limit_directory_reads_per_minute, 60, prefix=True),
+    ]
+    return [rule for rule in rules if rule.limit > 0]
+
+
+def refill(tokens: float, updated: float, now: float, limit: int, period: float) -> Tuple[float, float]:
+    """Tokens after refilling since ``updated``, and the seconds until one more is available"""
+    rate = limit / period
+    tokens = min(float(limit), tokens + max(now - updated, 0.0) * rate)
+    return tokens, 0.0 if tokens >= 1 else (1 - tokens) / rate
+
+
+class MemoryBackend:
+    """Token buckets in this worker, bounded by LRU eviction"""
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: int, period: float) -> float:
+        """Take a token: 0 if one was available, otherwise the seconds to wait"""
+        now = self.clock()
+        tokens, updated = self._buckets.get(key, (float(limit), now))
+        tokens, retry_after = refill(tokens, updated, now, limit, period)
+        if retry_after == 0:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+class MongoBackend:
+    """Token buckets shared by every worker through the ``rate_limits`` collection"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock  # wall clock: buckets are shared across hosts
+
+    async def take(self, key: str, limit: int, period: float) -> float:
+        from app.database import get_database
+        collection = get_database()[RATE_LIMITS]
+        now = self.clock()
+        rate = limit / period
+        # refill() as an update pipeline, so concurrent requests can't both spend the same token
+        refilled = {"$min": [float(limit), {"$add": [
+            {"$ifNull": ["$tokens", float(limit)]},
+            {"$multiply": [{"$max": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, 0.0]}, rate]},
+        ]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated": now, "expires_at": datetime.utcnow() + timedelta(seconds=period)}},
+            {"$set": {
+                "granted": {"$gte": ["$tokens", 1]},
+                "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+            }},
+        ]
+        try:
+            bucket = await collection.find_one_and_update({"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # Another request created the bucket first; it exists now
+            bucket = await collection.find_one_and_update({"_id": key}, pipeline, return_document=ReturnDocument.AFTER)
+        return 0.0 if bucket["granted"] else (1 - bucket["tokens"]) / rate
+
+
+class LoadShedder:
+    """Admits a request while this worker's in-flight count is below its priority's share of the limit"""
+
+    def __init__(self, max_concurrent: int = 0):
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+
+    def admit(self, priority: str) -> bool:
+        if self.max_concurrent > 0 and self.in_flight >= self.max_concurrent * PRIORITY_SHARES[priority]:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+
+def _claims(scope, headers: Headers) -> Optional[dict]:
+    """The claims of a validly signed access token (checked without a database lookup)"""
+    authorization = headers.get("authorization", "")
+    token = authorization[7:] if authorization[:7].lower() == "bearer " else None
+    if not token:
+        return None
+    try:
+        claims = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return None
+    return claims if claims.get("sub") else None
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, rules: Optional[List[Rule]] = None, backend=None, max_concurrent: int = 0):
+        self.app = app
+        self.rules = default_rules() if rules is None else rules
+        self.backend = backend or MemoryBackend()
+        self.shedder = LoadShedder(max_concurrent)
+
+    def priority(self, method: str, path: str, admin: bool) -> str:
+        if admin:
+            return HIGH
+        if any(method == low_method and path.startswith(low_path) for low_method, low_path in LOW_PRIORITY):
+            return LOW
+        return NORMAL
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        method, path = scope["method"], scope["path"]
+        claims = _claims(scope, Headers(scope=scope))
+        admin = claims is not None and claims.get("role") == UserRole.ADMIN.value
+
+        counted = path not in UNCOUNTED
+        if counted:
+            priority = self.priority(method, path, admin)
+            if not self.shedder.admit(priority):
+                metrics.incr(f"shed.{priority}")
+                await JSONResponse({"detail": "Server is busy, please retry shortly"}, status_code=503, headers={"Retry-After": "1"})(scope, receive, send)
+                return
+        try:
+            if not admin:
+                retry_after = await self._limit(scope, method, path, claims)
+                if retry_after:
+                    await JSONResponse(
+                        {"detail": "Too many requests, please slow down"}, status_code=429,
+                        headers={"Retry-After": str(math.ceil(retry_after))}
+                    )(scope, receive, send)
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            if counted:
+                self.shedder.release()
+
+    async def _limit(self, scope, method: str, path: str, claims: Optional[dict]) -> float:
+        if claims is not None:
+            caller = f"user:{claims['sub']}"
+        else:
+            client = scope.get("client")
+            caller = client[0] if client else "unknown"
+        for rule in self.rules:
+            if not rule.matches(method, path):
+                continue
+            try:
+                retry_after = await self.backend.take(f"{rule.name}:{caller}", rule.limit, rule.period)
+            except PyMongoError as e:
+                logger.warning(f"Rate limit backend unavailable, letting request through: {e}")
+                return 0.0
+            if retry_after:
+                metrics.incr(f"ratelimit.{rule.name}")
+                return retry_after
+        return 0.0
+
+
+def backend_from_settings():
+    return MongoBackend() if settings.rate_limit_backend == "mongo" else MemoryBackend()
@@ -0,0 +1,287 @@
+"""
+Reference data: canonical provinces, districts, cities and castes.
+
+Directory and family entries store ``province``, ``district``, ``city`` and
+``caste`` as small integer codes into the ``reference_data`` collection:
+
+    {"_id": 12, "kind": "city", "name": "Lahore", "key": "lahore", "parent": 11, "aliases": ["lhr"]}
+
+A city's ``parent`` is its district and a district's is its province, which
+gives the province → district → city hierarchy. Write handlers ``encode``
+incoming names. A name is matched case- and whitespace-insensitively, or
+through an alias, so "lahore ", "LAHORE" and "LHR" all become the same code.
+Every worker keeps the whole table in memory, with canonical names interned by
+``sys.intern``. Read paths ``expand`` codes back to names before responding, so
+the API still shows names. Codes that another worker added are fetched on
+first sight.
+
+Only admin writes intern unknown names as new entries. The public create
+endpoints pass ``create=False``: a name that isn't known yet (often a typo such
+as "Lahor") is stored as the string it arrived as, so anonymous input can't
+grow the canonical table. An admin can make it an alias of the right entry, or
+accept it as a new one by running the ``reference_codes`` migrations, whose
+dry run lists the names they would add.
+
+Entries written before codes existed, or with a name that wasn't known, hold
+strings. Every read path passes strings through unchanged and filters match
+both forms until the ``reference_codes`` migration (``app.migrations``) has
+rewritten them.
+"""
+import logging
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson.regex import Regex
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+REFERENCE = "reference_data"
+COUNTERS = "reference_counters"
+FIELDS = ["province", "district", "city", "caste"]
+HIERARCHY = ["province", "district", "city"]
+
+REFERENCE_INDEXES = [
+    IndexModel([("kind", ASCENDING), ("key", ASCENDING)], unique=True),
+    IndexModel([("kind", ASCENDING), ("aliases", ASCENDING)]),
+    IndexModel([("parent", ASCENDING)]),
+]
+
+# Seeded into an empty collection; anything else is interned as it is first written
+SEED_PROVINCES = {
+    "Punjab": [],
+    "Sindh": [],
+    "Khyber Pakhtunkhwa": ["KPK", "KP", "NWFP"],
+    "Balochistan": ["Baluchistan"],
+    "Islamabad Capital Territory": ["ICT"],
+    "Gilgit-Baltistan": ["GB"],
+    "Azad Jammu and Kashmir": ["AJK", "AJ&K"],
+}
+# (province, district, city, city aliases)
+SEED_CITIES = [
+    ("Punjab", "Lahore", "Lahore", ["LHR"]),
+    ("Punjab", "Faisalabad", "Faisalabad", ["FSD", "Lyallpur"]),
+    ("Punjab", "Rawalpindi", "Rawalpindi", ["Pindi", "RWP"]),
+    ("Punjab", "Multan", "Multan", []),
+    ("Punjab", "Gujranwala", "Gujranwala", []),
+    ("Sindh", "Karachi", "Karachi", ["KHI"]),
+    ("Sindh", "Hyderabad", "Hyderabad", []),
+    ("Khyber Pakhtunkhwa", "Peshawar", "Peshawar", []),
+    ("Balochistan", "Quetta", "Quetta", []),
+    ("Islamabad Capital Territory", "Islamabad", "Islamabad", ["ISB"]),
+]
+
+
+def spelling(value: str) -> str:
+    return " ".join(value.split())
+
+
+def reference_key(value: str) -> str:
+    return spelling(value).casefold()
+
+
+def is_code(value) -> bool:
+    return type(value) is int
+
+
+class ReferenceData:
+    def __init__(self):
+        self.entries: Dict[int, dict] = {}  # code -> {"kind", "name", "parent"}
+        self.codes: Dict[Tuple[str, str], int] = {}  # (kind, key or alias) -> code
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.codes.clear()
+
+    def _add(self, entry: dict):
+        kind = entry["kind"]
+        self.entries[entry["_id"]] = {"kind": kind, "name": sys.intern(entry["name"]), "parent": entry.get("parent")}
+        self.codes[(kind, entry["key"])] = entry["_id"]
+        for alias in entry.get("aliases") or []:
+            self.codes[(kind, alias)] = entry["_id"]
+
+    async def load(self, db):
+        """Load the whole table, seeding the canonical provinces and major cities into an empty collection"""
+        try:
+            if await db[REFERENCE].count_documents({}) == 0:
+                for province, aliases in SEED_PROVINCES.items():
+                    await self.intern(db, "province", province, aliases=aliases)
+                for province, district, city, aliases in SEED_CITIES:
+                    await self.encode(db, {"province": province, "district": district, "city": city})
+                    await self.add_alias(db, "city", self.codes[("city", reference_key(city))], aliases)
+            for entry in await db[REFERENCE].find({}).to_list(length=None):
+                self._add(entry)
+            logger.info(f"Loaded {len(self)} reference data entries")
+        except Exception as e:
+            logger.error(f"Error loading reference data: {e}")
+
+    async def resolve(self, db, values: Iterable):
+        """Fetch the entries for any codes in ``values`` this worker hasn't seen yet"""
+        missing = {value for value in values if is_code(value) and value not in self.entries}
+        if missing:
+            for entry in await db[REFERENCE].find({"_id": {"$in": list(missing)}}).to_list(length=None):
+                self._add(entry)
+
+    def name(self, value):
+        """The name for a code (after ``resolve``); anything else is returned unchanged"""
+        if is_code(value) and value in self.entries:
+            return self.entries[value]["name"]
+        return value
+
+    async def expand(self, db, documents: List[dict]) -> List[dict]:
+        """Replace the codes in ``documents`` with names, in place"""
+        await self.resolve(db, (document.get(field) for document in documents for field in FIELDS))
+        for document in documents:
+            for field in FIELDS:
+                if is_code(document.get(field)):
+                    document[field] = self.name(document[field])
+        return documents
+
+    async def lookup(self, db, kind: str, value: str) -> Optional[int]:
+        """The code of an existing name or alias, or None"""
+        key = reference_key(value)
+        code = self.codes.get((kind, key))
+        if code is None:
+            entry = await db[REFERENCE].find_one({"kind": kind, "$or": [{"key": key}, {"aliases": key}]})
+            if entry is not None:
+                self._add(entry)
+                code = entry["_id"]
+        return code
+
+    async def intern(self, db, kind: str, value: str, parent: Optional[int] = None, aliases: Iterable[str] = ()) -> int:
+        """The code for ``value``, creating an entry for a new name"""
+        code = await self.lookup(db, kind, value)
+        if code is not None:
+            if parent is not None and self.entries[code]["parent"] is None:
+                await db[REFERENCE].update_one({"_id": code, "parent": None}, {"$set": {"parent": parent}})
+                self.entries[code]["parent"] = parent
+            return code
+
+        counter = await db[COUNTERS].find_one_and_update(
+            {"_id": REFERENCE}, {"$inc": {"next": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        key = reference_key(value)
+        entry = {
+            "_id": counter["next"], "kind": kind, "name": spelling(value), "key": key, "parent": parent,
+            "aliases": sorted({reference_key(alias) for alias in aliases} - {key}),
+        }
+        try:
+            await db[REFERENCE].insert_one(entry)
+        except DuplicateKeyError:
+            # Another worker interned the same name first; its code wins
+            entry = await db[REFERENCE].find_one({"kind": kind, "key": key})
+        self._add(entry)
+        return entry["_id"]
+
+    async def add_alias(self, db, kind: str, code: int, aliases: Iterable[str]) -> List[str]:
+        """Make ``aliases`` resolve to ``code``; raises ValueError for an alias that names another entry"""
+        keys = sorted({reference_key(alias) for alias in aliases if alias.strip()})
+        for key in keys:
+            existing = await self.lookup(db, kind, key)
+            if existing is not None and existing != code:
+                raise ValueError(f"'{key}' already refers to {kind} {existing}")
+        entry = await db[REFERENCE].find_one_and_update(
+            {"_id": code, "kind": kind}, {"$addToSet": {"aliases": {"$each": keys}}}, return_document=ReturnDocument.AFTER
+        )
+        if entry is None:
+            raise KeyError(code)
+        self._add(entry)
+        return entry["aliases"]
+
+    async def encode(self, db, data: dict, create: bool = True) -> dict:
+        """Replace the reference fields in incoming (possibly partial) entry data with codes, in place
+
+        With ``create=False`` (public writes) unknown names stay strings and no entry is added or re-parented.
+        """
+        parent = None
+        for kind in HIERARCHY + ["caste"]:
+            value = data.get(kind)
+            if isinstance(value, str) and value.strip():
+                if create:
+                    data[kind] = await self.intern(db, kind, value, parent if kind != "caste" else None)
+                else:
+                    code = await self.lookup(db, kind, value)
+                    data[kind] = code if code is not None else spelling(value)
+            # Link a level to its parent only when both arrive together
+            parent = data[kind] if is_code(data.get(kind)) else None
+        return data
+
+    async def match(self, db, kind: str, value: str):
+        """Query condition for an exact filter on ``kind``: the code, or the name as unmigrated entries store it"""
+        code = await self.lookup(db, kind, value)
+        if code is None:
+            return value
+        return {"$in": list(dict.fromkeys([code, self.name(code), value]))}
+
+    async def match_pattern(self, db, kind: str, pattern: str):
+        """Query condition for a case-insensitive regex filter on ``kind``"""
+        entries = await db[REFERENCE].find(
+            {"kind": kind, "name": {"$regex": pattern, "$options": "i"}}, {"_id": 1}
+        ).to_list(length=None)
+        return {"$in": [Regex(pattern, "i")] + [entry["_id"] for entry in entries]}
+
+    async def unknown_names(self, db, kind: str) -> List[dict]:
+        """Names of ``kind`` stored as strings (unknown when written, or unmigrated), with how many entries hold each"""
+        counts: Dict[str, int] = {}
+        for collection in ("directory", "family_directory"):
+            pipeline = [{"$match": {kind: {"$type": "string"}}}, {"$group": {"_id": f"${kind}", "count": {"$sum": 1}}}]
+            for group in await db[collection].aggregate(pipeline).to_list(length=None):
+                name = spelling(group["_id"])
+                if name:
+                    counts[name] = counts.get(name, 0) + group["count"]
+        return [{"name": name, "count": count} for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+
+    def tree(self) -> List[dict]:
+        """Provinces with their districts and cities, alphabetically"""
+        children: Dict[Optional[int], List[int]] = {}
+        for code, entry in self.entries.items():
+            if entry["kind"] in HIERARCHY:
+                children.setdefault(entry["parent"], []).append(code)
+
+        def build(code: int) -> dict:
+            entry = self.entries[code]
+            node = {"code": code, "name": entry["name"]}
+            if entry["kind"] != "city":
+                node["districts" if entry["kind"] == "province" else "cities"] = [
+                    build(child) for child in sorted(children.get(code, []), key=lambda child: self.entries[child]["name"])
+                ]
+            return node
+
+        provinces = [code for code, entry in self.entries.items() if entry["kind"] == "province"]
+        return [build(code) for code in sorted(provinces, key=lambda code: self.entries[code]["name"])]
+
+    def listing(self, kind: str) -> List[dict]:
+        entries = [(code, entry) for code, entry in self.entries.items() if entry["kind"] == kind]
+        return [
+            {"code": code, "name": entry["name"], "parent": entry["parent"]}
+            for code, entry in sorted(entries, key=lambda item: item[1]["name"])
+        ]
+
+    async def migration_update(self, db, document: dict, dry_run: bool = False) -> Optional[dict]:
+        """The update that rewrites a stored entry's string reference fields as codes, or None
+
+        A dry run interns nothing; names that would become new entries show up as ``{"new": name}``.
+        """
+        original = {field: document[field] for field in FIELDS if isinstance(document.get(field), str) and document[field].strip()}
+        if dry_run:
+            changes = {}
+            for field, value in original.items():
+                code = await self.lookup(db, field, value)
+                changes[field] = {"new": spelling(value)} if code is None else code
+        else:
+            changes = await self.encode(db, dict(original))
+        if not changes:
+            return None
+        update = {"$set": changes}
+        # Entries whose stored spelling differs from the canonical name now read differently
+        if any(self.name(code) != original[field] for field, code in changes.items()):
+            update["$set"] = {**changes, "updated_at": datetime.utcnow()}
+            update["$inc"] = {"version": 1}
+        return update
+
+reference_data = ReferenceData()
@@ -0,0 +1,213 @@
+"""
+Precomputed demographic rollup cube.
+
+Every directory entry and family entry contributes counts to a few cube cells
+in ``rollup_cube``. A cell is one combination of the dimensions
+
+    province × district × city × caste × gender × membership_type × blood_group
+
+with additive measures. Directory entries (source ``directory``) add
+``entries`` and ``community_strength`` (their ``family_members_count``).
+Family entries (source ``family``) add two levels of cells:
+
+* a household cell with ``gender`` and ``blood_group`` set to ``"*"``, holding
+  ``families`` and ``members`` (its ``total_members``);
+* one cell per distinct member gender/blood group, holding ``members``.
+
+Queries group the cells of one level by the requested dimensions, so they
+never touch ``directory`` or ``family_directory``. Because the cells are few
+(one per distinct combination, not per person), answers take a few ms.
+
+Writes keep the cube current incrementally: ``refresh`` recomputes one
+document's cells (run in the background by ``app.derived`` after each write). Each document's last contribution is stored in
+``rollup_contributions`` and swapped atomically, so only the difference is
+applied with ``$inc`` and concurrent refreshes add up correctly. A full
+rebuild (the ``rollup_rebuild`` job, scheduled every
+``ROLLUP_REBUILD_INTERVAL_SECONDS``) corrects any drift, e.g. from writes made
+outside the API. The rebuilt cube carries a marker document with its build
+time (``built_at``); until the first rebuild there is none, and the cube only
+holds what refreshes have added since, so it can't answer for all entries yet.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+
+from app.reference import reference_data
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ["province", "district", "city", "caste", "gender", "membership_type", "blood_group"]
+MEMBER_DIMENSIONS = {"gender", "blood_group"}
+ALL = "*"
+
+SOURCES = {"directory": "directory", "family": "family_directory"}
+MEASURES = {
+    "directory": ["entries", "community_strength"],
+    "family": ["families", "members"],
+}
+
+CUBE = "rollup_cube"
+CONTRIBUTIONS = "rollup_contributions"
+BUILD_MARKER = "build"  # _id and source of the cube document recording the last rebuild
+REBUILD_BATCH_SIZE = 1000
+
+CUBE_INDEXES = [
+    IndexModel([("source", ASCENDING), ("province", ASCENDING), ("district", ASCENDING), ("city", ASCENDING)]),
+    IndexModel([("source", ASCENDING), ("caste", ASCENDING)]),
+]
+
+
+def _value(value):
+    if value is None:
+        return None
+    value = getattr(value, "value", value)
+    return value.strip() if isinstance(value, str) else value
+
+
+def cell_key(source: str, dims: Dict[str, Optional[str]]) -> str:
+    return json.dumps([source] + [dims.get(name) for name in DIMENSIONS], ensure_ascii=False)
+
+
+def contributions(source: str, document: dict) -> Dict[str, dict]:
+    """The cells a document adds to, keyed by cell key: {"key", "dims", "measures"}"""
+    cells: Dict[str, dict] = {}
+
+    def add(dims: dict, measures: Dict[str, int]):
+        key = cell_key(source, dims)
+        cell = cells.setdefault(key, {"key": key, "dims": dims, "measures": {}})
+        for name, amount in measures.items():
+            cell["measures"][name] = cell["measures"].get(name, 0) + amount
+
+    if source == "directory":
+        dims = {name: _value(document.get(name)) for name in DIMENSIONS}
+        add(dims, {"entries": 1, "community_strength": document.get("family_members_count") or 1})
+        return cells
+
+    household = {name: _value(document.get(name)) for name in DIMENSIONS if name not in MEMBER_DIMENSIONS}
+    members = document.get("family_members") or []
+    add({**household, "gender": ALL, "blood_group": ALL},
+        {"families": 1, "members": document.get("total_members") or len(members)})
+    for member in members:
+        add({**household, "gender": _value(member.get("gender")), "blood_group": _value(member.get("blood_group"))},
+            {"members": 1})
+    return cells
+
+
+def _cell_updates(source: str, old: Dict[str, dict], new: Dict[str, dict]) -> List[Tuple[dict, dict]]:
+    updates = []
+    for key in set(old) | set(new):
+        cell = new.get(key) or old[key]
+        old_measures = old.get(key, {}).get("measures", {})
+        new_measures = new.get(key, {}).get("measures", {})
+        delta = {
+            name: new_measures.get(name, 0) - old_measures.get(name, 0)
+            for name in set(old_measures) | set(new_measures)
+        }
+        delta = {name: amount for name, amount in delta.items() if amount}
+        if delta:
+            updates.append(({"_id": key}, {"$inc": delta, "$setOnInsert": {"source": source, **cell["dims"]}}))
+    return updates
+
+
+async def refresh(db, source: str, document_id) -> int:
+    """Bring the cube in line with one document's current state; returns the number of cells changed"""
+    document = await db[SOURCES[source]].find_one({"_id": ObjectId(document_id)})
+    contribution_id = f"{source}:{document_id}"
+    if document is None:
+        previous = await db[CONTRIBUTIONS].find_one_and_delete({"_id": contribution_id})
+        cells = {}
+    else:
+        await reference_data.expand(db, [document])
+        cells = contributions(source, document)
+        previous = await db[CONTRIBUTIONS].find_one_and_update(
+            {"_id": contribution_id},
+            {"$set": {"cells": list(cells.values())}},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+    old = {cell["key"]: cell for cell in (previous or {}).get("cells", [])}
+    # A document touches only a handful of cells
+    updates = _cell_updates(source, old, cells)
+    await asyncio.gather(*(db[CUBE].update_one(selector, update, upsert=True) for selector, update in updates))
+    return len(updates)
+
+
+async def rebuild(db, progress=None) -> dict:
+    """Recompute the whole cube from the source collections and swap it in"""
+    cube: Dict[str, dict] = {}
+    records = []
+    scanned = 0
+    for source, collection in SOURCES.items():
+        cursor = db[collection].find({}).sort("_id", 1)
+        while True:
+            batch = await cursor.to_list(length=REBUILD_BATCH_SIZE)
+            if not batch:
+                break
+            await reference_data.expand(db, batch)
+            for document in batch:
+                cells = contributions(source, document)
+                records.append({"_id": f"{source}:{document['_id']}", "cells": list(cells.values())})
+                for key, cell in cells.items():
+                    target = cube.setdefault(key, {"_id": key, "source": source, **cell["dims"]})
+                    for name, amount in cell["measures"].items():
+                        target[name] = target.get(name, 0) + amount
+            scanned += len(batch)
+            if progress is not None:
+                await progress(scanned)
+
+    marker = {"_id": BUILD_MARKER, "source": BUILD_MARKER, "built_at": datetime.utcnow()}
+    # Build next to the live collections, then rename over them so readers never see a half-built cube
+    for name, documents in ((CUBE, list(cube.values()) + [marker]), (CONTRIBUTIONS, records)):
+        staging = db[f"{name}_build"]
+        await staging.drop()
+        for start in range(0, len(documents), REBUILD_BATCH_SIZE):
+            await staging.insert_many(documents[start:start + REBUILD_BATCH_SIZE], ordered=False)
+        if name == CUBE:
+            # The rename replaces the live collection's indexes with the staging collection's
+            await staging.create_indexes(CUBE_INDEXES)
+        if documents:
+            await staging.rename(name, dropTarget=True)
+        else:
+            await db[name].delete_many({})
+    logger.info(f"Rollup cube rebuilt: {scanned} documents, {len(cube)} cells")
+    return {"documents": scanned, "cells": len(cube)}
+
+
+async def built_at(db) -> Optional[datetime]:
+    """When the cube was last rebuilt, or None if it never was"""
+    marker = await db[CUBE].find_one({"_id": BUILD_MARKER})
+    return marker["built_at"] if marker else None
+
+
+async def query(db, source: str, dimensions: List[str], filters: Dict[str, str]) -> dict:
+    """Group the cube by ``dimensions`` after applying equality ``filters``"""
+    measures = MEASURES[source]
+    match = {"source": source, **filters}
+    if source == "family":
+        if MEMBER_DIMENSIONS & (set(dimensions) | set(filters)):
+            # Per-member cells: households can't be split by member gender or blood group
+            measures = ["members"]
+            match.setdefault("gender", {"$ne": ALL})
+        else:
+            match.update({"gender": ALL, "blood_group": ALL})
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {name: f"${name}" for name in dimensions} or None,
+            **{name: {"$sum": f"${name}"} for name in measures},
+        }},
+        {"$sort": {name: -1 for name in measures}},
+    ]
+    rows = []
+    for group in await db[CUBE].aggregate(pipeline).to_list(length=None):
+        values = {name: group.get(name, 0) for name in measures}
+        if any(values.values()):  # cells emptied by deletes linger until the next rebuild
+            rows.append({**(group["_id"] or {}), **values})
+    totals = {name: sum(row[name] for row in rows) for name in measures}
+    return {"source": source, "dimensions": dimensions, "filters": filters, "measures": measures, "rows": rows, "totals": totals}
@@ -0,0 +1,150 @@
+from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import StreamingResponse
+from app.models import APIResponse, JobCreate, JobResponse
+from app.auth import get_current_admin_user
+from app.database import get_database
+from app.jobs import job_runner, COMPLETED
+from app import migrations
+from app.profiler import query_profiler, profiler_enabled
+from app.metrics import metrics
+from app.cache import document_cache
+from bson import ObjectId
+import logging
+
+logger = logging.getLogger(__name__)
+
+admin_router = APIRouter(dependencies=[Depends(get_current_admin_user)])
+
+@admin_router.get("/profiler/queries", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def get_profiled_queries():
+    """Recorded query shapes with timings, explain summaries and suggested indexes (Admin only)"""
+    if not profiler_enabled():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Query profiler is disabled; set DEBUG=True and QUERY_PROFILER=True"
+        )
+    
+    return APIResponse(
+        success=True,
+        message="Profiled queries",
+        data={
+            "slow_query_ms": query_profiler.slow_query_ms,
+            "queries": query_profiler.report()
+        }
+    )
+
+@admin_router.delete("/profiler/queries", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def reset_profiled_queries():
+    """Clear recorded query shapes (Admin only)"""
+    query_profiler.reset()
+    return APIResponse(success=True, message="Query profiler reset")
+
+@admin_router.get("/metrics", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def get_metrics():
+    """In-process counters, latency summaries and document cache hit ratios for this worker (Admin only)"""
+    return APIResponse(success=True, message="Metrics", data={**metrics.snapshot(), "document_cache": document_cache.stats()})
+
+@admin_router.post("/jobs", response_model=APIResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(job_data: JobCreate, current_user = Depends(get_current_admin_user)):
+    """Queue a background job (e.g. export_csv, export_pdf) and return its ID for polling (Admin only)"""
+    db = get_database()
+    try:
+        job_id = await job_runner.submit(db, job_data.type.value, job_data.params, submitted_by=current_user.email)
+        return APIResponse(success=True, message="Job queued", data={"id": str(job_id)})
+    except Exception as e:
+        logger.error(f"Error submitting job: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error submitting job")
+
+@admin_router.get("/jobs", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def list_jobs(limit: int = 50):
+    """Most recent jobs first (Admin only)"""
+    db = get_database()
+    try:
+        jobs = await db.jobs.find().sort("created_at", -1).limit(min(max(limit, 1), 200)).to_list(length=None)
+        return APIResponse(
+            success=True,
+            message="Jobs retrieved successfully",
+            data={"jobs": [JobResponse(**job).model_dump(mode="json", by_alias=True) for job in jobs]}
+        )
+    except Exception as e:
+        logger.error(f"Error listing jobs: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error retrieving jobs")
+
+async def _get_job(db, job_id: str) -> dict:
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    job = await db.jobs.find_one({"_id": ObjectId(job_id)})
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+@admin_router.get("/jobs/{job_id}", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def get_job(job_id: str):
+    """Status and progress of a job (Admin only)"""
+    db = get_database()
+    try:
+        job = await _get_job(db, job_id)
+        return APIResponse(success=True, message="Job retrieved successfully", data=JobResponse(**job).model_dump(mode="json", by_alias=True))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving job {job_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error retrieving job")
+
+@admin_router.get("/jobs/{job_id}/artifact", status_code=status.HTTP_200_OK)
+async def download_job_artifact(job_id: str):
+    """Stream a completed job's artifact (Admin only)"""
+    db = get_database()
+    try:
+        job = await _get_job(db, job_id)
+        if job["status"] != COMPLETED or not job.get("artifact_id"):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is {job['status']}; no artifact yet")
+
+        chunks = await job_runner.artifacts.open(db, job["artifact_id"])
+        response = StreamingResponse(chunks, media_type=job["artifact_content_type"])
+        response.headers["Content-Disposition"] = f"attachment; filename={job['artifact_filename']}"
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error downloading artifact for job {job_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error downloading job artifact")
+
+@admin_router.get("/migrations", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def list_migrations():
+    """Data migrations in run order with their status, checkpoint and counts (Admin only)"""
+    db = get_database()
+    try:
+        return APIResponse(success=True, message="Migrations retrieved successfully", data={"migrations": await migrations.statuses(db)})
+    except Exception as e:
+        logger.error(f"Error listing migrations: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error retrieving migrations")
+
+def _migration(migration_id: str) -> migrations.Migration:
+    try:
+        return migrations.get(migration_id)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Migration not found")
+
+@admin_router.get("/migrations/{migration_id}/dry-run", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def dry_run_migration(migration_id: str):
+    """Number of documents a migration would visit and the updates for the first few; writes nothing (Admin only)"""
+    migration = _migration(migration_id)
+    db = get_database()
+    try:
+        return APIResponse(success=True, message="Migration dry run", data=await migrations.dry_run(db, migration))
+    except Exception as e:
+        logger.error(f"Error in migration dry run: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error running migration dry run")
+
+@admin_router.post("/migrations/{migration_id}/run", response_model=APIResponse, status_code=status.HTTP_202_ACCEPTED)
+async def run_migration(migration_id: str, current_user = Depends(get_current_admin_user)):
+    """Queue a migration job; an unfinished run resumes from its checkpoint (Admin only)"""
+    _migration(migration_id)
+    db = get_database()
+    try:
+        job_id = await job_runner.submit(db, "migration", {"migration": migration_id}, submitted_by=current_user.email)
+        return APIResponse(success=True, message="Migration queued", data={"id": str(job_id)})
+    except Exception as e:
+        logger.error(f"Error queueing migration: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Error queueing migration")
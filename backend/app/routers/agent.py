@@ -1,10 +1,19 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from typing import Optional, List
-from app.models import ChatMessage, ChatResponse, ConversationResponse, APIResponse
+from app.models import ChatMessage, ChatResponse, ConversationResponse, APIResponse, FAQCreate, FAQResponse
 from app.config import settings
-from app.database import get_database
+from app.database import get_database, get_read_database
 from app.auth import get_current_admin_user
+from app.circuit_breaker import CircuitBreaker, LatencyTracker
+from app.metrics import metrics
+from app.knowledge_base import knowledge_base, FAQMatch
+from app.intents import intent_engine
+from app import timeseries
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+import asyncio
 import httpx
+import time
 import uuid
 import json
 from datetime import datetime
@@ -15,7 +24,19 @@ logger = logging.getLogger(__name__)
 agent_router = APIRouter()
 
 class AIAgent:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, models: Optional[List[str]] = None):
+        # One pooled client for all chat calls; the per-attempt timeout bounds how long a degraded upstream can hold a request
+        self.http_client = http_client or httpx.AsyncClient(timeout=settings.ai_request_timeout)
+        self.models = models or settings.ai_models
+        self.breakers = {
+            model: CircuitBreaker(
+                failure_threshold=settings.ai_breaker_failure_threshold,
+                recovery_timeout=settings.ai_breaker_recovery_seconds,
+                half_open_max_calls=settings.ai_breaker_half_open_calls
+            )
+            for model in self.models
+        }
+        self.latencies = {model: LatencyTracker() for model in self.models}
         self.system_prompt = """
 You are a helpful AI assistant for Arain Association Youth Wing Pakistan, an NGO focused on community welfare, education, and healthcare.
 
@@ -53,142 +74,118 @@ Always be helpful, respectful, and encouraging. Keep responses concise but infor
 """
     
     async def get_ai_response(self, user_message: str, session_id: str) -> str:
-        """Get response from OpenRouter AI API"""
-        if not settings.openrouter_api_key:
-            return self.get_fallback_response(user_message)
+        """Get response from OpenRouter AI API, trying each configured model in order"""
+        knowledge_base.maybe_refresh(get_database())
+        matches = knowledge_base.search(user_message, k=settings.faq_top_k)
+        if matches and self._is_confident(matches):
+            # Answered locally in milliseconds, no LLM call
+            metrics.incr("ai.faq_direct_answers")
+            return matches[0].answer
         
-        try:
-            headers = {
-                "Authorization": f"Bearer {settings.openrouter_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": settings.ai_model,
-                "messages": [
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 500
-            }
-
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions", 
-                    headers=headers, 
-                    json=payload
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["choices"][0]["message"]["content"]
-                else:
-                    logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-                    return self.get_fallback_response(user_message)
-                    
-        except Exception as e:
-            logger.error(f"Error calling OpenRouter API: {e}")
+        if not settings.openrouter_api_key:
             return self.get_fallback_response(user_message)
-    
-    def get_fallback_response(self, user_message: str) -> str:
-        """Fallback responses when AI API is not available"""
-        message_lower = user_message.lower()
         
-        if any(word in message_lower for word in ['volunteer', 'join', 'register', 'directory']):
-            return """Thank you for your interest in joining Arain Association Youth Wing Pakistan! 
-            
-To register as a member/volunteer, I'll need some information from you:
-            
-1. Your full name
-2. Father's name
-3. CNIC number
-4. Contact details (phone & email)
-5. Education and profession
-6. Location (city, district, province)
-            
-Would you like to start the registration process? Please share your full name first."""
+        messages = [
+            {"role": "system", "content": self.system_prompt + self._faq_context(matches)},
+            {"role": "user", "content": user_message}
+        ]
         
-        elif any(word in message_lower for word in ['contact', 'help', 'support']):
-            return """I'm here to help! You can:
-            
-1. Register as a member/volunteer/donor
-2. Get information about our services
-3. Submit a contact message
-4. Learn about our welfare projects
-            
-What would you like to know more about?"""
+        for model in self.models:
+            if not self.breakers[model].allow_request():
+                # Circuit open: skip straight to the next model instead of waiting on a timeout
+                metrics.incr(f"ai.circuit_rejected.{model}")
+                continue
+            try:
+                return await self._call_with_hedge(model, messages)
+            except Exception as e:
+                logger.error(f"Error calling OpenRouter API with model {model}: {e}")
         
-        elif any(word in message_lower for word in ['education', 'scholarship', 'study']):
-            return """Arain Association Youth Wing Pakistan provides:
-            
-📚 Educational scholarships for deserving students
-📖 Learning centers and educational resources
-🎓 Career guidance and mentorship
-📝 Educational workshops and training
-            
-Would you like to know more about our educational programs or apply for support?"""
+        metrics.incr("ai.fallback_responses")
+        return self.get_fallback_response(user_message)
+    
+    def _is_confident(self, matches: List[FAQMatch]) -> bool:
+        best = matches[0].score
+        runner_up = matches[1].score if len(matches) > 1 else 0.0
+        return best >= settings.faq_answer_threshold and best - runner_up >= settings.faq_answer_margin
+    
+    def _faq_context(self, matches: List[FAQMatch]) -> str:
+        relevant = [match for match in matches if match.score >= settings.faq_context_threshold]
+        if not relevant:
+            return ""
+        passages = "\n".join(f"Q: {match.question}\nA: {match.answer}" for match in relevant)
+        return f"\nRelevant entries from our FAQ (prefer these facts when answering):\n{passages}\n"
+    
+    async def _call_model(self, model: str, messages: List[dict]) -> str:
+        """Single chat completion call; updates the model's breaker and latency window"""
+        breaker = self.breakers[model]
+        started = time.perf_counter()
+        try:
+            response = await self.http_client.post(
+                f"{settings.openrouter_base_url}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {settings.openrouter_api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": model,
+                    "messages": messages,
+                    "temperature": 0.7,
+                    "max_tokens": 500
+                }
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"OpenRouter API error: {response.status_code} - {response.text}")
+            content = response.json()["choices"][0]["message"]["content"]
+        except asyncio.CancelledError:
+            # Lost a hedging race; that says nothing about the upstream's health
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
         
-        elif any(word in message_lower for word in ['health', 'medical', 'healthcare']):
-            return """Our healthcare services include:
-            
-🏥 Free medical camps in underserved areas
-💊 Basic healthcare services
-🩺 Health awareness programs
-🚑 Emergency medical assistance
-            
-We organize regular medical camps. Would you like information about upcoming camps?"""
+        elapsed = time.perf_counter() - started
+        breaker.record_success()
+        self.latencies[model].record(elapsed)
+        metrics.observe(f"ai.latency_ms.{model}", elapsed * 1000)
+        return content
+    
+    async def _call_with_hedge(self, model: str, messages: List[dict]) -> str:
+        """Call a model, sending a second (hedged) request if the first is slower than usual"""
+        primary = asyncio.create_task(self._call_model(model, messages))
+        hedge_delay = None
+        if settings.ai_hedge_enabled:
+            hedge_delay = self.latencies[model].percentile(settings.ai_hedge_percentile, settings.ai_hedge_min_samples)
+        if hedge_delay is None:
+            return await primary
         
-        elif any(word in message_lower for word in ['donate', 'donation', 'contribute']):
-            return """Thank you for considering a donation to support our cause!
-            
-Your contributions help us:
-✅ Provide educational scholarships
-✅ Organize medical camps
-✅ Run community welfare projects
-✅ Support families in need
-            
-Would you like to know more about donation methods or submit a contact form?"""
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done or not self.breakers[model].allow_request():
+            return await primary
         
-        else:
-            return """Hello! I'm here to help you with Arain Association Youth Wing Pakistan.
-            
-I can assist you with:
-🔹 Joining as a member/volunteer/donor
-🔹 Information about our services
-🔹 Educational programs and scholarships
-🔹 Healthcare services and medical camps
-🔹 Donation and contribution options
-            
-How can I help you today?"""
+        metrics.incr("ai.hedged_requests")
+        pending = {primary, asyncio.create_task(self._call_model(model, messages))}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+    
+    async def aclose(self):
+        await self.http_client.aclose()
+    
+    def get_fallback_response(self, user_message: str) -> str:
+        """Fallback responses when AI API is not available, in the user's language"""
+        return intent_engine.response_for(user_message)
     
     def get_suggested_actions(self, user_message: str, ai_response: str) -> List[str]:
         """Get suggested actions based on conversation context"""
-        message_lower = user_message.lower()
-        response_lower = ai_response.lower()
-        
-        suggestions = []
-        
-        if 'register' in response_lower or 'join' in response_lower:
-            suggestions.extend(["Start Registration", "Learn More About Membership"])
-        
-        if 'contact' in response_lower:
-            suggestions.append("Submit Contact Form")
-        
-        if 'education' in response_lower or 'scholarship' in response_lower:
-            suggestions.append("View Educational Programs")
-        
-        if 'medical' in response_lower or 'health' in response_lower:
-            suggestions.append("Find Medical Camps")
-        
-        if 'donate' in response_lower:
-            suggestions.append("Make a Donation")
-        
-        # Default suggestions if none match
-        if not suggestions:
-            suggestions = ["Join Directory", "Contact Us", "Learn More"]
-        
-        return suggestions[:3]  # Limit to 3 suggestions
+        return intent_engine.actions_for(user_message, ai_response, limit=3)
 
 ai_agent = AIAgent()
 
@@ -214,6 +211,7 @@ async def chat_with_ai(chat_message: ChatMessage):
         }
         
         await db.conversations.insert_one(conversation_data)
+        await timeseries.record(db, "conversations", conversation_data['timestamp'])
         
         return ChatResponse(
             response=ai_response,
@@ -237,7 +235,7 @@ async def get_conversations(
     limit: int = 50,
     current_user = Depends(get_current_admin_user)
 ):
-    db = get_database()
+    db = get_read_database()
     try:
         query = {}
         if session_id:
@@ -260,7 +258,7 @@ async def get_conversations(
 
 @agent_router.get("/conversations/stats", response_model=APIResponse, status_code=status.HTTP_200_OK)
 async def get_conversation_stats(current_user = Depends(get_current_admin_user)):
-    db = get_database()
+    db = get_read_database()
     try:
         total_conversations = await db.conversations.count_documents({})
         unique_sessions = len(await db.conversations.distinct("session_id"))
@@ -290,3 +288,81 @@ async def get_conversation_stats(current_user = Depends(get_current_admin_user))
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Error retrieving conversation statistics"
         )
+
+@agent_router.get("/faq", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def list_faq_entries(current_user = Depends(get_current_admin_user)):
+    db = get_database()
+    try:
+        entries = await db.faq_entries.find({"deleted": {"$ne": True}}).sort("created_at", 1).to_list(length=None)
+        
+        return APIResponse(
+            success=True,
+            message="FAQ entries retrieved successfully",
+            data={"entries": [FAQResponse(**entry).model_dump(mode="json", by_alias=True) for entry in entries]}
+        )
+        
+    except Exception as e:
+        logger.error(f"Error listing FAQ entries: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Error retrieving FAQ entries"
+        )
+
+@agent_router.post("/faq", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
+async def create_faq_entry(faq_data: FAQCreate, current_user = Depends(get_current_admin_user)):
+    """Add an FAQ entry; it is indexed immediately in this worker and picked up by others on refresh"""
+    db = get_database()
+    try:
+        entry = faq_data.dict()
+        entry['deleted'] = False
+        entry['created_at'] = datetime.utcnow()
+        entry['updated_at'] = entry['created_at']
+        
+        result = await db.faq_entries.insert_one(entry)
+        knowledge_base.upsert(entry)
+        
+        return APIResponse(
+            success=True,
+            message="FAQ entry created successfully",
+            data={"id": str(result.inserted_id)}
+        )
+        
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="An FAQ entry with this question already exists"
+        )
+    except Exception as e:
+        logger.error(f"Error creating FAQ entry: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Error creating FAQ entry"
+        )
+
+@agent_router.delete("/faq/{entry_id}", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def delete_faq_entry(entry_id: str, current_user = Depends(get_current_admin_user)):
+    """Soft-delete an FAQ entry so other workers can drop it incrementally"""
+    db = get_database()
+    try:
+        result = await db.faq_entries.update_one(
+            {"_id": ObjectId(entry_id), "deleted": {"$ne": True}},
+            {"$set": {"deleted": True, "updated_at": datetime.utcnow()}}
+        )
+        
+        if result.matched_count == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="FAQ entry not found"
+            )
+        
+        knowledge_base.remove(entry_id)
+        return APIResponse(success=True, message="FAQ entry deleted")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting FAQ entry: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Error deleting FAQ entry"
+        )
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import Optional
+from datetime import date, datetime, timedelta
+from app.models import APIResponse, RollupSource, TimeSeries, Granularity
+from app.database import get_read_database
+from app.auth import get_current_admin_user
+from app import rollup, timeseries
+import logging
+
+logger = logging.getLogger(__name__)
+
+analytics_router = APIRouter(dependencies=[Depends(get_current_admin_user)])
+
+@analytics_router.get("/rollup", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def get_rollup(
+    source: RollupSource = RollupSource.DIRECTORY,
+    dimensions: str = Query("", description="Comma-separated: province, district, city, caste, gender, membership_type, blood_group"),
+    province: Optional[str] = None,
+    district: Optional[str] = None,
+    city: Optional[str] = None,
+    caste: Optional[str] = None,
+    gender: Optional[str] = None,
+    membership_type: Optional[str] = None,
+    blood_group: Optional[str] = None
+):
+    """Counts grouped by the chosen dimensions, answered from the precomputed rollup cube (Admin only)"""
+    names = [name.strip() for name in dimensions.split(",") if name.strip()]
+    unknown = [name for name in names if name not in rollup.DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dimensions: {', '.join(unknown)}")
+
+    filters = {
+        "province": province, "district": district, "city": city, "caste": caste,
+        "gender": gender, "membership_type": membership_type, "blood_group": blood_group,
+    }
+    filters = {name: value for name, value in filters.items() if value is not None}
+    try:
+        result = await rollup.query(get_read_database(), source.value, list(dict.fromkeys(names)), filters)
+        return APIResponse(success=True, message="Rollup retrieved successfully", data=result)
+    except Exception as e:
+        logger.error(f"Error querying rollup cube: {e}")
+        raise HTTPException(status_code=400, detail="Error retrieving rollup")
+
+@analytics_router.get("/timeseries", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def get_timeseries(
+    series: TimeSeries = TimeSeries.DIRECTORY,
+    granularity: Granularity = Granularity.DAY,
+    start: Optional[date] = Query(None, description="First day (default: 30 buckets before end)"),
+    end: Optional[date] = Query(None, description="Last day (default: today, UTC)")
+):
+    """Creation counts per day, week or month, read from pre-bucketed counters (Admin only)"""
+    end_at = datetime.combine(end or datetime.utcnow().date(), datetime.min.time())
+    if start is None:
+        start_at = timeseries.bucket_start(end_at, granularity.value)
+        for _ in range(29):
+            start_at = timeseries.bucket_start(start_at - timedelta(days=1), granularity.value)
+    else:
+        start_at = datetime.combine(start, datetime.min.time())
+    if end_at < start_at:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    buckets = 0
+    moment = timeseries.bucket_start(start_at, granularity.value)
+    while moment <= end_at:
+        buckets += 1
+        if buckets > timeseries.MAX_BUCKETS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Range spans more than {timeseries.MAX_BUCKETS} {granularity.value} buckets; use a coarser granularity"
+            )
+        moment = timeseries.next_bucket(moment, granularity.value)
+
+    try:
+        points = await timeseries.query(get_read_database(), series.value, granularity.value, start_at, end_at)
+        return APIResponse(
+            success=True,
+            message="Time series retrieved successfully",
+            data={"series": series.value, "granularity": granularity.value, "points": points}
+        )
+    except Exception as e:
+        logger.error(f"Error querying time series: {e}")
+        raise HTTPException(status_code=400, detail="Error retrieving time series")
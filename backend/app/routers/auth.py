@@ -11,7 +11,9 @@ from app.auth import (
     get_current_admin_user
 )
 from app.config import settings
-from app.database import get_database
+from app.database import get_database, get_read_database
+from app.events import live_updates
+from app.cache import document_cache
 from datetime import datetime
 import logging
 
@@ -40,6 +42,7 @@ async def register_user(user_data: UserCreate):
         
         db = get_database()
         result = await db.users.insert_one(user_dict)
+        live_updates.notify("users", "insert")
         
         return APIResponse(
             success=True,
@@ -76,7 +79,8 @@ async def login_user(user_credentials: UserLogin):
         
         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
         access_token = create_access_token(
-            data={"sub": str(user["_id"])},
+            # The role lets the rate limiter recognise admins without a database lookup
+            data={"sub": str(user["_id"]), "role": UserRole(user.get("role", UserRole.MEMBER)).value},
             expires_delta=access_token_expires
         )
         
@@ -124,6 +128,7 @@ async def update_current_user(
             {"_id": current_user.id},
             {"$set": update_data}
         )
+        document_cache.invalidate("users", str(current_user.id))
         
         if result.matched_count == 0:
             raise HTTPException(
@@ -155,7 +160,7 @@ async def list_users(
     try:
         skip = (page - 1) * limit
         
-        db = get_database()
+        db = get_read_database()
         total_users = await db.users.count_documents({})
         users = await db.users.find({}, {"password": 0}).skip(skip).limit(limit).to_list(length=limit)
         
@@ -196,12 +201,14 @@ async def activate_user(
             {"_id": ObjectId(user_id)},
             {"$set": {"is_active": True}}
         )
+        document_cache.invalidate("users", user_id)
         
         if result.matched_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
+        live_updates.notify("users", "update")
         
         return APIResponse(
             success=True,
@@ -231,12 +238,14 @@ async def deactivate_user(
             {"_id": ObjectId(user_id)},
             {"$set": {"is_active": False}}
         )
+        document_cache.invalidate("users", user_id)
         
         if result.matched_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
+        live_updates.notify("users", "update")
         
         return APIResponse(
             success=True,
@@ -256,7 +265,7 @@ async def deactivate_user(
 async def get_auth_stats(current_user: UserResponse = Depends(get_current_admin_user)):
     """Get authentication statistics (Admin only)"""
     try:
-        db = get_database()
+        db = get_read_database()
         total_users = await db.users.count_documents({})
         active_users = await db.users.count_documents({"is_active": True})
         admin_users = await db.users.count_documents({"role": UserRole.ADMIN})
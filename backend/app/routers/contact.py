@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import Response
 from typing import List, Optional
 from app.models import ContactCreate, ContactResponse, APIResponse, PaginatedResponse
-from app.database import get_database
+from app.database import get_database, get_read_database
 from app.auth import get_current_admin_user
+from app.events import live_updates
+from app.cache import document_cache, cached_document
+from app import timeseries
 from bson import ObjectId
 from datetime import datetime
 import logging
@@ -22,6 +26,8 @@ async def create_contact_message(contact_data: ContactCreate):
         contact_dict['created_at'] = datetime.utcnow()
         
         result = await db.contact_messages.insert_one(contact_dict)
+        live_updates.notify("contact_messages", "insert", contact_dict)
+        await timeseries.record(db, "contact_messages", contact_dict['created_at'])
         
         return APIResponse(
             success=True, 
@@ -42,7 +48,7 @@ async def list_contact_messages(
     is_read: Optional[bool] = Query(None),
     current_user = Depends(get_current_admin_user)
 ):
-    db = get_database()
+    db = get_read_database()
     """Get all contact messages (Admin only)"""
     try:
         query = {}
@@ -81,13 +87,15 @@ async def get_contact_message(message_id: str, current_user = Depends(get_curren
     db = get_database()
     """Get a specific contact message by ID (Admin only)"""
     try:
-        message = await db.contact_messages.find_one({"_id": ObjectId(message_id)})
+        message = await cached_document(db, "contact_messages", message_id, ContactResponse)
         if message is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
                 detail="Contact message not found"
             )
-        return ContactResponse(**message)
+        return Response(message.body, media_type="application/json")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving contact message with ID {message_id}: {e}")
         raise HTTPException(
@@ -104,12 +112,14 @@ async def mark_message_as_read(message_id: str, current_user = Depends(get_curre
             {"_id": ObjectId(message_id)}, 
             {"$set": {"is_read": True}}
         )
+        document_cache.invalidate("contact_messages", message_id)
         
         if result.matched_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
                 detail="Contact message not found"
             )
+        live_updates.notify("contact_messages", "update")
             
         return APIResponse(success=True, message="Message marked as read")
     except Exception as e:
@@ -128,12 +138,14 @@ async def mark_message_as_unread(message_id: str, current_user = Depends(get_cur
             {"_id": ObjectId(message_id)}, 
             {"$set": {"is_read": False}}
         )
+        document_cache.invalidate("contact_messages", message_id)
         
         if result.matched_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
                 detail="Contact message not found"
             )
+        live_updates.notify("contact_messages", "update")
             
         return APIResponse(success=True, message="Message marked as unread")
     except Exception as e:
@@ -148,13 +160,16 @@ async def delete_contact_message(message_id: str, current_user = Depends(get_cur
     db = get_database()
     """Delete a contact message (Admin only)"""
     try:
-        result = await db.contact_messages.delete_one({"_id": ObjectId(message_id)})
+        deleted = await db.contact_messages.find_one_and_delete({"_id": ObjectId(message_id)}, projection={"created_at": 1})
+        document_cache.invalidate("contact_messages", message_id)
         
-        if result.deleted_count == 0:
+        if deleted is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
                 detail="Contact message not found"
             )
+        live_updates.notify("contact_messages", "delete")
+        await timeseries.record(db, "contact_messages", deleted.get("created_at"), -1)
             
         return APIResponse(success=True, message="Contact message deleted")
     except Exception as e:
@@ -166,7 +181,7 @@ async def delete_contact_message(message_id: str, current_user = Depends(get_cur
 
 @contact_router.get("/stats/count", response_model=APIResponse, status_code=status.HTTP_200_OK)
 async def get_contact_stats(current_user = Depends(get_current_admin_user)):
-    db = get_database()
+    db = get_read_database()
     """Get contact message statistics (Admin only)"""
     try:
         total_messages = await db.contact_messages.count_documents({})
@@ -1,13 +1,28 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, FileResponse, Response
+from typing import List, Optional
 from app.models import (
     DirectoryCreate, DirectoryResponse, DirectoryUpdate, DirectoryFilter, APIResponse, PaginatedResponse,
     FamilyDirectoryCreate, FamilyDirectoryResponse, FamilyDirectoryUpdate, FamilyDirectoryFilter,
+    FamilyMember, FamilyMemberUpdate, BloodGroup, SuggestField,
     PopulationResponse, CasteStatsResponse, CasteStats
 )
-from app.database import get_database
+from app.database import get_database, get_read_database
 from app.auth import get_current_admin_user
+from app import donors, exports, rollup, timeseries
+from app.changes import fetch_changes, record_tombstone, InvalidToken, ExpiredToken
+from app.snapshot import directory_snapshot
+from app.compression import accepts
+from app.events import live_updates
+from app.versioning import etag, version_filter, not_modified, raise_update_failed
+from app.cache import document_cache, load_document
+from app.derived import derived_data
+from app.facets import facet_cache, faceted_page
+from app.suggest import suggestions
+from app.reference import reference_data
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
 import logging
 
@@ -15,14 +30,62 @@ logger = logging.getLogger(__name__)
 
 directory_router = APIRouter()
 
+def with_member_ids(members: List[dict], keep: bool = True) -> List[dict]:
+    """Give every family member a stable ID. With ``keep``, IDs sent back from an earlier read are kept and must be unique"""
+    seen = set()
+    for member in members:
+        if keep and member.get('member_id'):
+            if member['member_id'] in seen:
+                raise HTTPException(status_code=400, detail=f"Duplicate member_id: {member['member_id']}")
+            seen.add(member['member_id'])
+        else:
+            member['member_id'] = str(ObjectId())
+    return members
+
+async def _cached_entry(db, collection: str, document_id: str, model, not_found: str, if_none_match: Optional[str]) -> Response:
+    entry = document_cache.get(collection, document_id)
+    if entry is None and if_none_match is not None:
+        # Revalidation only needs the version, not the whole document
+        current = await db[collection].find_one({"_id": ObjectId(document_id)}, {"version": 1})
+        if current is not None and not_modified(if_none_match, current.get("version", 1)):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag(current.get("version", 1))})
+    if entry is None:
+        entry = await load_document(db, collection, document_id, model)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    headers = {"ETag": etag(entry.version or 1)}
+    if not_modified(if_none_match, entry.version or 1):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+async def _change_feed(collection: str, since: Optional[str], limit: int) -> APIResponse:
+    try:
+        # Served from the primary: a lagging secondary could miss writes older than the feed cutoff
+        changes = await fetch_changes(get_database(), collection, since, limit)
+        return APIResponse(success=True, message="Changes retrieved successfully", data=changes)
+    except InvalidToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExpiredToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error retrieving {collection} changes: {e}")
+        raise HTTPException(status_code=400, detail="Error retrieving changes")
+
 @directory_router.post("/", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
 async def create_directory_entry(directory_data: DirectoryCreate):
     db = get_database()
     try:
-        directory_data = directory_data.dict()
+        # Public write: unknown names stay strings rather than becoming reference entries
+        directory_data = await reference_data.encode(db, suggestions.normalize("directory", directory_data.dict()), create=False)
         directory_data['created_at'] = datetime.utcnow()
         directory_data['updated_at'] = datetime.utcnow()
+        directory_data['version'] = 1
         result = await db.directory.insert_one(directory_data)
+        live_updates.notify("directory", "insert", directory_data)
+        derived_data.touch("directory", result.inserted_id)
+        facet_cache.bump("directory")
+        suggestions.record("directory", directory_data)
+        await timeseries.record(db, "directory", directory_data['created_at'])
         return APIResponse(success=True, message="Directory entry created", data={"id": str(result.inserted_id)})
     except Exception as e:
         logger.error(f"Error creating directory entry: {e}")
@@ -30,25 +93,30 @@ async def create_directory_entry(directory_data: DirectoryCreate):
 
 @directory_router.get("/", response_model=PaginatedResponse, status_code=status.HTTP_200_OK)
 async def list_directory_entries(filter: DirectoryFilter = Depends()):
-    db = get_database()
+    db = get_read_database()
     try:
         query = {}
         if filter.city:
-            query['city'] = filter.city
+            query['city'] = await reference_data.match(db, "city", filter.city)
         if filter.profession:
             query['profession'] = filter.profession
         if filter.caste:
-            query['caste'] = filter.caste
+            query['caste'] = await reference_data.match(db, "caste", filter.caste)
         if filter.province:
-            query['province'] = filter.province
+            query['province'] = await reference_data.match(db, "province", filter.province)
         if filter.gender:
             query['gender'] = filter.gender
         if filter.membership_type:
             query['membership_type'] = filter.membership_type
 
         skip = (filter.page - 1) * filter.limit
-        total_entries = await db.directory.count_documents(query)
-        entries = await db.directory.find(query).skip(skip).limit(filter.limit).to_list(length=filter.limit)
+        facets = None
+        if filter.facets:
+            entries, total_entries, facets = await faceted_page(db, "directory", query, skip, filter.limit)
+        else:
+            total_entries = await db.directory.count_documents(query)
+            entries = await db.directory.find(query).skip(skip).limit(filter.limit).to_list(length=filter.limit)
+            await reference_data.expand(db, entries)
 
         # Convert ObjectId to string for JSON serialization
         for entry in entries:
@@ -61,7 +129,8 @@ async def list_directory_entries(filter: DirectoryFilter = Depends()):
             total=total_entries,
             page=filter.page,
             limit=filter.limit,
-            total_pages=(total_entries // filter.limit) + (1 if total_entries % filter.limit != 0 else 0)
+            total_pages=(total_entries // filter.limit) + (1 if total_entries % filter.limit != 0 else 0),
+            facets=facets
         )
     except Exception as e:
         logger.error(f"Error listing directory entries: {e}")
@@ -70,7 +139,7 @@ async def list_directory_entries(filter: DirectoryFilter = Depends()):
 @directory_router.get("/community_strength", response_model=APIResponse, status_code=status.HTTP_200_OK)
 async def get_community_strength():
     """Get total community strength by summing all family_members_count from directory entries."""
-    db = get_database()
+    db = get_read_database()
     try:
         # Use MongoDB aggregation to sum all family_members_count
         pipeline = [
@@ -99,28 +168,120 @@ async def get_community_strength():
         logger.error(f"Error calculating community strength: {e}")
         raise HTTPException(status_code=400, detail="Error calculating community strength")
 
+@directory_router.get("/count", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def count_directory_entries():
+    db = get_read_database()
+    try:
+        total = await db.directory.count_documents({})
+        return APIResponse(success=True, message="Total directory entries count", data={"total": total})
+    except Exception as e:
+        logger.error(f"Error counting directory entries: {e}")
+        raise HTTPException(status_code=400, detail="Error counting directory entries")
+
+@directory_router.get("/changes", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def get_directory_changes(since: Optional[str] = None, limit: int = Query(500, ge=1, le=1000)):
+    """Directory entries changed or deleted after the `since` token (omit it for a full sync)"""
+    return await _change_feed("directory", since, limit)
+
+@directory_router.get("/snapshot", status_code=status.HTTP_200_OK)
+async def get_directory_snapshot(request: Request):
+    """Whole public directory as one gzip-compressed columnar JSON file; apply /changes?since=<sync_token> afterwards"""
+    try:
+        # Built from the primary so the embedded sync token doesn't skip writes a secondary hasn't seen yet
+        meta = await directory_snapshot.ensure(get_database())
+        gzipped = accepts(request.headers.get("accept-encoding", ""), "gzip")
+        # The plain JSON is a different representation, so it gets its own ETag
+        tag = meta["etag"] if gzipped else meta["etag"][:-1] + '-identity"'
+        headers = {
+            "ETag": tag,
+            "Cache-Control": "public, max-age=300",
+            "Vary": "Accept-Encoding",
+            "X-Sync-Token": meta["sync_token"],
+        }
+        if request.headers.get("if-none-match") == tag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return FileResponse(directory_snapshot.path, media_type="application/json", headers=headers)
+        # Clients that can't take gzip get it decompressed (the compression middleware may still Brotli it)
+        body = await run_in_threadpool(directory_snapshot.read_plain)
+        return Response(body, media_type="application/json", headers=headers)
+    except Exception as e:
+        logger.error(f"Error serving directory snapshot: {e}")
+        raise HTTPException(status_code=400, detail="Error retrieving directory snapshot")
+
+@directory_router.get("/donors", response_model=APIResponse, status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_admin_user)])
+async def find_blood_donors(
+    blood_group: BloodGroup,
+    city: Optional[str] = None,
+    district: Optional[str] = None,
+    province: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Members and family members who can donate to `blood_group`, nearest first (Admin only)"""
+    try:
+        # Primary, not a secondary: in an emergency the latest contact details matter
+        found = await donors.find_donors(get_database(), blood_group.value, city, district, province, limit)
+        return APIResponse(
+            success=True,
+            message="Donors retrieved successfully",
+            data={
+                "blood_group": blood_group.value,
+                "compatible_groups": donors.COMPATIBLE_DONORS[blood_group.value],
+                "donors": found
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error finding blood donors for {blood_group.value}: {e}")
+        raise HTTPException(status_code=400, detail="Error finding blood donors")
+
+@directory_router.get("/suggest", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def suggest_values(field: SuggestField, q: str = Query("", max_length=50), limit: int = Query(10, ge=1, le=20)):
+    """Known values of a free-text field starting with ``q`` (at any word), most used first"""
+    return APIResponse(
+        success=True,
+        message="Suggestions retrieved successfully",
+        data={"field": field.value, "q": q, "suggestions": suggestions.suggest(field.value, q, limit)}
+    )
+
 @directory_router.get("/{directory_id}", response_model=DirectoryResponse, status_code=status.HTTP_200_OK)
-async def get_directory_entry(directory_id: str):
+async def get_directory_entry(directory_id: str, if_none_match: Optional[str] = Header(None)):
     db = get_database()
     try:
-        entry = await db.directory.find_one({"_id": ObjectId(directory_id)})
-        if entry is None:
-            raise HTTPException(status_code=404, detail="Directory entry not found")
-        return DirectoryResponse(**entry)
+        return await _cached_entry(db, "directory", directory_id, DirectoryResponse, "Directory entry not found", if_none_match)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving directory entry with ID {directory_id}: {e}")
         raise HTTPException(status_code=400, detail="Error retrieving directory entry")
 
 @directory_router.put("/{directory_id}", response_model=APIResponse, status_code=status.HTTP_200_OK)
-async def update_directory_entry(directory_id: str, directory_data: DirectoryUpdate, current_user=Depends(get_current_admin_user)):
+async def update_directory_entry(directory_id: str, directory_data: DirectoryUpdate, response: Response, if_match: Optional[str] = Header(None), current_user=Depends(get_current_admin_user)):
     db = get_database()
     try:
-        update_data = directory_data.dict(exclude_unset=True)
+        update_data = await reference_data.encode(db, suggestions.normalize("directory", directory_data.dict(exclude_unset=True)))
+        precondition = version_filter(if_match, update_data.pop('version', None))
         update_data['updated_at'] = datetime.utcnow()
-        result = await db.directory.update_one({"_id": ObjectId(directory_id)}, {"$set": update_data})
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Directory entry not found")
-        return APIResponse(success=True, message="Directory entry updated")
+        # The entry as it was, so the suggestion counts can move from the old values to the new ones
+        previous = await db.directory.find_one_and_update(
+            {"_id": ObjectId(directory_id), **precondition},
+            {"$set": update_data, "$inc": {"version": 1}},
+            projection={"version": 1, **suggestions.projection("directory")},
+            return_document=ReturnDocument.BEFORE
+        )
+        document_cache.invalidate("directory", directory_id)
+        derived_data.touch("directory", directory_id)
+        facet_cache.bump("directory")
+        if previous is None:
+            await raise_update_failed(db.directory, directory_id, precondition, "Directory entry not found")
+        suggestions.replace("directory", previous, {**previous, **update_data})
+        live_updates.notify("directory", "update")
+        version = previous.get("version", 0) + 1
+        response.headers["ETag"] = etag(version)
+        return APIResponse(success=True, message="Directory entry updated", data={"version": version})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating directory entry with ID {directory_id}: {e}")
         raise HTTPException(status_code=400, detail="Error updating directory entry")
@@ -129,9 +290,19 @@ async def update_directory_entry(directory_id: str, directory_data: DirectoryUpd
 async def delete_directory_entry(directory_id: str):
     db = get_database()
     try:
-        result = await db.directory.delete_one({"_id": ObjectId(directory_id)})
-        if result.deleted_count == 0:
+        deleted = await db.directory.find_one_and_delete(
+            {"_id": ObjectId(directory_id)},
+            projection={"created_at": 1, "city": 1, "district": 1, "profession": 1, "caste": 1}
+        )
+        document_cache.invalidate("directory", directory_id)
+        derived_data.touch("directory", directory_id)
+        facet_cache.bump("directory")
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Directory entry not found")
+        await record_tombstone(db, "directory", ObjectId(directory_id))
+        await timeseries.record(db, "directory", deleted.get("created_at"), -1)
+        suggestions.record("directory", deleted, -1)
+        live_updates.notify("directory", "delete")
         return APIResponse(success=True, message="Directory entry deleted")
     except Exception as e:
         logger.error(f"Error deleting directory entry with ID {directory_id}: {e}")
@@ -140,12 +311,9 @@ async def delete_directory_entry(directory_id: str):
 @directory_router.get("/export/csv", status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_admin_user)])
 async def export_directory_to_csv():
     try:
-        import pandas as pd
-        from fastapi.responses import StreamingResponse
-
-        entries = await get_database().directory.find().to_list(length=10000)
-        df = pd.DataFrame(entries)
-        csv_data = df.to_csv(index=False)
+        db = get_read_database()
+        entries = await reference_data.expand(db, await db.directory.find().to_list(length=10000))
+        csv_data = await run_in_threadpool(exports.build_csv, entries)
 
         response = StreamingResponse(iter([csv_data]), media_type="text/csv")
         response.headers["Content-Disposition"] = "attachment; filename=directory_export.csv"
@@ -158,30 +326,11 @@ async def export_directory_to_csv():
 @directory_router.get("/export/pdf", status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_admin_user)])
 async def export_directory_to_pdf():
     try:
-        from io import BytesIO
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-        from fastapi.responses import StreamingResponse
-
-        entries = await get_database().directory.find().to_list(length=10000)
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-
-        p.setFont("Helvetica", 10)
-
-        for i, entry in enumerate(entries):
-            y = height - 30 - (i * 12)
-            if y < 40:
-                p.showPage()
-                p.setFont("Helvetica", 10)
-                y = height - 30
-            p.drawString(30, y, str(entry))
-
-        p.save()
-        buffer.seek(0)
-
-        response = StreamingResponse(buffer, media_type="application/pdf")
+        db = get_read_database()
+        entries = await reference_data.expand(db, await db.directory.find().to_list(length=10000))
+        pdf_data = await run_in_threadpool(exports.build_pdf, entries)
+
+        response = StreamingResponse(iter([pdf_data]), media_type="application/pdf")
         response.headers["Content-Disposition"] = "attachment; filename=directory_export.pdf"
 
         return response
@@ -189,16 +338,6 @@ async def export_directory_to_pdf():
         logger.error(f"Error exporting directory to PDF: {e}")
         raise HTTPException(status_code=400, detail="Error exporting directory to PDF")
 
-@directory_router.get("/count", response_model=APIResponse, status_code=status.HTTP_200_OK)
-async def count_directory_entries():
-    db = get_database()
-    try:
-        total = await db.directory.count_documents({})
-        return APIResponse(success=True, message="Total directory entries count", data={"total": total})
-    except Exception as e:
-        logger.error(f"Error counting directory entries: {e}")
-        raise HTTPException(status_code=400, detail="Error counting directory entries")
-
 
 # ============= FAMILY DIRECTORY ENDPOINTS =============
 
@@ -208,15 +347,22 @@ async def create_family_directory_entry(family_data: FamilyDirectoryCreate):
     db = get_database()
     try:
         # Convert to dict and add timestamps
-        family_dict = family_data.dict()
+        family_dict = await reference_data.encode(db, suggestions.normalize("family_directory", family_data.dict()), create=False)
         family_dict['created_at'] = datetime.utcnow()
         family_dict['updated_at'] = datetime.utcnow()
+        family_dict['version'] = 1
         
-        # Auto-calculate total_members from family_members list
+        # Auto-calculate total_members from family_members list; a new family's IDs are always the server's
+        family_dict['family_members'] = with_member_ids(family_dict['family_members'], keep=False)
         family_dict['total_members'] = len(family_dict['family_members'])
         
         # Insert into family_directory collection
         result = await db.family_directory.insert_one(family_dict)
+        live_updates.notify("family_directory", "insert", family_dict)
+        derived_data.touch("family", result.inserted_id)
+        facet_cache.bump("family_directory")
+        suggestions.record("family_directory", family_dict)
+        await timeseries.record(db, "family_directory", family_dict['created_at'])
         
         return APIResponse(
             success=True, 
@@ -226,6 +372,8 @@ async def create_family_directory_entry(family_data: FamilyDirectoryCreate):
                 "total_members": family_dict['total_members']
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating family directory entry: {e}")
         raise HTTPException(status_code=400, detail="Error creating family directory entry")
@@ -233,18 +381,18 @@ async def create_family_directory_entry(family_data: FamilyDirectoryCreate):
 @directory_router.get("/family/all", response_model=PaginatedResponse, status_code=status.HTTP_200_OK)
 async def list_all_family_directories(filter: FamilyDirectoryFilter = Depends()):
     """List all family directories with their details."""
-    db = get_database()
+    db = get_read_database()
     try:
         # Build query based on filters
         query = {}
         if filter.city:
-            query['city'] = {'$regex': filter.city, '$options': 'i'}
+            query['city'] = await reference_data.match_pattern(db, "city", filter.city)
         if filter.caste:
-            query['caste'] = {'$regex': filter.caste, '$options': 'i'}
+            query['caste'] = await reference_data.match_pattern(db, "caste", filter.caste)
         if filter.province:
-            query['province'] = {'$regex': filter.province, '$options': 'i'}
+            query['province'] = await reference_data.match_pattern(db, "province", filter.province)
         if filter.district:
-            query['district'] = {'$regex': filter.district, '$options': 'i'}
+            query['district'] = await reference_data.match_pattern(db, "district", filter.district)
         if filter.membership_type:
             query['membership_type'] = filter.membership_type
         if filter.min_members:
@@ -257,10 +405,14 @@ async def list_all_family_directories(filter: FamilyDirectoryFilter = Depends())
         
         # Pagination
         skip = (filter.page - 1) * filter.limit
-        total_families = await db.family_directory.count_documents(query)
-        
-        # Fetch families with projection to exclude large fields if needed
-        families = await db.family_directory.find(query).skip(skip).limit(filter.limit).to_list(length=filter.limit)
+        facets = None
+        if filter.facets:
+            families, total_families, facets = await faceted_page(db, "family_directory", query, skip, filter.limit)
+        else:
+            total_families = await db.family_directory.count_documents(query)
+            # Fetch families with projection to exclude large fields if needed
+            families = await db.family_directory.find(query).skip(skip).limit(filter.limit).to_list(length=filter.limit)
+            await reference_data.expand(db, families)
         
         # Convert ObjectId to string for JSON serialization
         for family in families:
@@ -273,7 +425,8 @@ async def list_all_family_directories(filter: FamilyDirectoryFilter = Depends())
             total=total_families,
             page=filter.page,
             limit=filter.limit,
-            total_pages=(total_families // filter.limit) + (1 if total_families % filter.limit != 0 else 0)
+            total_pages=(total_families // filter.limit) + (1 if total_families % filter.limit != 0 else 0),
+            facets=facets
         )
     except Exception as e:
         logger.error(f"Error listing family directories: {e}")
@@ -282,7 +435,7 @@ async def list_all_family_directories(filter: FamilyDirectoryFilter = Depends())
 @directory_router.get("/family/total_population", response_model=PopulationResponse, status_code=status.HTTP_200_OK)
 async def get_total_population():
     """Get total population by summing all total_members from family directories."""
-    db = get_database()
+    db = get_read_database()
     try:
         # Use MongoDB aggregation to sum all total_members
         pipeline = [
@@ -307,89 +460,117 @@ async def get_total_population():
         logger.error(f"Error calculating total population: {e}")
         raise HTTPException(status_code=400, detail="Error calculating total population")
 
+async def _count_families_by_caste(db) -> dict:
+    """The family rollup by caste, counted from family_directory (codes and unmigrated names merged)"""
+    pipeline = [
+        {'$group': {'_id': '$caste', 'families': {'$sum': 1}, 'members': {'$sum': {'$ifNull': ['$total_members', 0]}}}},
+    ]
+    groups = await db.family_directory.aggregate(pipeline).to_list(length=None)
+    await reference_data.resolve(db, (group['_id'] for group in groups))
+    rows = {}
+    for group in groups:
+        caste = reference_data.name(group['_id'])
+        row = rows.setdefault(caste, {'caste': caste, 'families': 0, 'members': 0})
+        row['families'] += group['families']
+        row['members'] += group['members']
+    rows = list(rows.values())
+    return {'rows': rows, 'totals': {name: sum(row[name] for row in rows) for name in ('families', 'members')}}
+
 @directory_router.get("/family/stats/caste", response_model=CasteStatsResponse, status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_admin_user)])
 async def get_caste_statistics():
     """Admin-only endpoint to get per-caste statistics."""
-    db = get_database()
+    db = get_read_database()
     try:
-        # Aggregation pipeline to get caste statistics
-        pipeline = [
-            {
-                '$group': {
-                    '_id': '$caste',
-                    'family_count': {'$sum': 1},
-                    'total_members': {'$sum': '$total_members'}
-                }
-            },
-            {
-                '$sort': {'total_members': -1}
-            }
-        ]
-        
-        caste_stats = await db.family_directory.aggregate(pipeline).to_list(length=None)
+        # Answered from the rollup cube (one cell per caste/location), not a scan of family_directory
+        as_of = await rollup.built_at(db)
+        if as_of is not None:
+            rollup_data = await rollup.query(db, "family", ["caste"], {})
+        else:
+            # The cube hasn't been built yet and would miss entries; count them directly
+            rollup_data = await _count_families_by_caste(db)
+        caste_stats = sorted(rollup_data['rows'], key=lambda row: row['members'], reverse=True)
         
         # Calculate totals and percentages
-        total_families = sum(stat['family_count'] for stat in caste_stats)
-        total_population = sum(stat['total_members'] for stat in caste_stats)
+        total_families = rollup_data['totals']['families']
+        total_population = rollup_data['totals']['members']
         
         # Format response with percentages
         stats_data = []
         for stat in caste_stats:
-            percentage = (stat['total_members'] / total_population * 100) if total_population > 0 else 0
+            percentage = (stat['members'] / total_population * 100) if total_population > 0 else 0
             stats_data.append(CasteStats(
-                caste=stat['_id'],
-                family_count=stat['family_count'],
-                total_members=stat['total_members'],
+                caste=stat['caste'],
+                family_count=stat['families'],
+                total_members=stat['members'],
                 percentage=round(percentage, 2)
             ))
         
         return CasteStatsResponse(
             success=True,
-            message="Caste statistics retrieved successfully",
+            message="Caste statistics retrieved successfully" if as_of is None else
+                "Caste statistics retrieved from the rollup cube; recent changes can take a moment to show, and edits made outside the API show after the next rebuild",
             data=stats_data,
             total_families=total_families,
-            total_population=total_population
+            total_population=total_population,
+            as_of=as_of
         )
         
     except Exception as e:
         logger.error(f"Error getting caste statistics: {e}")
         raise HTTPException(status_code=400, detail="Error retrieving caste statistics")
 
+@directory_router.get("/family/changes", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def get_family_directory_changes(since: Optional[str] = None, limit: int = Query(500, ge=1, le=1000)):
+    """Family entries changed or deleted after the `since` token (omit it for a full sync)"""
+    return await _change_feed("family_directory", since, limit)
+
 @directory_router.get("/family/{family_id}", response_model=FamilyDirectoryResponse, status_code=status.HTTP_200_OK)
-async def get_family_directory_entry(family_id: str):
+async def get_family_directory_entry(family_id: str, if_none_match: Optional[str] = Header(None)):
     """Get a specific family directory entry by ID."""
     db = get_database()
     try:
-        family = await db.family_directory.find_one({"_id": ObjectId(family_id)})
-        if family is None:
-            raise HTTPException(status_code=404, detail="Family directory entry not found")
-        return FamilyDirectoryResponse(**family)
+        return await _cached_entry(db, "family_directory", family_id, FamilyDirectoryResponse, "Family directory entry not found", if_none_match)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving family directory entry with ID {family_id}: {e}")
         raise HTTPException(status_code=400, detail="Error retrieving family directory entry")
 
 @directory_router.put("/family/{family_id}", response_model=APIResponse, status_code=status.HTTP_200_OK)
-async def update_family_directory_entry(family_id: str, family_data: FamilyDirectoryUpdate, current_user=Depends(get_current_admin_user)):
+async def update_family_directory_entry(family_id: str, family_data: FamilyDirectoryUpdate, response: Response, if_match: Optional[str] = Header(None), current_user=Depends(get_current_admin_user)):
     """Update a family directory entry and recalculate total_members if family_members changed."""
     db = get_database()
     try:
-        update_data = family_data.dict(exclude_unset=True)
+        update_data = await reference_data.encode(db, suggestions.normalize("family_directory", family_data.dict(exclude_unset=True)))
+        precondition = version_filter(if_match, update_data.pop('version', None))
         update_data['updated_at'] = datetime.utcnow()
         
         # If family_members is being updated, recalculate total_members
         if 'family_members' in update_data:
+            update_data['family_members'] = with_member_ids(update_data['family_members'])
             update_data['total_members'] = len(update_data['family_members'])
         
-        result = await db.family_directory.update_one(
-            {"_id": ObjectId(family_id)}, 
-            {"$set": update_data}
+        previous = await db.family_directory.find_one_and_update(
+            {"_id": ObjectId(family_id), **precondition},
+            {"$set": update_data, "$inc": {"version": 1}},
+            projection={"version": 1, **suggestions.projection("family_directory")},
+            return_document=ReturnDocument.BEFORE
         )
+        document_cache.invalidate("family_directory", family_id)
+        derived_data.touch("family", family_id)
+        facet_cache.bump("family_directory")
         
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Family directory entry not found")
+        if previous is None:
+            await raise_update_failed(db.family_directory, family_id, precondition, "Family directory entry not found")
+        suggestions.replace("family_directory", previous, {**previous, **update_data})
+        live_updates.notify("family_directory", "update")
+        version = previous.get("version", 0) + 1
+        response.headers["ETag"] = etag(version)
             
-        return APIResponse(success=True, message="Family directory entry updated successfully")
+        return APIResponse(success=True, message="Family directory entry updated successfully", data={"version": version})
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating family directory entry with ID {family_id}: {e}")
         raise HTTPException(status_code=400, detail="Error updating family directory entry")
@@ -399,11 +580,148 @@ async def delete_family_directory_entry(family_id: str):
     """Delete a family directory entry (admin only)."""
     db = get_database()
     try:
-        result = await db.family_directory.delete_one({"_id": ObjectId(family_id)})
-        if result.deleted_count == 0:
+        deleted = await db.family_directory.find_one_and_delete(
+            {"_id": ObjectId(family_id)},
+            projection={"created_at": 1, "city": 1, "district": 1, "caste": 1, "family_members.profession": 1}
+        )
+        document_cache.invalidate("family_directory", family_id)
+        derived_data.touch("family", family_id)
+        facet_cache.bump("family_directory")
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Family directory entry not found")
+        await record_tombstone(db, "family_directory", ObjectId(family_id))
+        await timeseries.record(db, "family_directory", deleted.get("created_at"), -1)
+        suggestions.record("family_directory", deleted, -1)
+        live_updates.notify("family_directory", "delete")
         return APIResponse(success=True, message="Family directory entry deleted successfully")
     except Exception as e:
         logger.error(f"Error deleting family directory entry with ID {family_id}: {e}")
         raise HTTPException(status_code=400, detail="Error deleting family directory entry")
 
+
+# ============= FAMILY MEMBER ENDPOINTS =============
+# Single-member changes touch only that array element and adjust total_members in the same atomic update
+
+def _member(family: dict, member_id: str) -> dict:
+    return next((member for member in family.get("family_members") or [] if member.get("member_id") == member_id), {})
+
+@directory_router.post("/family/{family_id}/members", response_model=APIResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_current_admin_user)])
+async def add_family_member(family_id: str, member_data: FamilyMember, response: Response, if_match: Optional[str] = Header(None)):
+    """Add one member to a family (admin only)."""
+    db = get_database()
+    try:
+        member = member_data.dict()
+        member['member_id'] = str(ObjectId())
+        member['profession'] = suggestions.normalize_value("profession", member['profession'])
+        precondition = version_filter(if_match)
+        family = await db.family_directory.find_one_and_update(
+            {"_id": ObjectId(family_id), **precondition},
+            {
+                "$push": {"family_members": member},
+                "$inc": {"total_members": 1, "version": 1},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            projection={"total_members": 1, "version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        document_cache.invalidate("family_directory", family_id)
+        derived_data.touch("family", family_id)
+        facet_cache.bump("family_directory")
+        if family is None:
+            await raise_update_failed(db.family_directory, family_id, precondition, "Family directory entry not found")
+        suggestions.record("family_directory", {"family_members": [member]}, 1)
+        live_updates.notify("family_directory", "update")
+        response.headers["ETag"] = etag(family['version'])
+        return APIResponse(
+            success=True,
+            message="Family member added successfully",
+            data={"member_id": member['member_id'], "total_members": family['total_members'], "version": family['version']}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding member to family directory entry with ID {family_id}: {e}")
+        raise HTTPException(status_code=400, detail="Error adding family member")
+
+@directory_router.patch("/family/{family_id}/members/{member_id}", response_model=APIResponse, status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_admin_user)])
+async def update_family_member(family_id: str, member_id: str, member_data: FamilyMemberUpdate, response: Response, if_match: Optional[str] = Header(None)):
+    """Update fields of one family member in place (admin only)."""
+    db = get_database()
+    try:
+        update_data = member_data.dict(exclude_unset=True)
+        if not update_data:
+            raise HTTPException(status_code=400, detail="No data provided for update")
+        if 'profession' in update_data:
+            update_data['profession'] = suggestions.normalize_value("profession", update_data['profession'])
+
+        precondition = version_filter(if_match)
+        update = {f"family_members.$.{field}": value for field, value in update_data.items()}
+        update['updated_at'] = datetime.utcnow()
+        previous = await db.family_directory.find_one_and_update(
+            {"_id": ObjectId(family_id), "family_members.member_id": member_id, **precondition},
+            {"$set": update, "$inc": {"version": 1}},
+            projection={"version": 1, "family_members.member_id": 1, **suggestions.projection("family_directory")},
+            return_document=ReturnDocument.BEFORE
+        )
+        document_cache.invalidate("family_directory", family_id)
+        derived_data.touch("family", family_id)
+        facet_cache.bump("family_directory")
+        if previous is None:
+            if not await db.family_directory.count_documents({"_id": ObjectId(family_id), "family_members.member_id": member_id}):
+                raise HTTPException(status_code=404, detail="Family member not found")
+            await raise_update_failed(db.family_directory, family_id, precondition, "Family member not found")
+        member = _member(previous, member_id)
+        suggestions.replace("family_directory", {"family_members": [member]}, {"family_members": [{**member, **update_data}]})
+        live_updates.notify("family_directory", "update")
+        version = previous.get("version", 0) + 1
+        response.headers["ETag"] = etag(version)
+        return APIResponse(success=True, message="Family member updated successfully", data={"version": version})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating member {member_id} of family directory entry with ID {family_id}: {e}")
+        raise HTTPException(status_code=400, detail="Error updating family member")
+
+@directory_router.delete("/family/{family_id}/members/{member_id}", response_model=APIResponse, status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_admin_user)])
+async def remove_family_member(family_id: str, member_id: str, response: Response, if_match: Optional[str] = Header(None)):
+    """Remove one family member (admin only). A family always keeps at least one member."""
+    db = get_database()
+    try:
+        precondition = version_filter(if_match)
+        # Matching on the member makes the $inc conditional on the $pull actually removing someone
+        previous = await db.family_directory.find_one_and_update(
+            {"_id": ObjectId(family_id), "family_members.member_id": member_id, "total_members": {"$gt": 1}, **precondition},
+            {
+                "$pull": {"family_members": {"member_id": member_id}},
+                "$inc": {"total_members": -1, "version": 1},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            projection={"total_members": 1, "version": 1, "family_members.member_id": 1, **suggestions.projection("family_directory")},
+            return_document=ReturnDocument.BEFORE
+        )
+        document_cache.invalidate("family_directory", family_id)
+        derived_data.touch("family", family_id)
+        facet_cache.bump("family_directory")
+        if previous is None:
+            current = await db.family_directory.find_one(
+                {"_id": ObjectId(family_id), "family_members.member_id": member_id}, {"total_members": 1}
+            )
+            if current is None:
+                raise HTTPException(status_code=404, detail="Family member not found")
+            if current.get('total_members', 0) <= 1:
+                raise HTTPException(status_code=409, detail="A family must keep at least one member")
+            await raise_update_failed(db.family_directory, family_id, precondition, "Family member not found")
+        suggestions.record("family_directory", {"family_members": [_member(previous, member_id)]}, -1)
+        live_updates.notify("family_directory", "update")
+        version = previous.get("version", 0) + 1
+        response.headers["ETag"] = etag(version)
+        return APIResponse(
+            success=True,
+            message="Family member removed successfully",
+            data={"total_members": previous['total_members'] - 1, "version": version}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error removing member {member_id} from family directory entry with ID {family_id}: {e}")
+        raise HTTPException(status_code=400, detail="Error removing family member")
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, status, Request, Depends
+from fastapi.responses import StreamingResponse
+from app.auth import get_current_admin_user
+from app.config import settings
+from app.database import get_database
+from app.events import live_updates, issue_ticket, redeem_ticket
+from app.models import APIResponse
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Separate from admin_router: EventSource cannot send an Authorization header, so the stream takes a
+# single-use ticket in the query string instead of the token, which would end up in access logs
+live_router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+def _event(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@live_router.post("/live/ticket", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
+async def create_live_ticket(current_user=Depends(get_current_admin_user)):
+    """Single-use ticket for opening /live, valid for LIVE_TICKET_SECONDS (Admin only)"""
+    ticket = await issue_ticket(get_database(), str(current_user.id))
+    return APIResponse(success=True, message="Live ticket issued", data={"ticket": ticket, "expires_in": settings.live_ticket_seconds})
+
+@live_router.get("/live", status_code=status.HTTP_200_OK)
+async def live_dashboard(request: Request, ticket: str):
+    """Server-sent events with dashboard counter changes and new contact messages (Admin ticket from /live/ticket)"""
+    if await redeem_ticket(get_database(), ticket) is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired live ticket")
+
+    queue = live_updates.bus.subscribe()
+
+    async def stream():
+        try:
+            yield _event("counters", {"counters": await live_updates.current_counters(), "deltas": {}})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _event(event["type"], {key: value for key, value in event.items() if key != "type"})
+        except Exception as e:
+            logger.warning(f"Live dashboard stream ended: {e}")
+        finally:
+            live_updates.bus.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
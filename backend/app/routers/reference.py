@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Response, status, Depends
+from app.models import APIResponse, ReferenceKind, ReferenceAliasCreate
+from app.database import get_database
+from app.auth import get_current_admin_user
+from app.reference import reference_data
+import logging
+
+logger = logging.getLogger(__name__)
+
+reference_router = APIRouter()
+
+# The same for every caller and rarely changing; also lets the compression middleware reuse the compressed body
+PUBLIC_CACHE_CONTROL = "public, max-age=300"
+
+@reference_router.get("/locations", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def get_locations(response: Response):
+    """Provinces with their districts and cities, with the codes stored on entries"""
+    response.headers["Cache-Control"] = PUBLIC_CACHE_CONTROL
+    return APIResponse(success=True, message="Locations retrieved successfully", data={"provinces": reference_data.tree()})
+
+@reference_router.get("/{kind}", response_model=APIResponse, status_code=status.HTTP_200_OK)
+async def list_reference_values(kind: ReferenceKind, response: Response):
+    """Every known province, district, city or caste"""
+    response.headers["Cache-Control"] = PUBLIC_CACHE_CONTROL
+    return APIResponse(success=True, message="Reference data retrieved successfully", data={"entries": reference_data.listing(kind.value)})
+
+@reference_router.get("/{kind}/unknown", response_model=APIResponse, status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_admin_user)])
+async def list_unknown_names(kind: ReferenceKind):
+    """Names stored as strings because they weren't known when written, for review (Admin only)"""
+    try:
+        names = await reference_data.unknown_names(get_database(), kind.value)
+        return APIResponse(success=True, message="Unknown names retrieved successfully", data={"names": names})
+    except Exception as e:
+        logger.error(f"Error listing unknown {kind.value} names: {e}")
+        raise HTTPException(status_code=400, detail="Error retrieving unknown names")
+
+@reference_router.post("/{kind}/{code}/aliases", response_model=APIResponse, status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_admin_user)])
+async def add_reference_aliases(kind: ReferenceKind, code: int, alias_data: ReferenceAliasCreate):
+    """Make other spellings (e.g. "LHR") resolve to this entry on future writes and filters (Admin only)"""
+    db = get_database()
+    try:
+        aliases = await reference_data.add_alias(db, kind.value, code, alias_data.aliases)
+        return APIResponse(success=True, message="Aliases added", data={"code": code, "aliases": aliases})
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No {kind.value} with code {code}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error adding aliases to {kind.value} {code}: {e}")
+        raise HTTPException(status_code=400, detail="Error adding aliases")
@@ -0,0 +1,214 @@
+"""
+Compact, periodically rebuilt snapshot of the public directory for offline clients.
+
+The snapshot is gzip-compressed JSON in a columnar layout::
+
+    {
+      "format": 1,
+      "generated_at": "2024-05-01T12:00:00",
+      "sync_token": "<change feed token>",
+      "count": 2,
+      "columns": {
+        "_id": ["6632...", "6632..."],
+        "full_name": ["Ali Raza", "Sana Akram"],
+        "city": {"values": ["Lahore", "Multan"], "codes": [0, 1]},
+        ...
+      }
+    }
+
+Low-cardinality columns (city, caste, profession, province, ...) are
+dictionary encoded: row ``i`` has ``values[codes[i]]``. Clients download the
+snapshot once, then apply ``/api/directory/changes?since=<sync_token>``.
+
+Each build is written atomically to ``SNAPSHOT_DIR`` and served as a static
+file with a content-hash ETag. Clients whose ``Accept-Encoding`` doesn't allow
+gzip get it decompressed, under a separate ETag. CNICs and admin notes are never included.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app.changes import token_at
+from app.config import settings
+from app.reference import reference_data
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_FILE = "directory.json.gz"
+META_FILE = "directory.meta.json"
+FETCH_BATCH_SIZE = 5000
+
+PLAIN_COLUMNS = ["_id", "full_name", "father_name", "phone", "email", "profile_image", "family_members_count", "updated_at"]
+DICTIONARY_COLUMNS = [
+    "gender", "qualification", "profession", "city", "district", "province", "country",
+    "blood_group", "caste", "marital_status", "membership_type",
+]
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def encode_columns(entries: List[dict]) -> dict:
+    """Turn directory rows into plain and dictionary-encoded columns"""
+    columns = {name: [_plain(entry.get(name)) for entry in entries] for name in PLAIN_COLUMNS}
+    for name in DICTIONARY_COLUMNS:
+        positions = {}
+        codes = []
+        for entry in entries:
+            value = _plain(entry.get(name))
+            code = positions.get(value)
+            if code is None:
+                code = positions[value] = len(positions)
+            codes.append(code)
+        columns[name] = {"values": list(positions), "codes": codes}
+    return columns
+
+
+def decode_columns(columns: dict) -> List[dict]:
+    """Inverse of ``encode_columns`` (what a client does after downloading)"""
+    count = len(columns["_id"])
+    rows = [{} for _ in range(count)]
+    for name, column in columns.items():
+        if isinstance(column, dict):
+            values = column["values"]
+            for row, code in zip(rows, column["codes"]):
+                row[name] = values[code]
+        else:
+            for row, value in zip(rows, column):
+                row[name] = value
+    return rows
+
+
+def render(entries: List[dict], generated_at: datetime, sync_token: str) -> bytes:
+    document = {
+        "format": SNAPSHOT_FORMAT,
+        "generated_at": generated_at.isoformat(),
+        "sync_token": sync_token,
+        "count": len(entries),
+        "columns": encode_columns(entries),
+    }
+    payload = json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # mtime=0 keeps the output byte-identical for identical input
+    return gzip.compress(payload, compresslevel=9, mtime=0)
+
+
+class DirectorySnapshot:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.directory, META_FILE)
+
+    def meta(self) -> Optional[dict]:
+        """ETag and build info of the snapshot currently on disk (written by any worker)"""
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as handle:
+                meta = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return meta if os.path.exists(self.path) else None
+
+    def read_plain(self) -> bytes:
+        """The snapshot on disk, decompressed, for clients that don't accept gzip"""
+        with open(self.path, "rb") as handle:
+            return gzip.decompress(handle.read())
+
+    def age_seconds(self) -> Optional[float]:
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    async def build(self, db) -> dict:
+        """Read the directory and atomically replace the snapshot file"""
+        async with self._lock:
+            # Anything written after this moment is delivered again by the change feed
+            generated_at = datetime.utcnow() - timedelta(milliseconds=settings.change_feed_lag_ms)
+            sync_token = token_at(generated_at)
+
+            projection = {name: 1 for name in PLAIN_COLUMNS + DICTIONARY_COLUMNS}
+            cursor = db.directory.find({}, projection).sort("_id", 1)
+            entries = []
+            while True:
+                batch = await cursor.to_list(length=FETCH_BATCH_SIZE)
+                if not batch:
+                    break
+                entries.extend(batch)
+            await reference_data.expand(db, entries)
+
+            data = await asyncio.to_thread(render, entries, generated_at, sync_token)
+            meta = {
+                "etag": f'"{hashlib.sha256(data).hexdigest()[:32]}"',
+                "generated_at": generated_at.isoformat(),
+                "sync_token": sync_token,
+                "count": len(entries),
+                "size": len(data),
+            }
+            await asyncio.to_thread(self._write, data, meta)
+            logger.info(f"Directory snapshot rebuilt: {len(entries)} entries, {len(data)} bytes")
+            return meta
+
+    def _write(self, data: bytes, meta: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        suffix = f".{os.getpid()}.tmp"
+        with open(self.path + suffix, "wb") as handle:
+            handle.write(data)
+        with open(self.meta_path + suffix, "w", encoding="utf-8") as handle:
+            json.dump(meta, handle)
+        # Readers pair the file with its meta, so replace the file first: a stale ETag only costs a re-download
+        os.replace(self.path + suffix, self.path)
+        os.replace(self.meta_path + suffix, self.meta_path)
+
+    async def ensure(self, db) -> dict:
+        """The current snapshot's meta, building it first if there is none yet"""
+        meta = self.meta()
+        if meta is None:
+            meta = await self.build(db)
+        return meta
+
+    async def _rebuild_periodically(self, db, interval: float):
+        while True:
+            try:
+                age = self.age_seconds()
+                # Workers share the snapshot directory; only rebuild if nobody else did recently
+                if age is None or age >= interval:
+                    await self.build(db)
+                    age = 0
+                await asyncio.sleep(max(interval - age, 1))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not rebuild directory snapshot: {e}")
+                await asyncio.sleep(interval)
+
+    def start(self, db, interval: float):
+        if interval > 0:
+            self._task = asyncio.create_task(self._rebuild_periodically(db, interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+directory_snapshot = DirectorySnapshot(settings.snapshot_dir)
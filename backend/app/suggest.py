@@ -0,0 +1,243 @@
+"""
+Typeahead suggestions and spelling normalization for free-text fields.
+
+City, district, profession and caste are typed in by hand, so the same value
+arrives as "Lahore", "lahore " and "LAHORE". For each field, every worker keeps
+an in-memory vocabulary of the distinct values in ``directory`` and
+``family_directory``, weighted by how many entries use them. Values are keyed
+by their case-folded, whitespace-collapsed form. The most common spelling of a
+key is its canonical spelling.
+
+Keys are indexed in a prefix trie at every word start, so "khan" finds
+"Dera Ghazi Khan". Each trie node caches its best completions until a count
+below it changes. A suggestion is therefore a walk down a few nodes and never
+touches the database.
+
+The vocabulary is loaded at startup and reloaded every
+``SUGGEST_RELOAD_INTERVAL_SECONDS``. Write handlers adjust the counts in
+between: creates add an entry's values, deletes remove them, and updates
+(including single-member changes) move the counts from the old values to the
+new ones. Create and update handlers also pass incoming values
+through ``normalize``, so a known value is stored with its canonical spelling
+and the exact-match filters and caste statistics don't fragment.
+"""
+import asyncio
+import heapq
+import logging
+from typing import Dict, Iterator, List, Optional
+
+from app.config import settings
+from app.reference import reference_data
+
+logger = logging.getLogger(__name__)
+
+MAX_SUGGESTIONS = 20
+
+# (field, collection, path); family member professions live in the family_members array
+SOURCES = [
+    ("city", "directory", "city"),
+    ("city", "family_directory", "city"),
+    ("district", "directory", "district"),
+    ("district", "family_directory", "district"),
+    ("profession", "directory", "profession"),
+    ("profession", "family_directory", "family_members.profession"),
+    ("caste", "directory", "caste"),
+    ("caste", "family_directory", "caste"),
+]
+FIELDS = list(dict.fromkeys(field for field, _, _ in SOURCES))
+
+
+def spelling(value: str) -> str:
+    return " ".join(value.split())
+
+
+def key(value: str) -> str:
+    return spelling(value).casefold()
+
+
+class _Node:
+    __slots__ = ("children", "terms", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.terms = set()
+        self.top: Optional[List[str]] = None
+
+
+class Vocabulary:
+    """Distinct values of one field with their counts, indexed for prefix lookups"""
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = {}  # key -> {spelling: count}
+        self._root = _Node()
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def weight(self, term: str) -> int:
+        return sum(self.counts.get(term, {}).values())
+
+    def canonical(self, term: str) -> str:
+        variants = self.counts[term]
+        return max(variants, key=lambda variant: (variants[variant], variant))
+
+    def _paths(self, term: str, create: bool) -> Iterator[_Node]:
+        """Every node on the paths of the term's word-start suffixes (last one is where the suffix ends)"""
+        starts = [0] + [i + 1 for i, char in enumerate(term) if char == " "]
+        for start in starts:
+            node = self._root
+            node.top = None
+            for char in term[start:]:
+                child = node.children.get(char)
+                if child is None:
+                    if not create:
+                        break
+                    child = node.children[char] = _Node()
+                node = child
+                node.top = None
+            else:
+                yield node
+
+    def add(self, value, amount: int = 1):
+        if not isinstance(value, str) or not value.strip():
+            return
+        term = key(value)
+        if term not in self.counts and amount <= 0:
+            return
+        variants = self.counts.setdefault(term, {})
+        variant = spelling(value)
+        variants[variant] = variants.get(variant, 0) + amount
+        if variants[variant] <= 0:
+            del variants[variant]
+        if not variants:
+            del self.counts[term]
+        # Walking the paths also drops the cached completions that the new weight affects
+        for end in self._paths(term, create=True):
+            if term in self.counts:
+                end.terms.add(term)
+            else:
+                end.terms.discard(term)
+
+    def _top(self, node: _Node) -> List[str]:
+        if node.top is None:
+            terms, stack = set(), [node]
+            while stack:
+                current = stack.pop()
+                terms.update(current.terms)
+                stack.extend(current.children.values())
+            node.top = heapq.nsmallest(MAX_SUGGESTIONS, terms, key=lambda term: (-self.weight(term), term))
+        return node.top
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        node = self._root
+        for char in key(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [{"value": self.canonical(term), "count": self.weight(term)} for term in self._top(node)[:limit]]
+
+    def normalize(self, value):
+        """The canonical spelling of a known value; otherwise the value with whitespace collapsed"""
+        if not isinstance(value, str) or not value.strip():
+            return value
+        term = key(value)
+        return self.canonical(term) if term in self.counts else spelling(value)
+
+
+def _values(document: dict, path: str) -> List:
+    if path.startswith("family_members."):
+        name = path.split(".", 1)[1]
+        return [member.get(name) for member in document.get("family_members") or [] if isinstance(member, dict)]
+    return [document.get(path)]
+
+
+class Suggestions:
+    def __init__(self):
+        self.vocabularies: Dict[str, Vocabulary] = {field: Vocabulary() for field in FIELDS}
+        self._task = None
+
+    async def load(self, db):
+        """Rebuild every vocabulary from the distinct values in the database"""
+        try:
+            vocabularies = {field: Vocabulary() for field in FIELDS}
+            for field, collection, path in SOURCES:
+                pipeline = [{"$group": {"_id": f"${path}", "count": {"$sum": 1}}}]
+                if path.startswith("family_members."):
+                    pipeline.insert(0, {"$unwind": "$family_members"})
+                groups = await db[collection].aggregate(pipeline).to_list(length=None)
+                await reference_data.resolve(db, (group["_id"] for group in groups))
+                for group in groups:
+                    vocabularies[field].add(reference_data.name(group["_id"]), group["count"])
+            self.vocabularies = vocabularies
+            logger.info("Loaded suggestion vocabularies: " + ", ".join(f"{field} {len(vocabulary)}" for field, vocabulary in vocabularies.items()))
+        except Exception as e:
+            logger.error(f"Error loading suggestion vocabularies: {e}")
+
+    def record(self, collection: str, document: Optional[dict], amount: int = 1):
+        """Count a created (``amount=1``) or deleted (``amount=-1``) entry's values"""
+        if not document:
+            return
+        for field, source, path in SOURCES:
+            if source == collection:
+                for value in _values(document, path):
+                    self.vocabularies[field].add(reference_data.name(value), amount)
+
+    def replace(self, collection: str, before: Optional[dict], after: Optional[dict]):
+        """Move an updated entry's counts from its ``before`` values to its ``after`` values"""
+        if not before or not after:
+            return
+        for field, source, path in SOURCES:
+            if source != collection:
+                continue
+            old, new = _values(before, path), _values(after, path)
+            if old == new:
+                continue
+            for value in old:
+                self.vocabularies[field].add(reference_data.name(value), -1)
+            for value in new:
+                self.vocabularies[field].add(reference_data.name(value), 1)
+
+    def projection(self, collection: str) -> Dict[str, int]:
+        """The fields ``record`` and ``replace`` read, for projecting a write's returned document"""
+        return {path: 1 for _, source, path in SOURCES if source == collection}
+
+    def normalize_value(self, field: str, value):
+        if not settings.suggest_normalize_writes:
+            return value
+        return self.vocabularies[field].normalize(value)
+
+    def normalize(self, collection: str, data: dict) -> dict:
+        """Replace the known values in incoming (possibly partial) entry data with their canonical spelling"""
+        for field, source, path in SOURCES:
+            if source != collection:
+                continue
+            if path.startswith("family_members."):
+                name = path.split(".", 1)[1]
+                for member in data.get("family_members") or []:
+                    if name in member:
+                        member[name] = self.normalize_value(field, member[name])
+            elif path in data:
+                data[path] = self.normalize_value(field, data[path])
+        return data
+
+    def suggest(self, field: str, prefix: str, limit: int = 10) -> List[dict]:
+        return self.vocabularies[field].suggest(prefix, limit)
+
+    async def _reload_periodically(self, db, interval: float):
+        # Picks up other workers' writes and edits, which only change counts locally on this worker
+        while True:
+            await asyncio.sleep(interval)
+            await self.load(db)
+
+    def start(self, db, interval: float):
+        if interval > 0:
+            self._task = asyncio.create_task(self._reload_periodically(db, interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+suggestions = Suggestions()
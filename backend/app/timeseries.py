@@ -0,0 +1,149 @@
+"""
+Pre-bucketed creation counts for the admin dashboard's trend charts.
+
+Each series (directory entries, family entries, contact messages, chatbot
+conversations) keeps one counter document per day, ISO week (starting Monday)
+and month in ``timeseries_buckets``:
+
+    {"_id": "directory:week:2024-04-29", "series": "directory", "granularity": "week",
+     "start": datetime(2024, 4, 29), "count": 17}
+
+Handlers ``$inc`` the three buckets of a document's ``created_at`` when they
+insert it and decrement them when they delete it, so a bucket counts the
+documents created in that period that still exist. Range queries read only
+bucket documents, so their cost depends on the range, not the collection size.
+The ``timeseries_backfill`` job recomputes every bucket from the source
+collections with ``$dateTrunc``, or by reading the timestamps where the server
+doesn't support it (first start, or after writes made outside the API).
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = "timeseries_buckets"
+GRANULARITIES = ["day", "week", "month"]
+MAX_BUCKETS = 1000
+
+# series -> (collection, timestamp field)
+SERIES: Dict[str, tuple] = {
+    "directory": ("directory", "created_at"),
+    "family_directory": ("family_directory", "created_at"),
+    "contact_messages": ("contact_messages", "created_at"),
+    "conversations": ("conversations", "timestamp"),
+}
+
+BUCKET_INDEXES = [
+    IndexModel([("series", ASCENDING), ("granularity", ASCENDING), ("start", ASCENDING)]),
+]
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing ``moment`` (same boundaries as ``$dateTrunc`` in UTC)"""
+    day = datetime(moment.year, moment.month, moment.day)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_bucket(start: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(weeks=1)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def bucket_id(series: str, granularity: str, start: datetime) -> str:
+    return f"{series}:{granularity}:{start.date().isoformat()}"
+
+
+async def record(db, series: str, moment: Optional[datetime], amount: int = 1):
+    """Count one created (``amount=1``) or deleted (``amount=-1``) document in its day, week and month"""
+    if moment is None:
+        return
+    updates = []
+    for granularity in GRANULARITIES:
+        start = bucket_start(moment, granularity)
+        updates.append(db[BUCKETS].update_one(
+            {"_id": bucket_id(series, granularity, start)},
+            {"$inc": {"count": amount}, "$setOnInsert": {"series": series, "granularity": granularity, "start": start}},
+            upsert=True
+        ))
+    try:
+        await asyncio.gather(*updates)
+    except Exception as e:
+        # A missed count is repaired by the next backfill; never fail the write that triggered it
+        logger.warning(f"Could not update {series} time-series buckets: {e}")
+
+
+def backfill_pipeline(field: str, granularity: str) -> List[dict]:
+    trunc = {"date": f"${field}", "unit": granularity}
+    if granularity == "week":
+        trunc["startOfWeek"] = "monday"
+    return [
+        {"$match": {field: {"$type": "date"}}},
+        {"$group": {"_id": {"$dateTrunc": trunc}, "count": {"$sum": 1}}},
+    ]
+
+
+async def _bucket_counts(db, collection: str, field: str, granularity: str) -> Dict[datetime, int]:
+    try:
+        groups = await db[collection].aggregate(backfill_pipeline(field, granularity), allowDiskUse=True).to_list(length=None)
+        return {group["_id"]: group["count"] for group in groups}
+    except OperationFailure:
+        # $dateTrunc needs MongoDB 5.0; without it (or on mongomock) the timestamps are bucketed here
+        counts = Counter()
+        async for document in db[collection].find({field: {"$type": "date"}}, {field: 1}):
+            counts[bucket_start(document[field], granularity)] += 1
+        return dict(counts)
+
+
+async def backfill(db, progress=None) -> dict:
+    """Recompute every bucket from the source collections"""
+    written = 0
+    steps = [(series, granularity) for series in SERIES for granularity in GRANULARITIES]
+    for done, (series, granularity) in enumerate(steps, start=1):
+        collection, field = SERIES[series]
+        counts = await _bucket_counts(db, collection, field, granularity)
+        for start, count in counts.items():
+            await db[BUCKETS].update_one(
+                {"_id": bucket_id(series, granularity, start)},
+                {"$set": {"series": series, "granularity": granularity, "start": start, "count": count}},
+                upsert=True
+            )
+        # Buckets whose documents were all deleted behind the API's back
+        await db[BUCKETS].update_many(
+            {"series": series, "granularity": granularity, "start": {"$nin": list(counts)}},
+            {"$set": {"count": 0}}
+        )
+        written += len(counts)
+        if progress is not None:
+            await progress(done / len(steps))
+    logger.info(f"Time-series buckets backfilled: {written} buckets")
+    return {"buckets": written}
+
+
+async def query(db, series: str, granularity: str, start: datetime, end: datetime) -> List[dict]:
+    """Bucket counts from ``start`` to ``end`` (inclusive), with empty buckets filled in as 0"""
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    cursor = db[BUCKETS].find(
+        {"series": series, "granularity": granularity, "start": {"$gte": first, "$lte": last}},
+        {"start": 1, "count": 1}
+    ).sort("start", 1)
+    counts = {bucket["start"]: bucket["count"] for bucket in await cursor.to_list(length=MAX_BUCKETS)}
+
+    points = []
+    moment = first
+    while moment <= last and len(points) < MAX_BUCKETS:
+        points.append({"start": moment.date().isoformat(), "count": counts.get(moment, 0)})
+        moment = next_bucket(moment, granularity)
+    return points
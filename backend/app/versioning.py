@@ -0,0 +1,59 @@
+"""
+Optimistic concurrency for directory and family entries.
+
+Every document carries a ``version`` that starts at 1 and is incremented by
+each write. It is exposed as a strong ETag (``"<version>"``). Writers send it
+back in ``If-Match`` (or as ``version`` in the body); the update only applies
+when the stored version still matches, otherwise the client gets
+``412 Precondition Failed`` with the current ETag and must re-read.
+"""
+from typing import List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+
+def etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _versions(header: str) -> List[int]:
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        # Weak tags never satisfy If-Match (RFC 9110 uses strong comparison there)
+        if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+            versions.append(int(tag[1:-1]))
+    return versions
+
+
+def version_filter(if_match: Optional[str], expected_version: Optional[int] = None) -> dict:
+    """Extra update filter enforcing the client's precondition ({} when there is none)"""
+    if expected_version is not None:
+        return {"version": expected_version}
+    if if_match is None or if_match.strip() == "*":
+        return {}
+    # Unparseable tags leave an empty $in, which can never match: the update fails with 412
+    return {"version": {"$in": _versions(if_match)}}
+
+
+def not_modified(if_none_match: Optional[str], version: int) -> bool:
+    """If-None-Match uses weak comparison, so W/"3" matches version 3"""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag(version) in tags
+
+
+async def raise_update_failed(collection, document_id: str, precondition: dict, not_found: str):
+    """Explain why a versioned update matched nothing: missing document (404) or stale version (412)"""
+    current = await collection.find_one({"_id": ObjectId(document_id)}, {"version": 1})
+    if current is None or not precondition:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Entry was modified by someone else; reload it and retry",
+        headers={"ETag": etag(current.get("version", 1))},
+    )
@@ -0,0 +1 @@
+# Benchmark and load-testing suite for Arain Association Youth Wing Pakistan Backend
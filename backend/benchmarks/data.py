@@ -0,0 +1,207 @@
+"""
+Synthetic Pakistani directory data for benchmarks.
+
+Generation is seeded so that every run at a given scale produces the same
+documents, which keeps benchmark baselines comparable between runs.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+FIRST_NAMES_MALE = [
+    "Ahmad", "Ali", "Muhammad", "Usman", "Bilal", "Hamza", "Hassan", "Hussain", "Imran", "Kashif",
+    "Naveed", "Omer", "Rizwan", "Saad", "Tariq", "Waqas", "Zain", "Faisal", "Junaid", "Asad",
+]
+FIRST_NAMES_FEMALE = [
+    "Ayesha", "Fatima", "Hira", "Iqra", "Khadija", "Maryam", "Nimra", "Rabia", "Sana", "Zainab",
+    "Amna", "Sadia", "Mehwish", "Saba", "Uzma",
+]
+FAMILY_NAMES = ["Arain", "Chaudhry", "Mian", "Rao", "Malik", "Sheikh", "Ansari", "Qureshi"]
+
+# province -> district -> cities
+LOCATIONS: Dict[str, Dict[str, List[str]]] = {
+    "Punjab": {
+        "Lahore": ["Lahore", "Raiwind"],
+        "Faisalabad": ["Faisalabad", "Jaranwala", "Samundri"],
+        "Okara": ["Okara", "Depalpur", "Renala Khurd"],
+        "Kasur": ["Kasur", "Pattoki", "Chunian"],
+        "Sheikhupura": ["Sheikhupura", "Muridke"],
+        "Multan": ["Multan", "Shujabad"],
+        "Sahiwal": ["Sahiwal", "Chichawatni"],
+        "Rawalpindi": ["Rawalpindi", "Murree"],
+    },
+    "Sindh": {
+        "Karachi": ["Karachi"],
+        "Hyderabad": ["Hyderabad", "Latifabad"],
+        "Sukkur": ["Sukkur", "Rohri"],
+    },
+    "Khyber Pakhtunkhwa": {
+        "Peshawar": ["Peshawar"],
+        "Abbottabad": ["Abbottabad", "Havelian"],
+    },
+    "Balochistan": {
+        "Quetta": ["Quetta"],
+    },
+    "Islamabad Capital Territory": {
+        "Islamabad": ["Islamabad"],
+    },
+}
+CASTES = ["Arain", "Mian", "Chaudhry", "Rai", "Mehr", "Malik"]
+PROFESSIONS = [
+    "Engineer", "Doctor", "Teacher", "Farmer", "Businessman", "Lawyer", "Accountant",
+    "Student", "Software Developer", "Pharmacist", "Civil Servant", "Shopkeeper",
+]
+QUALIFICATIONS = ["Matric", "Intermediate", "Bachelors", "Masters", "MPhil", "PhD"]
+BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-", None]
+RELATIONS = ["spouse", "son", "daughter", "father", "mother", "brother", "sister"]
+
+PLACES = [
+    (province, district, city)
+    for province, districts in LOCATIONS.items()
+    for district, cities in districts.items()
+    for city in cities
+]
+
+
+def _name(rng: random.Random, gender: str) -> str:
+    first = rng.choice(FIRST_NAMES_FEMALE if gender == "female" else FIRST_NAMES_MALE)
+    return f"{first} {rng.choice(FAMILY_NAMES)}"
+
+
+def _cnic(rng: random.Random, index: int) -> str:
+    return f"{rng.randint(10000, 99999)}-{index % 10_000_000:07d}-{rng.randint(0, 9)}"
+
+
+def _phone(rng: random.Random) -> str:
+    return f"+923{rng.randint(0, 499_999_999):09d}"
+
+
+def _created_at(rng: random.Random) -> datetime:
+    return datetime(2023, 1, 1) + timedelta(seconds=rng.randint(0, 3 * 365 * 24 * 3600))
+
+
+def directory_documents(count: int, seed: int = 42) -> Iterator[dict]:
+    """Yield ``count`` directory documents shaped like ``DirectoryCreate`` plus timestamps."""
+    rng = random.Random(seed)
+    for index in range(count):
+        gender = rng.choice(["male", "male", "female"])
+        province, district, city = rng.choice(PLACES)
+        created_at = _created_at(rng)
+        yield {
+            "full_name": _name(rng, gender),
+            "father_name": _name(rng, "male"),
+            "cnic": _cnic(rng, index),
+            "gender": gender,
+            "phone": _phone(rng),
+            "email": f"member{index}@example.com",
+            "qualification": rng.choice(QUALIFICATIONS),
+            "profession": rng.choice(PROFESSIONS),
+            "city": city,
+            "district": district,
+            "province": province,
+            "country": "Pakistan",
+            "blood_group": rng.choice(BLOOD_GROUPS),
+            "caste": rng.choice(CASTES),
+            "marital_status": rng.choice(["single", "married", "married", "widowed"]),
+            "membership_type": rng.choice(["member", "member", "volunteer", "donor"]),
+            "notes": None,
+            "profile_image": None,
+            "family_members_count": rng.randint(1, 12),
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def family_documents(count: int, seed: int = 7) -> Iterator[dict]:
+    """Yield ``count`` family directory documents with embedded family members."""
+    rng = random.Random(seed)
+    for index in range(count):
+        province, district, city = rng.choice(PLACES)
+        created_at = _created_at(rng)
+        members = []
+        for number in range(rng.randint(1, 8)):
+            gender = rng.choice(["male", "female"])
+            members.append({
+                # The API gives every member an ID; the donor index only lists members that have one
+                "member_id": f"bench-{index}-{number}",
+                "name": _name(rng, gender),
+                "age": rng.randint(0, 90),
+                "gender": gender,
+                "relation": rng.choice(RELATIONS),
+                "cnic": None,
+                "profession": rng.choice(PROFESSIONS),
+                "qualification": rng.choice(QUALIFICATIONS),
+                "phone": None,
+                "email": None,
+                "blood_group": rng.choice(BLOOD_GROUPS),
+                "notes": None,
+            })
+        yield {
+            "head_of_family_name": _name(rng, "male"),
+            "family_members": members,
+            "total_members": len(members),
+            "address": f"House {index % 500 + 1}, Street {rng.randint(1, 40)}, {city}",
+            "city": city,
+            "district": district,
+            "province": province,
+            "country": "Pakistan",
+            "postal_code": f"{rng.randint(10000, 99999)}",
+            "phone": _phone(rng),
+            "email": None,
+            "caste": rng.choice(CASTES),
+            "membership_type": rng.choice(["member", "volunteer", "donor"]),
+            "notes": None,
+            "family_photo": None,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def contact_documents(count: int, seed: int = 11) -> Iterator[dict]:
+    """Yield ``count`` contact messages."""
+    rng = random.Random(seed)
+    for index in range(count):
+        created_at = _created_at(rng)
+        yield {
+            "name": _name(rng, rng.choice(["male", "female"])),
+            "email": f"contact{index}@example.com",
+            "phone": _phone(rng),
+            "subject": "Membership enquiry",
+            "message": "I would like to know more about the association and its welfare projects.",
+            "is_read": rng.random() < 0.6,
+            "created_at": created_at,
+        }
+
+
+async def _insert_batched(collection, documents: Iterator[dict], batch_size: int):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def seed_database(db, scale: int, batch_size: int = 5000) -> Dict[str, int]:
+    """
+    Drop and reseed the benchmark collections.
+
+    ``scale`` is the directory size; families and contact messages are seeded
+    proportionally so aggregation endpoints see realistic ratios.
+    """
+    counts = {
+        "directory": scale,
+        "family_directory": max(scale // 4, 1),
+        "contact_messages": max(scale // 20, 1),
+    }
+    for name in counts:
+        await db[name].drop()
+
+    await _insert_batched(db.directory, directory_documents(counts["directory"]), batch_size)
+    await _insert_batched(db.family_directory, family_documents(counts["family_directory"]), batch_size)
+    await _insert_batched(db.contact_messages, contact_documents(counts["contact_messages"]), batch_size)
+    return counts
@@ -0,0 +1,124 @@
+"""
+Storage and aggregation benchmark for reference-data codes.
+
+Loads the same synthetic directory into a mongod twice. In one collection
+province, district, city and caste are strings (the layout before reference
+data). In the other they are ``reference_data`` codes. The script builds the
+production indexes on both collections, then prints and saves data and index
+sizes from ``collStats``. It also prints median timings of the location and
+caste ``$group`` aggregations the statistics endpoints run.
+
+Needs a real mongod (mongomock has no ``collStats``). Run from the backend
+directory:
+
+    python -m benchmarks.reference_data --scale 100k --mongodb-url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from pymongo import ASCENDING, IndexModel
+
+from benchmarks.data import SCALES, directory_documents
+
+BENCH_DATABASE = "arain_association_reference_bench"
+INDEXES = [
+    IndexModel([("city", ASCENDING)]),
+    IndexModel([("caste", ASCENDING)]),
+    IndexModel([("province", ASCENDING)]),
+    IndexModel([("blood_group", ASCENDING), ("city", ASCENDING)]),
+]
+
+
+def pipelines(city) -> Dict[str, List[dict]]:
+    """The aggregations to time; ``city`` is Lahore in the layout being measured"""
+    return {
+        "group_by_city": [{"$group": {"_id": "$city", "count": {"$sum": 1}}}],
+        "group_by_province_district": [{"$group": {"_id": {"p": "$province", "d": "$district"}, "count": {"$sum": 1}}}],
+        "group_by_caste_community": [{"$group": {"_id": "$caste", "members": {"$sum": "$family_members_count"}}}],
+        "match_city_group_caste": [{"$match": {"city": city}}, {"$group": {"_id": "$caste", "count": {"$sum": 1}}}],
+    }
+
+
+async def _load(db, name: str, documents: List[dict], batch_size: int = 5000):
+    await db[name].drop()
+    for start in range(0, len(documents), batch_size):
+        await db[name].insert_many([dict(document) for document in documents[start:start + batch_size]], ordered=False)
+    await db[name].create_indexes(INDEXES)
+
+
+async def _time(collection, pipeline: List[dict], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await collection.aggregate(pipeline).to_list(length=None)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+async def main(args) -> Dict:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.reference import reference_data
+
+    client = AsyncIOMotorClient(args.mongodb_url)
+    db = client[BENCH_DATABASE]
+    await db.reference_data.drop()
+    await db.reference_counters.drop()
+    await reference_data.load(db)
+
+    strings = list(directory_documents(SCALES[args.scale]))
+    codes = [await reference_data.encode(db, dict(document)) for document in strings]
+    await _load(db, "directory_strings", strings)
+    await _load(db, "directory_codes", codes)
+    lahore = await reference_data.lookup(db, "city", "Lahore")
+
+    report = {"scale": args.scale, "documents": len(strings), "reference_entries": len(reference_data), "layouts": {}}
+    for layout, city in (("strings", "Lahore"), ("codes", lahore)):
+        name = f"directory_{layout}"
+        stats = await db.command("collStats", name)
+        timings = {
+            pipeline_name: await _time(db[name], pipeline, args.repeat)
+            for pipeline_name, pipeline in pipelines(city).items()
+        }
+        report["layouts"][layout] = {
+            "avg_document_bytes": stats.get("avgObjSize"),
+            "data_bytes": stats.get("size"),
+            "storage_bytes": stats.get("storageSize"),
+            "index_bytes": {index: size for index, size in stats.get("indexSizes", {}).items() if index != "_id_"},
+            "total_index_bytes": stats.get("totalIndexSize"),
+            "aggregation_ms_p50": timings,
+        }
+
+    before, after = report["layouts"]["strings"], report["layouts"]["codes"]
+    print(f"{'':32}{'strings':>14}{'codes':>14}")
+    for label, key in (("avg document bytes", "avg_document_bytes"), ("data bytes", "data_bytes"), ("total index bytes", "total_index_bytes")):
+        print(f"{label:32}{before[key]:>14}{after[key]:>14}")
+    for index in before["index_bytes"]:
+        print(f"  {index:30}{before['index_bytes'][index]:>14}{after['index_bytes'].get(index, 0):>14}")
+    for pipeline_name in before["aggregation_ms_p50"]:
+        print(f"{pipeline_name + ' ms':32}{before['aggregation_ms_p50'][pipeline_name]:>14}{after['aggregation_ms_p50'][pipeline_name]:>14}")
+
+    if not args.keep:
+        await client.drop_database(BENCH_DATABASE)
+    client.close()
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare string and reference-code storage for location and caste fields")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="100k")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--repeat", type=int, default=15, help="Runs per aggregation (median is reported)")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database afterwards")
+    parser.add_argument("--output", default="benchmarks/results/reference_data.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
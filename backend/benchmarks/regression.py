@@ -0,0 +1,67 @@
+"""
+Compare a benchmark results file against a baseline.
+
+Exits non-zero when any hot endpoint got slower than the baseline by more
+than the tolerance (p95 latency up, or throughput down), so it can gate CI:
+
+    python -m benchmarks.regression benchmarks/baseline.json benchmarks/results/current.json --tolerance 0.15
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional
+
+
+def find_regressions(baseline: Dict, current: Dict, tolerance: float = 0.15,
+                     endpoints: Optional[List[str]] = None) -> List[str]:
+    """Return a human readable description of every regressed endpoint."""
+    regressions = []
+    base_rows = baseline.get("endpoints", {})
+    current_rows = current.get("endpoints", {})
+
+    names = endpoints or [name for name, row in base_rows.items() if row.get("hot")]
+    for name in names:
+        base = base_rows.get(name)
+        now = current_rows.get(name)
+        if base is None:
+            continue
+        if now is None:
+            regressions.append(f"{name}: missing from current results")
+            continue
+        if now.get("errors", 0) > base.get("errors", 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {now['errors']}")
+        if base["p95_ms"] > 0 and now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.2f}ms -> {now['p95_ms']:.2f}ms")
+        if base["throughput_rps"] > 0 and now["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_rps']:.1f} -> {now['throughput_rps']:.1f} rps")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fail when hot endpoints regress against a baseline")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown (0.15 = 15%%)")
+    parser.add_argument("--endpoints", default=None, help="Comma separated endpoints to check instead of the hot set")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    if baseline.get("meta", {}).get("scale") != current.get("meta", {}).get("scale"):
+        print("Warning: baseline and current results were recorded at different scales", file=sys.stderr)
+
+    endpoints = args.endpoints.split(",") if args.endpoints else None
+    regressions = find_regressions(baseline, current, args.tolerance, endpoints)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        return 1
+    print("No regressions on hot endpoints")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
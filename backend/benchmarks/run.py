@@ -0,0 +1,378 @@
+"""
+Benchmark driver for the API.
+
+Seeds a database with synthetic directory data, then drives every router with
+concurrent async clients and records throughput and p50/p95/p99 latency per
+endpoint into a JSON results file that can be compared against a baseline
+with ``python -m benchmarks.regression``.
+
+Examples (run from the backend directory):
+
+    # In-process app against mongomock-motor, 10k directory entries
+    python -m benchmarks.run --scale 10k --backend mongomock --output benchmarks/results/current.json
+
+    # In-process app against a local mongod at 100k scale
+    python -m benchmarks.run --scale 100k --backend mongod --mongodb-url mongodb://localhost:27017
+
+    # Seed a local mongod and drive an already running server
+    python -m benchmarks.run --scale 1m --backend mongod --base-url http://localhost:8000
+
+With ``--base-url`` the server must read the database that was seeded: start it
+with ``DATABASE_NAME`` equal to ``--database`` (``arain_association_bench`` by
+default), the same MongoDB, the same ``SECRET_KEY`` (the admin token is
+signed here) and ``RATE_LIMIT_ENABLED=False``. The server loads its suggestion
+vocabulary at startup and every ``SUGGEST_RELOAD_INTERVAL_SECONDS``, so
+``directory.suggest`` fails its check until it has read the seeded data:
+restart the server after a first seeding (the synthetic data is the same on
+every run at a given scale). Seeding drops the users, directory and related
+collections of that database, so never point it at a database that holds real
+data.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.data import SCALES, seed_database
+
+BENCH_DATABASE = "arain_association_bench"
+BENCH_PASSWORD = "bench-password"
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: str
+    hot: bool = False
+    admin: bool = False
+    body: Optional[Callable[[random.Random], dict]] = None
+    requests: Optional[int] = None  # overrides --requests for expensive endpoints
+    expect: Optional[Callable[[dict], bool]] = None  # checked on one response's data before timing
+
+
+def _directory_body(rng: random.Random) -> dict:
+    index = rng.randint(0, 9_999_999)
+    return {
+        "full_name": "Bench User",
+        "father_name": "Bench Father",
+        "cnic": f"35202-{index:07d}-1",
+        "gender": "male",
+        "phone": "+923001234567",
+        "email": f"bench{index}@example.com",
+        "qualification": "Masters",
+        "profession": "Engineer",
+        "city": "Lahore",
+        "district": "Lahore",
+        "province": "Punjab",
+        "caste": "Arain",
+        "marital_status": "single",
+        "membership_type": "member",
+    }
+
+
+def _family_body(rng: random.Random) -> dict:
+    return {
+        "head_of_family_name": "Bench Head",
+        "family_members": [
+            {"name": "Bench Spouse", "age": 40, "gender": "female", "relation": "spouse", "blood_group": "B+"},
+            {"name": "Bench Son", "age": 12, "gender": "male", "relation": "son"},
+        ],
+        "address": "House 1, Street 2, Model Town",
+        "city": "Lahore",
+        "district": "Lahore",
+        "province": "Punjab",
+        "phone": "+923001234567",
+        "caste": "Arain",
+    }
+
+
+def _contact_body(rng: random.Random) -> dict:
+    return {
+        "name": "Bench User",
+        "email": "bench@example.com",
+        "phone": "+923001234567",
+        "subject": "Benchmark message",
+        "message": "This is a synthetic message sent by the benchmark suite.",
+    }
+
+
+def _chat_body(rng: random.Random) -> dict:
+    return {"message": rng.choice(["How do I register?", "Tell me about scholarships", "I want to donate"])}
+
+
+ENDPOINTS: List[Endpoint] = [
+    # Directory
+    Endpoint("directory.list", "GET", "/api/directory/?page={page}&limit=20", hot=True),
+    Endpoint("directory.list_filtered", "GET", "/api/directory/?city={city}&caste={caste}&limit=20", hot=True),
+    Endpoint("directory.list_faceted", "GET", "/api/directory/?caste={caste}&page={page}&limit=20&facets=true", hot=True),
+    Endpoint("directory.get", "GET", "/api/directory/{directory_id}", hot=True),
+    Endpoint("directory.count", "GET", "/api/directory/count", hot=True),
+    Endpoint("directory.suggest", "GET", "/api/directory/suggest?field=city&q=la", hot=True,
+             expect=lambda data: len(data["suggestions"]) > 0),
+    Endpoint("directory.community_strength", "GET", "/api/directory/community_strength"),
+    Endpoint("directory.create", "POST", "/api/directory/", hot=True, body=_directory_body),
+    Endpoint("family.list", "GET", "/api/directory/family/all?page={page}&limit=20", hot=True),
+    Endpoint("family.list_filtered", "GET", "/api/directory/family/all?city={city}&min_members=3&limit=20"),
+    Endpoint("family.list_faceted", "GET", "/api/directory/family/all?caste={caste}&limit=20&facets=true"),
+    Endpoint("family.get", "GET", "/api/directory/family/{family_id}", hot=True),
+    Endpoint("family.total_population", "GET", "/api/directory/family/total_population"),
+    Endpoint("family.caste_stats", "GET", "/api/directory/family/stats/caste", admin=True),
+    Endpoint("family.create", "POST", "/api/directory/family", body=_family_body),
+    Endpoint("directory.donors", "GET", "/api/directory/donors?blood_group=A-&city={city}&limit=50", admin=True,
+             expect=lambda data: len(data["donors"]) == 50),
+    # Analytics
+    Endpoint("analytics.rollup", "GET", "/api/analytics/rollup?source=family&dimensions=province,caste", admin=True,
+             expect=lambda data: data["totals"]["families"] > 0),
+    # 30 weeks, as by default, but inside the seeded 2023-2025 range
+    Endpoint("analytics.timeseries", "GET", "/api/analytics/timeseries?series=directory&granularity=week&start=2025-06-02&end=2025-12-28",
+             admin=True, expect=lambda data: sum(point["count"] for point in data["points"]) > 0),
+    # Contact
+    Endpoint("contact.create", "POST", "/api/contact/", hot=True, body=_contact_body),
+    Endpoint("contact.list", "GET", "/api/contact/?page={page}&limit=20", admin=True),
+    Endpoint("contact.stats", "GET", "/api/contact/stats/count", admin=True),
+    # AI agent (fallback responses only; the OpenRouter key is cleared in-process)
+    Endpoint("agent.chat", "POST", "/api/agent/chat", hot=True, body=_chat_body),
+    Endpoint("agent.conversation_stats", "GET", "/api/agent/conversations/stats", admin=True),
+    # Auth
+    Endpoint("auth.login", "POST", "/api/auth/login", requests=50),
+    Endpoint("auth.me", "GET", "/api/auth/me", admin=True, hot=True),
+    Endpoint("auth.users", "GET", "/api/auth/users?page=1&limit=20", admin=True),
+    Endpoint("auth.stats", "GET", "/api/auth/stats", admin=True),
+]
+
+EXPORT_ENDPOINTS: List[Endpoint] = [
+    Endpoint("directory.export_csv", "GET", "/api/directory/export/csv", admin=True, requests=5),
+    Endpoint("directory.export_pdf", "GET", "/api/directory/export/pdf", admin=True, requests=5),
+]
+
+
+@dataclass
+class BenchContext:
+    directory_ids: List[str] = field(default_factory=list)
+    family_ids: List[str] = field(default_factory=list)
+    admin_token: str = ""
+    login_email: str = ""
+    pages: int = 1
+
+    def render(self, endpoint: Endpoint, rng: random.Random) -> Dict:
+        from benchmarks.data import CASTES, PLACES
+
+        _, _, city = rng.choice(PLACES)
+        path = endpoint.path.format(
+            page=rng.randint(1, self.pages),
+            city=city,
+            caste=rng.choice(CASTES),
+            directory_id=rng.choice(self.directory_ids) if self.directory_ids else "",
+            family_id=rng.choice(self.family_ids) if self.family_ids else "",
+        )
+        request = {"method": endpoint.method, "url": path, "headers": {}}
+        if endpoint.admin:
+            request["headers"]["Authorization"] = f"Bearer {self.admin_token}"
+        if endpoint.name == "auth.login":
+            request["json"] = {"email": self.login_email, "password": BENCH_PASSWORD}
+        elif endpoint.body:
+            request["json"] = endpoint.body(rng)
+        return request
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(samples)), 1)
+    return samples[min(rank, len(samples)) - 1]
+
+
+async def check_endpoint(client: httpx.AsyncClient, endpoint: Endpoint, context: BenchContext):
+    """Fail before timing an endpoint whose derived data is missing, so it wouldn't measure an empty lookup"""
+    response = await client.request(**context.render(endpoint, random.Random(0)))
+    if response.status_code >= 400 or not endpoint.expect(response.json()["data"]):
+        raise RuntimeError(f"{endpoint.name} returned no data ({response.status_code}); was its derived data built?")
+
+
+async def run_endpoint(client: httpx.AsyncClient, endpoint: Endpoint, context: BenchContext,
+                       total: int, concurrency: int, seed: int) -> Dict:
+    """Issue ``total`` requests to one endpoint from ``concurrency`` concurrent clients."""
+    rng = random.Random(seed)
+    requests = [context.render(endpoint, rng) for _ in range(total)]
+    latencies: List[float] = []
+    errors = 0
+    cursor = 0
+
+    async def worker():
+        nonlocal cursor, errors
+        while cursor < len(requests):
+            request = requests[cursor]
+            cursor += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "hot": endpoint.hot,
+        "count": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+async def prepare(db, scale: int) -> BenchContext:
+    """Seed data, build what the app derives from it, and create the admin and login users the benchmark needs."""
+    from app import donors, rollup, timeseries
+    from app.auth import create_access_token, get_password_hash
+    from app.suggest import suggestions
+
+    counts = await seed_database(db, scale)
+    # In-process runs never start the lifespan, whose scheduler would build these
+    await rollup.rebuild(db)
+    await donors.rebuild(db)
+    await timeseries.backfill(db)
+    await suggestions.load(db)
+    await db.users.drop()
+    await db.conversations.drop()
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    admin = await db.users.insert_one({
+        "email": "bench-admin@example.com",
+        "password": password_hash,
+        "full_name": "Bench Admin",
+        "role": "admin",
+        "is_active": True,
+        "created_at": datetime.utcnow(),
+    })
+    await db.users.insert_one({
+        "email": "bench-member@example.com",
+        "password": password_hash,
+        "full_name": "Bench Member",
+        "role": "member",
+        "is_active": True,
+        "created_at": datetime.utcnow(),
+    })
+
+    context = BenchContext(
+        admin_token=create_access_token({"sub": str(admin.inserted_id), "role": "admin"}),
+        login_email="bench-member@example.com",
+        pages=max(counts["directory"] // 20, 1),
+    )
+    context.directory_ids = [str(doc["_id"]) for doc in await db.directory.find({}, {"_id": 1}).limit(1000).to_list(length=1000)]
+    context.family_ids = [str(doc["_id"]) for doc in await db.family_directory.find({}, {"_id": 1}).limit(1000).to_list(length=1000)]
+    return context
+
+
+def open_database(backend: str, mongodb_url: str, database_name: str = BENCH_DATABASE):
+    """Return a (client, database) pair for the requested storage backend."""
+    if backend == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongodb_url)
+    return client, client[database_name]
+
+
+async def main(args) -> Dict:
+    from app.config import settings
+    from app.database import database
+
+    client, db = open_database(args.backend, args.mongodb_url, args.database)
+    scale = SCALES[args.scale]
+    print(f"Seeding {args.backend} with {scale} directory entries...", file=sys.stderr)
+    seed_started = time.perf_counter()
+    context = await prepare(db, scale)
+    print(f"Seeded in {time.perf_counter() - seed_started:.1f}s", file=sys.stderr)
+
+    if args.base_url:
+        http_client = httpx.AsyncClient(base_url=args.base_url, timeout=60.0)
+    else:
+        # One client address at full speed would only measure the rate limiter; read when app.main is imported
+        settings.rate_limit_enabled = False
+        from app.main import app
+
+        # Drive the app in-process against the seeded database; never call the paid LLM API
+        database.client, database.database = client, db
+        settings.openrouter_api_key = ""
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60.0)
+
+    endpoints = ENDPOINTS + (EXPORT_ENDPOINTS if args.include_exports else [])
+    if args.endpoints:
+        wanted = set(args.endpoints.split(","))
+        endpoints = [endpoint for endpoint in endpoints if endpoint.name in wanted]
+
+    results = {}
+    async with http_client:
+        for index, endpoint in enumerate(endpoints):
+            total = endpoint.requests or args.requests
+            if endpoint.expect is not None:
+                await check_endpoint(http_client, endpoint, context)
+            if args.warmup:
+                await run_endpoint(http_client, endpoint, context, min(args.warmup, total), args.concurrency, seed=index + 1000)
+            results[endpoint.name] = await run_endpoint(http_client, endpoint, context, total, args.concurrency, seed=index)
+            row = results[endpoint.name]
+            print(f"{endpoint.name:32s} {row['throughput_rps']:>9.1f} rps  p50 {row['p50_ms']:>8.2f}  "
+                  f"p95 {row['p95_ms']:>8.2f}  p99 {row['p99_ms']:>8.2f} ms  errors {row['errors']}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "scale": args.scale,
+            "backend": args.backend,
+            "target": args.base_url or "in-process",
+            "database": args.database,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "python": platform.python_version(),
+            "created_at": datetime.utcnow().isoformat(),
+        },
+        "endpoints": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Arain Association API")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default=BENCH_DATABASE,
+                        help="Database to seed; a server driven with --base-url must use it as its DATABASE_NAME")
+    parser.add_argument("--base-url", default=None, help="Drive a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="Warm-up requests per endpoint (not recorded)")
+    parser.add_argument("--endpoints", default=None, help="Comma separated endpoint names to run")
+    parser.add_argument("--include-exports", action="store_true", help="Also benchmark the CSV/PDF exports")
+    parser.add_argument("--output", default="benchmarks/results/current.json")
+    args = parser.parse_args(argv)
+    if args.base_url and args.backend != "mongod":
+        parser.error("--base-url needs --backend mongod: the server can't see an in-process mongomock database")
+    return args
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    report = asyncio.run(main(arguments))
+    output = Path(arguments.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, sort_keys=True))
+    print(f"Results written to {output}", file=sys.stderr)
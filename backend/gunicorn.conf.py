@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for production.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Runs one Uvicorn worker (uvloop + httptools) per available CPU. With
+``PRELOAD_APP`` the application is imported once in the master and workers
+fork afterwards; the Mongo client is still created per worker by the lifespan
+hook, since Motor clients must not be shared across a fork.
+"""
+from app.config import settings
+
+bind = f"{settings.host}:{settings.port}"
+workers = settings.worker_count
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = settings.preload_app
+
+# Graceful drain: on SIGTERM workers stop accepting and finish in-flight requests
+graceful_timeout = settings.graceful_timeout
+timeout = max(settings.graceful_timeout * 2, 60)
+keepalive = settings.keepalive_timeout
+
+accesslog = "-"
+errorlog = "-"
+loglevel = "debug" if settings.debug else "info"
+
+
+def post_fork(server, worker):
+    # Never inherit a database client created in the master before the fork
+    from app.database import database
+
+    database.client = None
+    database.database = None
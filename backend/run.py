@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 """
 Startup script for Arain Association Youth Wing Pakistan Backend
+
+    python run.py                 # development server (auto-reload when DEBUG is on)
+    python run.py --production    # N workers with uvloop/httptools and graceful drain
 """
 
+import argparse
+import logging
+import os
+import sys
 import uvicorn
 from app.config import settings
 
-if __name__ == "__main__":
+
+def run_development():
     uvicorn.run(
         "app.main:app",
         host=settings.host,
@@ -14,3 +22,48 @@ if __name__ == "__main__":
         reload=settings.debug,
         log_level="info" if not settings.debug else "debug"
     )
+
+
+def run_production(workers: int, preload: bool):
+    if preload:
+        # Gunicorn imports the app once in the master and forks Uvicorn workers afterwards
+        _run_gunicorn(workers)
+        return
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        reload=False,
+        proxy_headers=True,
+        timeout_keep_alive=settings.keepalive_timeout,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+        log_level="info"
+    )
+
+
+def _run_gunicorn(workers: int):
+    from gunicorn.app.wsgiapp import run
+
+    # Settings (bind, preload, graceful drain) come from gunicorn.conf.py
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+    sys.argv = ["gunicorn", "-c", config_path, "--workers", str(workers), "app.main:app"]
+    run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Arain Association backend")
+    parser.add_argument("--production", action="store_true", help="Multi-worker production server")
+    parser.add_argument("--workers", type=int, default=settings.worker_count, help="Worker processes (production only)")
+    parser.add_argument("--no-preload", action="store_true", help="Let each worker import the app itself")
+    args = parser.parse_args()
+
+    if args.production:
+        if settings.debug:
+            logging.getLogger(__name__).warning("DEBUG is enabled; set DEBUG=False for production deployments")
+        run_production(args.workers, preload=settings.preload_app and not args.no_preload)
+    else:
+        run_development()
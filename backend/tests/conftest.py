@@ -0,0 +1,15 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def mongomock_bulk_updates(monkeypatch):
+    """mongomock's bulk builder predates the ``sort`` option pymongo 4.9+ passes for UpdateOne"""
+    try:
+        from mongomock.collection import BulkOperationBuilder
+    except ImportError:
+        return
+    add_update = BulkOperationBuilder.add_update
+
+    def without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    monkeypatch.setattr(BulkOperationBuilder, "add_update", without_sort)
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.circuit_breaker import CircuitBreaker, OPEN, CLOSED, HALF_OPEN
+from app.routers.agent import AIAgent
+
+class FakeUpstream:
+    """Local stand-in for OpenRouter that injects latency and errors per model"""
+
+    def __init__(self):
+        self.calls = {}
+        self.behaviour = {}  # model -> list of (delay_seconds, status_code), last entry repeats
+        self.app = FastAPI()
+
+        @self.app.post("/chat/completions")
+        async def completions(request: Request):
+            payload = await request.json()
+            model = payload["model"]
+            self.calls[model] = self.calls.get(model, 0) + 1
+            plan = self.behaviour.get(model, [(0, 200)])
+            delay, status_code = plan[min(self.calls[model] - 1, len(plan) - 1)]
+            await asyncio.sleep(delay)
+            if status_code != 200:
+                return JSONResponse({"error": "upstream error"}, status_code=status_code)
+            return {"choices": [{"message": {"content": f"reply from {model}"}}]}
+
+    def agent(self, models):
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), timeout=5.0)
+        return AIAgent(http_client=client, models=models)
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(settings, "openrouter_api_key", "test-key")
+    monkeypatch.setattr(settings, "openrouter_base_url", "http://upstream")
+    monkeypatch.setattr(settings, "ai_hedge_enabled", False)
+    return FakeUpstream()
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_fails_fast_to_fallback(upstream, monkeypatch):
+    monkeypatch.setattr(settings, "ai_breaker_failure_threshold", 2)
+    upstream.behaviour["primary"] = [(0, 503)]
+    agent = upstream.agent(["primary"])
+
+    for _ in range(2):
+        await agent.get_ai_response("hello", "s1")
+    assert agent.breakers["primary"].state == OPEN
+
+    response = await agent.get_ai_response("I want to donate", "s1")
+    assert upstream.calls["primary"] == 2  # no call while the circuit is open
+    assert response == agent.get_fallback_response("I want to donate")
+
+@pytest.mark.asyncio
+async def test_fallback_chain_uses_next_model(upstream):
+    upstream.behaviour["primary"] = [(0, 500)]
+    agent = upstream.agent(["primary", "secondary"])
+    assert await agent.get_ai_response("hello", "s1") == "reply from secondary"
+
+@pytest.mark.asyncio
+async def test_hedged_request_beats_slow_primary(upstream, monkeypatch):
+    monkeypatch.setattr(settings, "ai_hedge_enabled", True)
+    monkeypatch.setattr(settings, "ai_hedge_min_samples", 5)
+    upstream.behaviour["primary"] = [(2.0, 200), (0, 200)]
+    agent = upstream.agent(["primary"])
+    for _ in range(5):
+        agent.latencies["primary"].record(0.01)
+
+    started = asyncio.get_running_loop().time()
+    assert await agent.get_ai_response("hello", "s1") == "reply from primary"
+    assert asyncio.get_running_loop().time() - started < 1.0
+    assert upstream.calls["primary"] == 2
+
+def test_breaker_half_opens_after_recovery_timeout():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    now[0] = 11
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()  # only one probe at a time
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
@@ -0,0 +1,52 @@
+from benchmarks.regression import find_regressions
+import pytest
+from benchmarks.run import percentile, parse_args, prepare, BENCH_DATABASE
+from benchmarks.data import directory_documents
+
+def _results(p95, rps, hot=True, errors=0):
+    return {"endpoints": {"directory.list": {"hot": hot, "p95_ms": p95, "throughput_rps": rps, "errors": errors}}}
+
+def test_regression_within_tolerance_passes():
+    assert find_regressions(_results(10.0, 500.0), _results(11.0, 460.0), tolerance=0.15) == []
+
+def test_regression_on_slower_hot_endpoint_fails():
+    regressions = find_regressions(_results(10.0, 500.0), _results(12.0, 500.0), tolerance=0.15)
+    assert regressions and "p95" in regressions[0]
+
+def test_cold_endpoints_are_not_gated_by_default():
+    assert find_regressions(_results(10.0, 500.0, hot=False), _results(50.0, 100.0, hot=False)) == []
+
+def test_percentile_nearest_rank():
+    samples = sorted(float(i) for i in range(1, 101))
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+
+def test_synthetic_data_is_reproducible():
+    assert list(directory_documents(5)) == list(directory_documents(5))
+
+def test_remote_server_needs_a_shared_database():
+    assert parse_args(["--backend", "mongod", "--base-url", "http://localhost:8000"]).database == BENCH_DATABASE
+    with pytest.raises(SystemExit):
+        parse_args(["--base-url", "http://localhost:8000"])
+
+@pytest.mark.asyncio
+async def test_prepare_builds_the_derived_data_endpoints_read(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from app.suggest import suggestions
+    monkeypatch.setattr(suggestions, "vocabularies", suggestions.vocabularies)
+    from datetime import datetime
+    from app import donors, rollup, timeseries
+    db = mongomock_motor.AsyncMongoMockClient()["bench_prepare_test"]
+    await prepare(db, 200)
+    assert (await rollup.query(db, "family", ["caste"], {}))["totals"]["families"] == 50
+
+    people = await db.directory.count_documents({"blood_group": {"$ne": None}})
+    members = sum(1 for family in await db.family_directory.find({}).to_list(length=None)
+                  for member in family["family_members"] if member["blood_group"])
+    assert await db.donors.count_documents({}) == people + members
+    assert len(await donors.find_donors(db, "A-", city="Lahore", limit=50)) == 50
+
+    points = await timeseries.query(db, "directory", "month", datetime(2023, 1, 1), datetime(2025, 12, 31))
+    assert sum(point["count"] for point in points) == 200
+
+    assert suggestions.suggest("city", "la")
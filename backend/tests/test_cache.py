@@ -0,0 +1,75 @@
+import json
+from datetime import datetime
+import pytest
+import pytest_asyncio
+from fastapi.encoders import jsonable_encoder
+from httpx import AsyncClient
+from app.main import app
+from app.auth import get_current_admin_user
+from app.cache import DocumentCache, document_cache
+from app.database import database
+from app.models import ContactResponse
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    monkeypatch.setattr(database, "database", mongomock_motor.AsyncMongoMockClient()["cache_test"])
+    document_cache.clear()
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+def test_lru_eviction_and_ratios():
+    cache = DocumentCache(max_entries=2, ttl_seconds=60)
+    for key in ("a", "b"):
+        cache.put("directory", key, key.encode(), cache.generation())
+    assert cache.get("directory", "a").body == b"a"  # "b" is now least recently used
+    cache.put("directory", "c", b"c", cache.generation())
+    assert cache.get("directory", "b") is None
+    assert cache.stats()["collections"]["directory"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+def test_expired_and_raced_entries_are_not_served():
+    cache = DocumentCache(max_entries=10, ttl_seconds=0)
+    cache.put("directory", "a", b"a", cache.generation())
+    assert cache.get("directory", "a") is None
+
+    cache = DocumentCache(max_entries=10, ttl_seconds=60)
+    generation = cache.generation()
+    cache.invalidate("directory", "b")  # a write landed while "a" was being read
+    cache.put("directory", "a", b"a", generation)
+    assert cache.get("directory", "a") is None
+
+@pytest.mark.asyncio
+async def test_reads_are_cached_until_a_write(client):
+    message = {
+        "name": "Sana Akram",
+        "email": "sana@example.com",
+        "phone": "+923001234567",
+        "subject": "Membership",
+        "message": "How do I renew my membership?",
+        "is_read": False,
+        "created_at": datetime(2024, 5, 1, 12, 0),
+    }
+    result = await database.database.contact_messages.insert_one(message)
+    url = f"/api/contact/{result.inserted_id}"
+
+    first = await client.get(url)
+    assert first.status_code == 200
+    # Byte-for-byte what the response_model would have produced
+    assert first.json() == json.loads(json.dumps(jsonable_encoder(ContactResponse(**message))))
+
+    # Served from the cache: a change made behind the API's back is not seen...
+    await database.database.contact_messages.update_one({"_id": result.inserted_id}, {"$set": {"subject": "Changed"}})
+    assert (await client.get(url)).json()["subject"] == "Membership"
+
+    # ...but a write through the API invalidates the entry
+    assert (await client.patch(f"{url}/read")).status_code == 200
+    second = (await client.get(url)).json()
+    assert second["is_read"] is True and second["subject"] == "Changed"
+
+    assert (await client.delete(url)).status_code == 200
+    assert (await client.get(url)).status_code == 404
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from httpx import AsyncClient
+from app.main import app
+from app.config import settings
+from app.changes import fetch_changes, record_tombstone, encode_token, decode_token, InvalidToken, ExpiredToken
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["changes_test"]
+
+async def _insert(db, name, minutes_ago):
+    stamp = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=minutes_ago)
+    result = await db.directory.insert_one({"full_name": name, "created_at": stamp, "updated_at": stamp})
+    return result.inserted_id
+
+def test_token_round_trip_and_rejects_garbage():
+    stamp, object_id = datetime(2024, 5, 1, 12, 30, 15, 123000), ObjectId()
+    assert decode_token(encode_token(stamp, object_id)) == (stamp, object_id)
+    with pytest.raises(InvalidToken):
+        decode_token("not-a-token")
+
+@pytest.mark.asyncio
+async def test_full_sync_pages_then_only_new_changes(db):
+    for i in range(5):
+        await _insert(db, f"Member {i}", minutes_ago=10 - i)
+
+    first = await fetch_changes(db, "directory", None, limit=3)
+    assert [doc["full_name"] for doc in first["upserts"]] == ["Member 0", "Member 1", "Member 2"]
+    assert first["has_more"]
+
+    second = await fetch_changes(db, "directory", first["next_token"], limit=3)
+    assert [doc["full_name"] for doc in second["upserts"]] == ["Member 3", "Member 4"]
+    assert not second["has_more"]
+
+    assert (await fetch_changes(db, "directory", second["next_token"]))["upserts"] == []
+
+@pytest.mark.asyncio
+async def test_updates_and_tombstones_follow_token(db, monkeypatch):
+    monkeypatch.setattr(settings, "change_feed_lag_ms", 0)
+    kept = await _insert(db, "Kept", minutes_ago=10)
+    gone = await _insert(db, "Gone", minutes_ago=10)
+    token = (await fetch_changes(db, "directory"))["next_token"]
+    await asyncio.sleep(0.005)
+
+    await db.directory.update_one({"_id": kept}, {"$set": {"full_name": "Kept (edited)", "updated_at": datetime.utcnow()}})
+    await db.directory.delete_one({"_id": gone})
+    await record_tombstone(db, "directory", gone)
+
+    changes = await fetch_changes(db, "directory", token)
+    assert [doc["full_name"] for doc in changes["upserts"]] == ["Kept (edited)"]
+    assert changes["deletes"] == [str(gone)]
+    # Tombstones are per collection
+    assert (await fetch_changes(db, "family_directory", token))["deletes"] == []
+
+@pytest.mark.asyncio
+async def test_very_recent_writes_are_held_back(db):
+    stamp = datetime.utcnow()
+    await db.directory.insert_one({"full_name": "In flight", "updated_at": stamp})
+    assert (await fetch_changes(db, "directory"))["upserts"] == []
+
+@pytest.mark.asyncio
+async def test_token_older_than_retention_must_resync(db):
+    with pytest.raises(ExpiredToken):
+        await fetch_changes(db, "directory", encode_token(datetime.utcnow() - timedelta(days=365), ObjectId()))
+
+@pytest.mark.asyncio
+async def test_static_routes_are_not_captured_by_id_routes():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/directory/changes", params={"since": "garbage"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid change token"
+
+        response = await client.get("/api/directory/family/changes", params={"since": "garbage"})
+        assert response.json()["detail"] == "Invalid change token"
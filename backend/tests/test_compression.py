@@ -0,0 +1,107 @@
+import gzip
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from httpx import AsyncClient
+from app.compression import CompressionMiddleware, negotiate, compressible, brotli
+from app.metrics import metrics
+
+ROWS = [{"name": f"Member {i}", "city": "Lahore", "profession": "Engineer"} for i in range(200)]
+
+def _app(**options):
+    inner = FastAPI()
+
+    @inner.get("/list")
+    async def listing():
+        return {"data": ROWS}
+
+    @inner.get("/tiny")
+    async def tiny():
+        return {"ok": True}
+
+    @inner.get("/public")
+    async def public(response: Response):
+        response.headers["Cache-Control"] = "public, max-age=300"
+        return {"data": ROWS}
+
+    @inner.get("/export")
+    async def export():
+        async def rows():
+            for row in ROWS:
+                yield f"{row['name']},{row['city']}\n"
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    @inner.get("/events")
+    async def events():
+        async def stream():
+            yield "event: counters\ndata: {}\n\n" * 100
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @inner.get("/encoded")
+    async def encoded():
+        return Response(gzip.compress(b"x" * 5000), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    inner.add_middleware(CompressionMiddleware, **options)
+    return inner
+
+def test_negotiation():
+    assert negotiate("") is None
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("*") == ("br" if brotli else "gzip")
+    assert negotiate("br;q=0.5, gzip") == "gzip"
+    assert compressible("application/json") and compressible("text/csv; charset=utf-8")
+    assert not compressible("text/event-stream") and not compressible("application/pdf")
+
+@pytest.mark.asyncio
+async def test_compresses_large_responses_only():
+    async with AsyncClient(app=_app(), base_url="http://test", headers={"Accept-Encoding": "gzip"}) as client:
+        response = await client.get("/list")
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(response.content) / 4
+        assert response.json()["data"] == ROWS
+
+        response = await client.get("/tiny")
+        assert "content-encoding" not in response.headers
+
+        response = await client.get("/list", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+@pytest.mark.asyncio
+async def test_streams_compress_and_events_and_encoded_bodies_pass_through():
+    async with AsyncClient(app=_app(), base_url="http://test", headers={"Accept-Encoding": "gzip"}) as client:
+        response = await client.get("/export")
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text.splitlines()[0] == "Member 0,Lahore"
+
+        response = await client.get("/events")
+        assert "content-encoding" not in response.headers
+
+        response = await client.get("/encoded")
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.content == b"x" * 5000
+
+@pytest.mark.asyncio
+async def test_public_responses_are_compressed_once():
+    before = dict(metrics.counters)
+    async with AsyncClient(app=_app(cache_bytes=1 << 20), base_url="http://test", headers={"Accept-Encoding": "gzip"}) as client:
+        first = await client.get("/public")
+        second = await client.get("/public")
+        assert first.json() == second.json() == {"data": ROWS}
+        # Not shared: per-request compression, no cache lookup
+        assert (await client.get("/public", headers={"Authorization": "Bearer token"})).headers["content-encoding"] == "gzip"
+        await client.get("/list")
+
+    def delta(name):
+        return metrics.counters.get(name, 0) - before.get(name, 0)
+    assert (delta("compression.cache.miss"), delta("compression.cache.hit")) == (1, 1)
+
+@pytest.mark.asyncio
+async def test_brotli():
+    pytest.importorskip("brotli")
+    async with AsyncClient(app=_app(), base_url="http://test", headers={"Accept-Encoding": "gzip, br"}) as client:
+        response = await client.get("/list")
+        assert response.headers["content-encoding"] == "br"
+        assert response.json()["data"] == ROWS
@@ -0,0 +1,20 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app.derived import DerivedData, SCHEDULES
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest.mark.asyncio
+async def test_workers_starting_together_queue_one_rebuild():
+    db = mongomock_motor.AsyncMongoMockClient()["derived_test"]
+    workers = [DerivedData() for _ in range(4)]
+    for worker in workers:
+        worker._db = db
+    claims = await asyncio.gather(*(worker._claim("rollup_rebuild", 3600) for worker in workers))
+    assert sorted(claims) == [False, False, False, True]
+    assert await workers[0]._claim("rollup_rebuild", 3600) is False
+
+    # Due again once the interval has passed
+    await db[SCHEDULES].update_one({"_id": "rollup_rebuild"}, {"$set": {"next_run_at": datetime.utcnow() - timedelta(seconds=1)}})
+    assert [await worker._claim("rollup_rebuild", 3600) for worker in workers] == [True, False, False, False]
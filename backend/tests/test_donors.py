@@ -0,0 +1,80 @@
+import pytest
+from httpx import AsyncClient
+from app.main import app
+from app.auth import get_current_admin_user
+from app.database import database
+from app import donors
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["donors_test"]
+
+def _person(name, blood_group, city, district, province="Punjab"):
+    return {"full_name": name, "blood_group": blood_group, "city": city, "district": district, "province": province, "phone": "+923001234567"}
+
+def test_compatibility_table():
+    assert all(groups[0] == recipient for recipient, groups in donors.COMPATIBLE_DONORS.items())
+    assert all("O-" in groups for groups in donors.COMPATIBLE_DONORS.values())
+    assert sorted(donors.COMPATIBLE_DONORS["AB+"]) == sorted(donors.COMPATIBLE_DONORS)
+    assert "A+" not in donors.COMPATIBLE_DONORS["A-"]
+
+@pytest.mark.asyncio
+async def test_family_members_are_flattened_and_kept_in_sync(db):
+    family = {
+        "phone": "+923111111111", "city": "Okara", "district": "Okara", "province": "Punjab",
+        "family_members": [
+            {"member_id": "m1", "name": "Imran", "blood_group": "B+"},
+            {"member_id": "m2", "name": "Sara", "blood_group": None},
+            {"member_id": "m3", "name": "Bilal", "blood_group": "O-", "phone": "+923222222222"},
+        ],
+    }
+    family_id = (await db.family_directory.insert_one(family)).inserted_id
+    assert await donors.refresh(db, "family", family_id) == 2
+    imran = await db.donors.find_one({"_id": f"family:{family_id}:m1"})
+    assert imran["phone"] == "+923111111111" and imran["city_key"] == "okara"
+
+    await db.family_directory.update_one({"_id": family_id}, {"$pull": {"family_members": {"member_id": "m3"}}})
+    assert await donors.refresh(db, "family", family_id) == 1
+    await db.family_directory.delete_one({"_id": family_id})
+    await donors.refresh(db, "family", family_id)
+    assert await db.donors.count_documents({}) == 0
+
+@pytest.mark.asyncio
+async def test_nearest_and_exact_donors_come_first(db):
+    await db.directory.insert_many([
+        _person("Far O-", "O-", "Karachi", "Karachi", "Sindh"),
+        _person("Province A-", "A-", "Multan", "Multan"),
+        _person("District O-", "O-", "Raiwind", "Lahore"),
+        _person("City O-", "O-", "Lahore", "Lahore"),
+        _person("City A-", "A-", " lahore ", "Lahore"),
+        _person("Incompatible", "A+", "Lahore", "Lahore"),
+    ])
+    await donors.rebuild(db)
+
+    found = await donors.find_donors(db, "A-", city="Lahore", district="Lahore", province="Punjab")
+    assert [donor["name"] for donor in found] == ["City A-", "City O-", "District O-", "Province A-", "Far O-"]
+    assert [donor["location_match"] for donor in found] == ["city", "city", "district", "province", "elsewhere"]
+
+    assert len(await donors.find_donors(db, "A-", city="Lahore", limit=2)) == 2
+
+@pytest.mark.asyncio
+async def test_rebuild_drops_donors_of_deleted_entries(db):
+    gone = (await db.directory.insert_one(_person("Gone", "B+", "Lahore", "Lahore"))).inserted_id
+    await donors.rebuild(db)
+    await db.directory.delete_one({"_id": gone})
+    assert (await donors.rebuild(db))["donors"] == 0
+    assert await db.donors.count_documents({}) == 0
+
+@pytest.mark.asyncio
+async def test_donor_route_is_not_captured_by_entry_route(monkeypatch):
+    monkeypatch.setattr(database, "database", mongomock_motor.AsyncMongoMockClient()["donors_route_test"])
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get("/api/directory/donors", params={"blood_group": "O+", "city": "Lahore"})
+        assert response.status_code == 200
+        assert response.json()["data"]["compatible_groups"] == ["O+", "O-"]
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
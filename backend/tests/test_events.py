@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+import pytest
+import pytest_asyncio
+from app.events import LiveUpdates, EventBus, CHANGE_STREAM, LOCAL
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest_asyncio.fixture
+async def live():
+    live = LiveUpdates(coalesce_ms=10, resync_seconds=60)
+    live.start(mongomock_motor.AsyncMongoMockClient()["events_test"])
+    yield live
+    await live.stop()
+
+def _drain(queue):
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+@pytest.mark.asyncio
+async def test_new_contact_message_is_pushed_and_counters_coalesced(live):
+    queue = live.bus.subscribe()
+    assert (await live.current_counters())["contact_total"] == 0
+
+    for i in range(3):
+        message = {"name": f"Visitor {i}", "subject": "Hello", "is_read": False, "created_at": datetime.utcnow()}
+        await live._db.contact_messages.insert_one(message)
+        live.notify("contact_messages", "insert", message)
+
+    await asyncio.sleep(0.1)
+    events = _drain(queue)
+    assert [event["message"]["name"] for event in events if event["type"] == "contact_message"] == ["Visitor 0", "Visitor 1", "Visitor 2"]
+
+    counter_events = [event for event in events if event["type"] == "counters"]
+    assert len(counter_events) == 1
+    assert counter_events[0]["counters"] == {"contact_total": 3, "contact_unread": 3}
+    assert counter_events[0]["deltas"] == {"contact_total": 3, "contact_unread": 3}
+
+@pytest.mark.asyncio
+async def test_unchanged_counters_are_not_broadcast(live):
+    queue = live.bus.subscribe()
+    await live.current_counters()
+    live.notify("directory", "update")
+    await asyncio.sleep(0.1)
+    assert _drain(queue) == []
+
+@pytest.mark.asyncio
+async def test_change_stream_mode_ignores_handler_notifications(live):
+    queue = live.bus.subscribe()
+    live.mode = CHANGE_STREAM
+    live.notify("contact_messages", "insert", {"name": "Duplicate"})
+    await asyncio.sleep(0.05)
+    assert _drain(queue) == []
+    live.mode = LOCAL
+
+def test_standalone_server_falls_back_to_local_events():
+    assert LiveUpdates().mode == LOCAL
+
+def test_slow_subscriber_drops_oldest_event():
+    bus = EventBus(queue_size=2)
+    queue = bus.subscribe()
+    for i in range(3):
+        bus.publish({"type": "counters", "n": i})
+    assert [event["n"] for event in _drain(queue)] == [1, 2]
+
+@pytest.mark.asyncio
+async def test_community_strength_matches_the_directory_endpoint(live):
+    await live._db.directory.insert_many([{"family_members_count": 4}, {"family_members_count": 3}])
+    await live._db.family_directory.insert_one({"total_members": 10})
+    assert (await live.current_counters())["community_strength"] == 7
+
+@pytest.mark.asyncio
+async def test_live_stream_takes_a_single_use_ticket_not_a_token(monkeypatch):
+    from types import SimpleNamespace
+    from httpx import AsyncClient
+    from app.main import app
+    from app.auth import get_current_admin_user
+    from app.database import database
+    from app.events import redeem_ticket, LIVE_TICKETS
+    db = mongomock_motor.AsyncMongoMockClient()["live_ticket_test"]
+    monkeypatch.setattr(database, "database", db)
+    app.dependency_overrides[get_current_admin_user] = lambda: SimpleNamespace(id="admin-1")
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/api/admin/live/ticket")
+            assert response.status_code == 201
+            ticket = response.json()["data"]["ticket"]
+            assert (await client.get("/api/admin/live", params={"ticket": "forged"})).status_code == 401
+            assert (await client.get("/api/admin/live", params={"token": "a.jwt.token"})).status_code == 422
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+    assert await redeem_ticket(db, ticket) == "admin-1"
+    assert await redeem_ticket(db, ticket) is None
+
+    await db[LIVE_TICKETS].insert_one({"_id": "old", "user_id": "admin-1", "expires_at": datetime(2000, 1, 1)})
+    assert await redeem_ticket(db, "old") is None
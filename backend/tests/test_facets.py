@@ -0,0 +1,51 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from app.main import app
+from app.database import database
+from app.facets import facet_cache
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+def _entry(name, city, profession):
+    return {"full_name": name, "city": city, "profession": profession, "caste": "Arain", "province": "Punjab",
+            "gender": "male", "membership_type": "member"}
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    monkeypatch.setattr(database, "database", mongomock_motor.AsyncMongoMockClient()["facets_test"])
+    facet_cache.clear()
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+@pytest.mark.asyncio
+async def test_listing_returns_facet_counts_with_the_page(client):
+    await database.database.directory.insert_many([
+        _entry("Ali", "Lahore", "Doctor"), _entry("Bilal", "Lahore", "Teacher"), _entry("Hamza", "Multan", "Doctor"),
+    ])
+
+    response = await client.get("/api/directory/", params={"facets": "true", "profession": "Doctor", "limit": 1})
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == 2 and body["total_pages"] == 2 and len(body["data"]) == 1
+    assert body["facets"]["city"] == [{"value": "Lahore", "count": 1}, {"value": "Multan", "count": 1}]
+    assert body["facets"]["profession"] == [{"value": "Doctor", "count": 2}]
+
+    # Plain listings are unchanged
+    response = await client.get("/api/directory/", params={"profession": "Doctor"})
+    assert response.json()["facets"] is None
+
+@pytest.mark.asyncio
+async def test_cached_facets_are_dropped_after_a_write(client):
+    await database.database.directory.insert_many([_entry("Ali", "Lahore", "Doctor"), _entry("Bilal", "Multan", "Doctor")])
+    first = (await client.get("/api/directory/", params={"facets": "true"})).json()
+
+    # Same query shape, next page: served from the cache
+    await database.database.directory.insert_one(_entry("Hamza", "Okara", "Doctor"))
+    second = (await client.get("/api/directory/", params={"facets": "true", "page": 2})).json()
+    assert second["facets"] == first["facets"] and second["total"] == 2
+
+    facet_cache.bump("directory")
+    third = (await client.get("/api/directory/", params={"facets": "true"})).json()
+    assert third["total"] == 3
+    assert {"value": "Okara", "count": 1} in third["facets"]["city"]
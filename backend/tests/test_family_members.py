@@ -0,0 +1,93 @@
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+from httpx import AsyncClient
+from app.main import app
+from app.auth import get_current_admin_user
+from app.database import database
+from app import migrations
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+MEMBER = {"name": "Ayesha", "age": 9, "gender": "female", "relation": "daughter"}
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    monkeypatch.setattr(database, "database", mongomock_motor.AsyncMongoMockClient()["family_members_test"])
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+async def _family(members):
+    result = await database.database.family_directory.insert_one({
+        "head_name": "Imran",
+        "family_members": members,
+        "total_members": len(members),
+    })
+    return str(result.inserted_id)
+
+@pytest.mark.asyncio
+async def test_add_update_and_remove_member(client):
+    family_id = await _family([{"member_id": "m1", "name": "Imran", "relation": "Head"}])
+
+    response = await client.post(f"/api/directory/family/{family_id}/members", json=MEMBER)
+    assert response.status_code == 201
+    member_id = response.json()["data"]["member_id"]
+    assert response.json()["data"]["total_members"] == 2
+
+    response = await client.patch(f"/api/directory/family/{family_id}/members/m1", json={"age": 41})
+    assert response.status_code == 200
+    family = await database.database.family_directory.find_one({"_id": ObjectId(family_id)})
+    assert [(member["name"], member.get("age")) for member in family["family_members"]] == [("Imran", 41), ("Ayesha", 9)]
+
+    response = await client.delete(f"/api/directory/family/{family_id}/members/{member_id}")
+    assert response.status_code == 200
+    family = await database.database.family_directory.find_one({"_id": ObjectId(family_id)})
+    assert [member["member_id"] for member in family["family_members"]] == ["m1"]
+    assert family["total_members"] == 1
+
+@pytest.mark.asyncio
+async def test_last_member_and_unknown_member(client):
+    family_id = await _family([{"member_id": "m1", "name": "Imran", "relation": "Head"}])
+
+    response = await client.delete(f"/api/directory/family/{family_id}/members/m1")
+    assert response.status_code == 409
+    response = await client.delete(f"/api/directory/family/{family_id}/members/nobody")
+    assert response.status_code == 404
+    response = await client.patch(f"/api/directory/family/{family_id}/members/nobody", json={"age": 3})
+    assert response.status_code == 404
+    response = await client.patch(f"/api/directory/family/{family_id}/members/m1", json={})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_migration_assigns_member_ids(client):
+    family_id = await _family([{"name": "Imran", "relation": "Head"}, {"member_id": "m2", "name": "Sara", "relation": "Wife"}])
+    await migrations.run(database.database, migrations.get("family_member_ids"), duty_cycle=1)
+    family = await database.database.family_directory.find_one({"_id": ObjectId(family_id)})
+    ids = [member["member_id"] for member in family["family_members"]]
+    assert ids[0] and ids[1] == "m2"
+
+@pytest.mark.asyncio
+async def test_client_member_ids_cannot_collide(client):
+    family = {
+        "head_of_family_name": "Imran Ali", "address": "12 Mall Road, Lahore", "city": "Lahore", "district": "Lahore",
+        "province": "Punjab", "phone": "+923001234567", "caste": "Arain",
+        "family_members": [{**MEMBER, "member_id": "dup"}, {**MEMBER, "name": "Zainab", "member_id": "dup"}],
+    }
+    response = await client.post("/api/directory/family", json=family)
+    assert response.status_code == 201
+    family_id = response.json()["data"]["id"]
+    stored = await database.database.family_directory.find_one({"_id": ObjectId(family_id)})
+    ids = [member["member_id"] for member in stored["family_members"]]
+    assert "dup" not in ids and len(set(ids)) == 2
+
+    response = await client.put(f"/api/directory/family/{family_id}", json={"family_members": family["family_members"]})
+    assert response.status_code == 400
+
+    response = await client.delete(f"/api/directory/family/{family_id}/members/{ids[0]}")
+    assert response.status_code == 200
+    stored = await database.database.family_directory.find_one({"_id": ObjectId(family_id)})
+    assert stored["total_members"] == len(stored["family_members"]) == 1
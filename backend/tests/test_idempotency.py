@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, HTTPException
+from httpx import AsyncClient
+from app.main import app
+from app.database import database
+from app.idempotency import IdempotencyMiddleware
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+MESSAGE = {"name": "Ali Raza", "email": "ali@example.com", "phone": "+923001234567", "subject": "Membership", "message": "How do I join the youth wing?"}
+
+@pytest_asyncio.fixture
+async def db(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["idempotency_test"]
+    monkeypatch.setattr(database, "database", db)
+    return db
+
+def _counting_app(**options):
+    inner = FastAPI()
+    calls = []
+
+    @inner.post("/create", status_code=201)
+    async def create(payload: dict):
+        calls.append(payload)
+        await asyncio.sleep(0.05)
+        if payload.get("fail"):
+            raise HTTPException(status_code=400, detail="Rejected")
+        return {"id": len(calls)}
+
+    return IdempotencyMiddleware(inner, routes={"/create"}, **options), calls
+
+@pytest.mark.asyncio
+async def test_retry_replays_the_stored_response(db):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        headers = {"Idempotency-Key": "retry-1"}
+        first = await client.post("/api/contact/", json=MESSAGE, headers=headers)
+        second = await client.post("/api/contact/", json=MESSAGE, headers=headers)
+        assert first.status_code == second.status_code == 201
+        assert first.json() == second.json()
+        assert second.headers["idempotent-replayed"] == "true"
+        assert await db.contact_messages.count_documents({}) == 1
+
+        response = await client.post("/api/contact/", json={**MESSAGE, "subject": "Something else"}, headers=headers)
+        assert response.status_code == 422
+        await client.post("/api/contact/", json=MESSAGE)
+        assert await db.contact_messages.count_documents({}) == 2
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_run_once(db):
+    middleware, calls = _counting_app()
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        responses = await asyncio.gather(*[client.post("/create", json={"n": 1}, headers={"Idempotency-Key": "k"}) for _ in range(5)])
+    assert len(calls) == 1
+    assert {response.json()["id"] for response in responses} == {1}
+    assert sum(response.headers.get("idempotent-replayed") == "true" for response in responses) == 4
+
+@pytest.mark.asyncio
+async def test_duplicates_waiting_on_an_error_run_on_their_own(db):
+    middleware, calls = _counting_app()
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        responses = await asyncio.gather(*[client.post("/create", json={"fail": True}, headers={"Idempotency-Key": "e"}) for _ in range(3)])
+    assert len(calls) == 3
+    assert [response.status_code for response in responses] == [400] * 3
+    assert not any("idempotent-replayed" in response.headers for response in responses)
+
+@pytest.mark.asyncio
+async def test_stored_responses_survive_a_cold_worker_and_failures_are_not_stored(db):
+    middleware, calls = _counting_app(cache_size=0)
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        await client.post("/create", json={"n": 1}, headers={"Idempotency-Key": "a"})
+        replay = await client.post("/create", json={"n": 1}, headers={"Idempotency-Key": "a"})
+        assert replay.json() == {"id": 1} and replay.headers["idempotent-replayed"] == "true"
+
+        for _ in range(2):
+            response = await client.post("/create", json={"fail": True}, headers={"Idempotency-Key": "b"})
+            assert response.status_code == 400
+        assert len(calls) == 3
+        assert (await client.post("/create", json={}, headers={"Idempotency-Key": "x" * 300})).status_code == 400
+    assert await db.idempotency_keys.count_documents({}) == 1
+
+@pytest.mark.asyncio
+async def test_duplicate_waits_for_another_workers_in_flight_request(db):
+    first, first_calls = _counting_app()
+    second, second_calls = _counting_app(wait_seconds=0.2)
+    async with AsyncClient(app=first, base_url="http://test") as one, AsyncClient(app=second, base_url="http://test") as two:
+        original = asyncio.create_task(one.post("/create", json={"n": 1}, headers={"Idempotency-Key": "w"}))
+        await asyncio.sleep(0.01)
+        duplicate = await two.post("/create", json={"n": 1}, headers={"Idempotency-Key": "w"})
+        assert (await original).json() == duplicate.json() == {"id": 1}
+    assert (len(first_calls), len(second_calls)) == (1, 0)
@@ -0,0 +1,57 @@
+import time
+from app.intents import IntentEngine, AhoCorasick, RESPONSES, ACTIONS, ENGLISH, URDU, ROMAN_URDU, intent_engine
+
+def test_english_intents_follow_priority():
+    assert intent_engine.classify("I want to volunteer and donate").intent == "register"
+    assert intent_engine.classify("Any scholarship for students?").intent == "education"
+    assert intent_engine.classify("hello there").intent == "default"
+    assert intent_engine.response_for("how can I donate?") == RESPONSES["donate"][ENGLISH]
+
+def test_keywords_match_at_word_start_only():
+    assert intent_engine.classify("I am volunteering").intent == "register"
+    # "help" inside another word is not a contact request
+    assert intent_engine.classify("whelp").intent == "default"
+
+def test_urdu_script_is_detected_and_answered_in_urdu():
+    classification = intent_engine.classify("مجھے تعلیمی وظیفہ چاہیے")
+    assert classification.language == URDU
+    assert classification.intent == "education"
+    # Arabic yeh/kaf variants are normalised to the Urdu letters
+    assert intent_engine.classify("عطيہ").intent == "donate"
+
+def test_roman_urdu_is_detected():
+    classification = intent_engine.classify("mujhe sehat ke bare mein madad chahiye")
+    assert classification.language == ROMAN_URDU
+    assert classification.intents == ["contact", "health"]
+    assert intent_engine.classify("kya hal hai").language == ROMAN_URDU
+    assert intent_engine.classify("what is your address").language == ENGLISH
+
+def test_actions_use_reply_intents_and_user_language():
+    reply = "You can register now, or read about our medical camps."
+    assert intent_engine.actions_for("join karna hai", reply) == ACTIONS["register"][ROMAN_URDU] + ACTIONS["health"][ROMAN_URDU]
+    assert intent_engine.actions_for("سلام", "") == ACTIONS["default"][URDU]
+
+def test_overlapping_keywords_are_all_reported():
+    automaton = AhoCorasick({"he": ("a", ENGLISH), "hers": ("b", ENGLISH), "she": ("c", ENGLISH)})
+    assert sorted(intent for intent, _ in automaton.matches("he hers")) == ["a", "a", "b"]
+
+def _engine_with(extra_terms: int) -> IntentEngine:
+    keywords = {ENGLISH: {"register": ["register"], "donate": [f"term{i}x" for i in range(extra_terms)]}}
+    return IntentEngine(keywords=keywords, markers=[])
+
+def _time_classification(engine: IntentEngine, message: str, repeat: int = 300) -> float:
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            engine.classify(message)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def test_classification_time_does_not_grow_with_keyword_count():
+    message = "Hi, I would like to register my family and ask about term42x programs in Lahore"
+    small, large = _engine_with(100), _engine_with(5000)
+    assert small.classify(message).intents == large.classify(message).intents == ["register", "donate"]
+
+    # Per-message work is one pass over the text, so 50x more keywords costs about the same
+    assert _time_classification(large, message) < _time_classification(small, message) * 3
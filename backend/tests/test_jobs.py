@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app.jobs import JobRunner, Artifact, COMPLETED, FAILED, QUEUED, RUNNING
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+class MemoryArtifacts:
+    def __init__(self):
+        self.saved = {}
+
+    async def save(self, db, job_id, artifact):
+        self.saved[job_id] = artifact
+        return job_id
+
+async def _report(context):
+    await context.progress(0.5)
+    return Artifact("report.txt", "text/plain", b"done")
+
+async def _broken(context):
+    raise RuntimeError("boom")
+
+async def _sum_in_process(context):
+    total = await context.run_cpu(sum, context.params["values"])
+    return Artifact("sum.txt", "text/plain", str(total).encode())
+
+async def _slow(context):
+    await asyncio.Event().wait()
+
+def _runner(**kwargs):
+    handlers = {"report": _report, "broken": _broken, "sum": _sum_in_process, "slow": _slow}
+    return JobRunner(handlers=handlers, artifacts=MemoryArtifacts(), lease_seconds=30, max_attempts=2, **kwargs)
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["jobs_test"]
+
+@pytest.mark.asyncio
+async def test_job_runs_to_completion(db):
+    runner = _runner()
+    job_id = await runner.submit(db, "report", submitted_by="admin@example.com")
+    job = await runner.claim(db)
+    assert job["_id"] == job_id and job["status"] == RUNNING and job["attempts"] == 1
+
+    await runner.run(db, job)
+    job = await db.jobs.find_one({"_id": job_id})
+    assert job["status"] == COMPLETED
+    assert job["progress"] == 1.0
+    assert job["artifact_filename"] == "report.txt"
+    assert runner.artifacts.saved[job_id].data == b"done"
+    assert await runner.claim(db) is None
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_given_up(db):
+    runner = _runner()
+    job_id = await runner.submit(db, "broken")
+
+    await runner.run(db, await runner.claim(db))
+    job = await db.jobs.find_one({"_id": job_id})
+    assert job["status"] == QUEUED and job["error"] == "boom"
+
+    await runner.run(db, await runner.claim(db))
+    job = await db.jobs.find_one({"_id": job_id})
+    assert job["status"] == FAILED and job["attempts"] == 2
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over(db):
+    crashed, survivor = _runner(), _runner()
+    job_id = await crashed.submit(db, "report")
+    stale = await crashed.claim(db)
+
+    # Not claimable while the lease is live
+    assert await survivor.claim(db) is None
+    await db.jobs.update_one({"_id": job_id}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+    job = await survivor.claim(db)
+    assert job["worker_id"] == survivor.worker_id and job["attempts"] == 2
+
+    # The crashed worker's late writes are fenced off by the lease
+    await crashed.run(db, stale)
+    assert (await db.jobs.find_one({"_id": job_id}))["status"] == RUNNING
+
+    await survivor.run(db, job)
+    assert (await db.jobs.find_one({"_id": job_id}))["status"] == COMPLETED
+
+@pytest.mark.asyncio
+async def test_cpu_step_runs_in_process_pool(db):
+    runner = _runner(process_workers=1)
+    try:
+        job_id = await runner.submit(db, "sum", {"values": [1, 2, 3]})
+        await runner.run(db, await runner.claim(db))
+        assert runner.artifacts.saved[job_id].data == b"6"
+    finally:
+        await runner.stop()
+
+@pytest.mark.asyncio
+async def test_workers_pick_up_submitted_jobs(db):
+    runner = _runner(concurrency=2, poll_interval=5)
+    runner.start(db)
+    try:
+        job_id = await runner.submit(db, "report")
+        for _ in range(100):
+            if (await db.jobs.find_one({"_id": job_id}))["status"] == COMPLETED:
+                break
+            await asyncio.sleep(0.01)
+        assert (await db.jobs.find_one({"_id": job_id}))["status"] == COMPLETED
+    finally:
+        await runner.stop()
+
+@pytest.mark.asyncio
+async def test_shutdown_requeues_running_job_without_counting_the_attempt(db):
+    runner = _runner(poll_interval=5)
+    runner.start(db)
+    job_id = await runner.submit(db, "slow")
+    for _ in range(100):
+        if (await db.jobs.find_one({"_id": job_id}))["status"] == RUNNING:
+            break
+        await asyncio.sleep(0.01)
+    assert (await db.jobs.find_one({"_id": job_id}))["attempts"] == 1
+    await runner.stop()
+
+    job = await db.jobs.find_one({"_id": job_id})
+    assert (job["status"], job["attempts"], job["worker_id"], job["lease_expires_at"]) == (QUEUED, 0, None, None)
+    # Claimable straight away, with no lease to wait out
+    assert (await _runner().claim(db))["_id"] == job_id
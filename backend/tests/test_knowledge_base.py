@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from app.knowledge_base import KnowledgeBase, DEFAULT_FAQS
+
+def _knowledge_base():
+    kb = KnowledgeBase(capacity=2)  # small capacity exercises matrix growth
+    for faq in DEFAULT_FAQS:
+        kb.upsert(dict(faq, _id=ObjectId()))
+    return kb
+
+def test_search_ranks_matching_entry_first():
+    kb = _knowledge_base()
+    matches = kb.search("Do you offer scholarships?", k=3)
+    assert matches[0].question == "Do you offer scholarships for students?"
+    assert matches[0].score > matches[1].score
+
+def test_unrelated_question_scores_low():
+    kb = _knowledge_base()
+    assert kb.search("what is the weather today", k=1)[0].score < 0.2
+
+def test_incremental_add_and_remove():
+    kb = _knowledge_base()
+    entry = {"_id": ObjectId(), "question": "Where is the Lahore office?", "answer": "Model Town, Lahore.", "tags": ["office"]}
+    kb.upsert(entry)
+    assert kb.search("lahore office address", k=1)[0].id == str(entry["_id"])
+
+    kb.remove(str(entry["_id"]))
+    assert len(kb) == len(DEFAULT_FAQS)
+    assert all(match.id != str(entry["_id"]) for match in kb.search("lahore office address", k=3))
+
+@pytest.mark.asyncio
+async def test_workers_starting_together_seed_once():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["kb_test"]
+    await asyncio.gather(*[KnowledgeBase().load(db) for _ in range(3)])
+    assert await db.faq_entries.count_documents({}) == len(DEFAULT_FAQS)
+
+    # A default the admin deleted isn't seeded again
+    await db.faq_entries.update_one({"question": DEFAULT_FAQS[0]["question"]}, {"$set": {"deleted": True}})
+    kb = KnowledgeBase()
+    await kb.load(db)
+    assert await db.faq_entries.count_documents({}) == len(DEFAULT_FAQS)
+    assert len(kb) == len(DEFAULT_FAQS) - 1
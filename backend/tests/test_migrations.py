@@ -0,0 +1,96 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from app.main import app
+from app.auth import get_current_admin_user
+from app.database import database
+from app import migrations
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest_asyncio.fixture
+async def db(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["migrations_test"]
+    monkeypatch.setattr(database, "database", db)
+    return db
+
+@pytest_asyncio.fixture
+async def client(db):
+    app.dependency_overrides[get_current_admin_user] = lambda: type("Admin", (), {"email": "admin@example.com"})()
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+def test_throttle_keeps_the_duty_cycle():
+    assert migrations.throttle_pause(0.2, 0.5) == pytest.approx(0.2)
+    assert migrations.throttle_pause(0.2, 0.25) == pytest.approx(0.6)
+    assert migrations.throttle_pause(0.2, 1) == 0
+
+@pytest.mark.asyncio
+async def test_run_is_batched_checkpointed_and_idempotent(db):
+    await db.family_directory.insert_many([{"head_name": f"Family {i}", "family_members": [{"name": "A"}] * (i % 3 + 1)} for i in range(7)])
+    await db.family_directory.insert_one({"head_name": "Current", "family_members": [], "total_members": 0})
+    migration = migrations.get("family_total_members")
+    reported = []
+
+    async def progress(fraction):
+        reported.append(fraction)
+
+    summary = await migrations.run(db, migration, progress, batch_size=3, duty_cycle=1)
+    assert summary == {"total": 7, "scanned": 7, "modified": 7, "skipped": 0}
+    assert reported == pytest.approx([3 / 7, 6 / 7, 1.0])
+    families = await db.family_directory.find({}).to_list(length=None)
+    assert all(family["total_members"] == len(family["family_members"]) for family in families)
+
+    state = await db.migrations.find_one({"_id": "family_total_members"})
+    assert (state["status"], state["checkpoint"]) == ("completed", None)
+    assert (await migrations.run(db, migration, duty_cycle=1))["modified"] == 0
+
+@pytest.mark.asyncio
+async def test_interrupted_run_resumes_after_its_checkpoint(db):
+    ids = (await db.directory.insert_many([{"full_name": str(i)} for i in range(4)])).inserted_ids
+    await db.migrations.insert_one({"_id": "directory_versions", "status": "running", "checkpoint": ids[1], "total": 4, "scanned": 2, "modified": 2, "skipped": 0})
+
+    summary = await migrations.run(db, migrations.get("directory_versions"), duty_cycle=1)
+    assert summary == {"total": 4, "scanned": 4, "modified": 4, "skipped": 0}
+    versioned = [entry["_id"] for entry in await db.directory.find({"version": 1}).to_list(length=None)]
+    assert versioned == ids[2:]
+
+@pytest.mark.asyncio
+async def test_dry_run_writes_nothing(db):
+    await db.family_directory.insert_one({"head_name": "Imran", "family_members": [{"name": "Imran"}], "updated_at": None})
+    report = await migrations.dry_run(db, migrations.get("family_member_ids"))
+    assert report["pending"] == 1
+    sample = report["samples"][0]
+    assert "member_id" not in sample["before"]["family_members"][0]
+    assert sample["update"]["$set"]["family_members"][0]["member_id"]
+    assert "member_id" not in (await db.family_directory.find_one({}))["family_members"][0]
+    assert await db.migrations.count_documents({}) == 0
+
+@pytest.mark.asyncio
+async def test_admin_endpoints(client, db):
+    await db.directory.insert_one({"full_name": "Ali"})
+    response = await client.get("/api/admin/migrations")
+    assert response.status_code == 200
+    listed = {migration["id"]: migration["status"] for migration in response.json()["data"]["migrations"]}
+    assert listed["directory_versions"] == "pending"
+
+    response = await client.get("/api/admin/migrations/directory_versions/dry-run")
+    assert response.json()["data"]["pending"] == 1
+    assert (await client.get("/api/admin/migrations/nope/dry-run")).status_code == 404
+
+    response = await client.post("/api/admin/migrations/directory_versions/run")
+    assert response.status_code == 202
+    job = await db.jobs.find_one({})
+    assert (job["type"], job["params"]) == ("migration", {"migration": "directory_versions"})
+
+@pytest.mark.asyncio
+async def test_duplicate_faqs_keep_the_oldest(db):
+    ids = (await db.faq_entries.insert_many(
+        [{"question": "Q1", "deleted": False}, {"question": "Q2", "deleted": False}, {"question": "Q1", "deleted": False}]
+    )).inserted_ids
+    summary = await migrations.run(db, migrations.get("faq_duplicates"), duty_cycle=1)
+    assert (summary["modified"], summary["skipped"]) == (1, 2)
+    assert [entry["_id"] for entry in await db.faq_entries.find({"deleted": False}).to_list(length=None)] == ids[:2]
@@ -0,0 +1,27 @@
+import pytest
+from app.profiler import normalize_shape, suggest_index, summarize_explain, index_inputs
+
+def test_normalize_shape_strips_literals():
+    shape = normalize_shape({"city": {"$regex": "lah", "$options": "i"}, "total_members": {"$gte": 3}})
+    assert shape == {"city": {"$options": "?", "$regex": "?"}, "total_members": {"$gte": "?"}}
+
+def test_suggest_index_follows_esr_order():
+    index = suggest_index({"total_members": {"$gte": 2}, "caste": "Arain"}, [("created_at", -1)])
+    assert list(index.items()) == [("caste", 1), ("created_at", -1), ("total_members", 1)]
+
+def test_suggest_index_skips_id_lookups():
+    assert suggest_index({"_id": "abc"}) is None
+
+def test_aggregate_uses_leading_match():
+    filter_spec, sort = index_inputs("aggregate", {"pipeline": [{"$match": {"caste": "Arain"}}, {"$sort": {"total_members": -1}}]})
+    assert filter_spec == {"caste": "Arain"}
+    assert sort == [("total_members", -1)]
+
+def test_summarize_explain_detects_collscan():
+    explain = {
+        "queryPlanner": {"winningPlan": {"stage": "SKIP", "inputStage": {"stage": "COLLSCAN"}}},
+        "executionStats": {"totalDocsExamined": 1200, "totalKeysExamined": 0},
+    }
+    summary = summarize_explain(explain)
+    assert summary["collscan"] is True
+    assert summary["docs_examined"] == 1200
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import AsyncClient
+from app.auth import create_access_token
+from app.database import database
+from app.ratelimit import RateLimitMiddleware, MemoryBackend, MongoBackend, LoadShedder, Rule, LOW, NORMAL, HIGH
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest_asyncio.fixture
+async def db(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["ratelimit_test"]
+    monkeypatch.setattr(database, "database", db)
+    return db
+
+@pytest.mark.asyncio
+async def test_memory_bucket_bursts_then_refills():
+    clock = Clock()
+    backend = MemoryBackend(clock=clock)
+    assert [await backend.take("chat:1.2.3.4", 3, 60) for _ in range(3)] == [0, 0, 0]
+    assert await backend.take("chat:1.2.3.4", 3, 60) == pytest.approx(20)
+    assert await backend.take("chat:5.6.7.8", 3, 60) == 0
+    clock.now += 20
+    assert await backend.take("chat:1.2.3.4", 3, 60) == 0
+    assert await backend.take("chat:1.2.3.4", 3, 60) > 0
+
+@pytest.mark.asyncio
+async def test_mongo_buckets_are_shared_between_workers(db):
+    clock = Clock()
+    workers = [MongoBackend(clock=clock), MongoBackend(clock=clock)]
+    results = [await workers[i % 2].take("login:1.2.3.4", 4, 60) for i in range(5)]
+    assert results[:4] == [0, 0, 0, 0] and results[4] == pytest.approx(15)
+    clock.now += 15
+    assert await workers[1].take("login:1.2.3.4", 4, 60) == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_mongo_takes_never_overspend(db):
+    backend = MongoBackend(clock=Clock())
+    results = await asyncio.gather(*[backend.take("chat:1.2.3.4", 5, 60) for _ in range(20)])
+    assert sum(1 for retry_after in results if retry_after == 0) == 5
+
+def test_shedding_starts_with_low_priority():
+    shedder = LoadShedder(max_concurrent=10)
+    for _ in range(5):
+        assert shedder.admit(LOW)
+    assert not shedder.admit(LOW)
+    for _ in range(3):
+        assert shedder.admit(NORMAL)
+    assert not shedder.admit(NORMAL)
+    assert shedder.admit(HIGH) and shedder.admit(HIGH)
+    assert not shedder.admit(HIGH)
+    shedder.release()
+    assert shedder.admit(HIGH)
+
+def _app(**options):
+    inner = FastAPI()
+    gate = asyncio.Event()
+
+    @inner.post("/api/agent/chat")
+    async def chat():
+        return {"reply": "hi"}
+
+    @inner.get("/api/directory/slow")
+    async def slow():
+        await gate.wait()
+        return {}
+
+    return RateLimitMiddleware(inner, **options), gate
+
+@pytest.mark.asyncio
+async def test_limited_requests_get_429_and_admins_bypass():
+    middleware, _ = _app(rules=[Rule("chat", "POST", "/api/agent/chat", 2, 60)])
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        statuses = [(await client.post("/api/agent/chat")).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        response = await client.post("/api/agent/chat")
+        assert int(response.headers["retry-after"]) == 30
+        token = create_access_token({"sub": "admin", "role": "admin"})
+        assert (await client.post("/api/agent/chat", headers={"Authorization": f"Bearer {token}"})).status_code == 200
+        assert (await client.post("/api/agent/chat", headers={"Authorization": "Bearer forged"})).status_code == 429
+
+@pytest.mark.asyncio
+async def test_members_are_limited_per_user():
+    middleware, _ = _app(rules=[Rule("chat", "POST", "/api/agent/chat", 2, 60)])
+    first, second = (create_access_token({"sub": user, "role": "member"}) for user in ("u1", "u2"))
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        statuses = [(await client.post("/api/agent/chat", headers={"Authorization": f"Bearer {first}"})).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        # Same IP, different account: its own bucket
+        assert (await client.post("/api/agent/chat", headers={"Authorization": f"Bearer {second}"})).status_code == 200
+
+@pytest.mark.asyncio
+async def test_overloaded_worker_sheds_before_running_the_handler():
+    middleware, gate = _app(rules=[], max_concurrent=2)
+    async with AsyncClient(app=middleware, base_url="http://test") as client:
+        held = asyncio.create_task(client.get("/api/directory/slow"))
+        await asyncio.sleep(0.01)
+        response = await client.get("/api/directory/slow")
+        assert (response.status_code, response.headers["retry-after"]) == (503, "1")
+        assert (await client.post("/api/agent/chat")).status_code == 503
+        gate.set()
+        assert (await held).status_code == 200
+        assert middleware.shedder.in_flight == 0
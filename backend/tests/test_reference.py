@@ -0,0 +1,96 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from app.main import app
+from app.database import database
+from app.reference import reference_data
+from app import migrations
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+ENTRY = {
+    "full_name": "Ali Raza", "father_name": "Raza Ahmad", "cnic": "35202-1234567-1", "gender": "male",
+    "phone": "+923001234567", "email": "ali@example.com", "qualification": "Masters", "profession": "Engineer",
+    "city": "LHR", "district": "lahore", "province": "Punjab ", "caste": "Arain", "marital_status": "single",
+}
+
+@pytest_asyncio.fixture
+async def db(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["reference_test"]
+    monkeypatch.setattr(database, "database", db)
+    reference_data.clear()
+    await reference_data.load(db)
+    yield db
+    reference_data.clear()
+
+@pytest.mark.asyncio
+async def test_encode_resolves_spellings_and_aliases_to_one_code(db):
+    lahore = await reference_data.lookup(db, "city", "Lahore")
+    encoded = await reference_data.encode(db, {"province": "PUNJAB", "district": " Lahore", "city": "lhr", "caste": "Arain"})
+    assert encoded["city"] == lahore
+    assert encoded["province"] == await reference_data.lookup(db, "province", "Punjab")
+
+    # New names are interned under the parent given with them
+    okara = await reference_data.encode(db, {"province": "Punjab", "district": "Okara", "city": "Renala Khurd"})
+    punjab = next(province for province in reference_data.tree() if province["name"] == "Punjab")
+    districts = {district["name"]: [city["name"] for city in district["cities"]] for district in punjab["districts"]}
+    assert districts["Okara"] == ["Renala Khurd"]
+    assert reference_data.name(okara["city"]) == "Renala Khurd"
+
+    with pytest.raises(ValueError):
+        await reference_data.add_alias(db, "city", lahore, ["Renala Khurd"])
+
+@pytest.mark.asyncio
+async def test_entries_store_codes_and_read_back_names(db):
+    await reference_data.intern(db, "caste", "Arain")
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/directory/", json=ENTRY)
+        assert response.status_code == 201
+        entry_id = response.json()["data"]["id"]
+
+        stored = await db.directory.find_one()
+        assert all(isinstance(stored[field], int) for field in ("province", "district", "city", "caste"))
+
+        response = await client.get(f"/api/directory/{entry_id}")
+        assert (response.json()["city"], response.json()["province"]) == ("Lahore", "Punjab")
+
+        # Unmigrated entries still hold strings; filters match both forms
+        await db.directory.insert_one({**ENTRY, "city": "Lahore", "full_name": "Bilal Ahmad"})
+        response = await client.get("/api/directory/", params={"city": "lahore"})
+        assert {entry["city"] for entry in response.json()["data"]} == {"Lahore"}
+        assert response.json()["total"] == 2
+
+@pytest.mark.asyncio
+async def test_public_writes_keep_unknown_names_as_strings(db):
+    known = len(reference_data)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/directory/", json={**ENTRY, "city": " Lahor", "caste": "Arain"})
+        assert response.status_code == 201
+        stored = await db.directory.find_one()
+        assert (stored["city"], stored["caste"]) == ("Lahor", "Arain")
+        assert isinstance(stored["district"], int)
+        assert len(reference_data) == known
+        provinces = (await client.get("/api/reference/locations")).json()["data"]["provinces"]
+        assert "Punjab" in [province["name"] for province in provinces]
+        assert "Lahor" not in [city["name"] for city in (await client.get("/api/reference/city")).json()["data"]["entries"]]
+
+    assert await reference_data.unknown_names(db, "city") == [{"name": "Lahor", "count": 1}]
+    # Reviewed as a typo: the migration then files it under Lahore
+    lahore = await reference_data.lookup(db, "city", "Lahore")
+    await reference_data.add_alias(db, "city", lahore, ["Lahor"])
+    await migrations.run(db, migrations.get("reference_codes"), duty_cycle=1)
+    assert (await db.directory.find_one())["city"] == lahore
+
+@pytest.mark.asyncio
+async def test_migration_rewrites_strings_and_bumps_respelled_entries(db):
+    await db.directory.insert_many([
+        {"full_name": "Ali", "city": "Lahore", "caste": "Arain", "version": 1},
+        {"full_name": "Sana", "city": "lahore ", "caste": "Arain", "version": 1},
+    ])
+    summary = await migrations.run(db, migrations.get("reference_codes"), duty_cycle=1)
+    assert summary == {"total": 2, "scanned": 2, "modified": 2, "skipped": 0}
+
+    lahore = await reference_data.lookup(db, "city", "Lahore")
+    entries = await db.directory.find({}).sort("full_name", 1).to_list(length=None)
+    assert [(entry["city"], entry["version"]) for entry in entries] == [(lahore, 1), (lahore, 2)]
+    assert (await migrations.run(db, migrations.get("reference_codes"), duty_cycle=1))["scanned"] == 0
@@ -0,0 +1,103 @@
+import pytest
+from httpx import AsyncClient
+from app.main import app
+from app.auth import get_current_admin_user
+from app.database import database
+from app import rollup
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["rollup_test"]
+
+def _person(city, caste, gender, blood_group, household=3):
+    return {
+        "province": "Punjab", "district": city, "city": city, "caste": caste, "gender": gender,
+        "membership_type": "member", "blood_group": blood_group, "family_members_count": household,
+    }
+
+def _family(city, caste, *members):
+    return {
+        "province": "Punjab", "district": city, "city": city, "caste": caste, "membership_type": "member",
+        "family_members": [{"gender": gender, "blood_group": blood} for gender, blood in members],
+        "total_members": len(members),
+    }
+
+async def _cells(db):
+    cells = await db.rollup_cube.find({}, {"_id": 1, "entries": 1, "community_strength": 1, "families": 1, "members": 1}).to_list(length=None)
+    return {cell["_id"]: {k: v for k, v in cell.items() if k != "_id" and v} for cell in cells if any(v for k, v in cell.items() if k != "_id")}
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_matches_full_rebuild(db):
+    ali = (await db.directory.insert_one(_person("Lahore", "Arain", "male", "B+"))).inserted_id
+    sana = (await db.directory.insert_one(_person("Multan", "Arain", "female", "O+", household=5))).inserted_id
+    family = (await db.family_directory.insert_one(_family("Okara", "Rao", ("male", "A+"), ("female", "A+"), ("female", None)))).inserted_id
+    for source, document_id in (("directory", ali), ("directory", sana), ("family", family)):
+        await rollup.refresh(db, source, document_id)
+
+    # Edits and deletes only move the difference
+    await db.directory.update_one({"_id": ali}, {"$set": {"city": "Kasur", "district": "Kasur"}})
+    await rollup.refresh(db, "directory", ali)
+    await db.directory.delete_one({"_id": sana})
+    await rollup.refresh(db, "directory", sana)
+    await db.family_directory.update_one({"_id": family}, {"$pop": {"family_members": 1}, "$inc": {"total_members": -1}})
+    await rollup.refresh(db, "family", family)
+    incremental = await _cells(db)
+
+    await rollup.rebuild(db)
+    assert await _cells(db) == incremental
+
+@pytest.mark.asyncio
+async def test_query_chooses_household_or_member_cells(db):
+    await db.directory.insert_many([_person("Lahore", "Arain", "male", "B+"), _person("Lahore", "Arain", "female", "B+", household=4)])
+    await db.family_directory.insert_many([
+        _family("Okara", "Rao", ("male", "A+"), ("female", "O+")),
+        _family("Okara", "Arain", ("female", "O+")),
+    ])
+    await rollup.rebuild(db)
+
+    result = await rollup.query(db, "directory", ["city", "blood_group"], {"caste": "Arain"})
+    assert result["rows"] == [{"city": "Lahore", "blood_group": "B+", "entries": 2, "community_strength": 7}]
+
+    result = await rollup.query(db, "family", ["caste"], {})
+    assert result["rows"] == [
+        {"caste": "Rao", "families": 1, "members": 2},
+        {"caste": "Arain", "families": 1, "members": 1},
+    ]
+    assert result["totals"] == {"families": 2, "members": 3}
+
+    # Member dimensions switch to per-member cells, where families can't be counted
+    result = await rollup.query(db, "family", ["gender"], {"blood_group": "O+"})
+    assert result["measures"] == ["members"]
+    assert result["rows"] == [{"gender": "female", "members": 2}]
+
+@pytest.mark.asyncio
+async def test_rollup_endpoint_rejects_unknown_dimensions():
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get("/api/analytics/rollup", params={"dimensions": "city,religion"})
+        assert response.status_code == 400
+        assert "religion" in response.json()["detail"]
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+@pytest.mark.asyncio
+async def test_caste_statistics_count_live_until_the_cube_is_built(db, monkeypatch):
+    monkeypatch.setattr(database, "database", db)
+    monkeypatch.setattr(database, "read_database", None)
+    await db.family_directory.insert_many([_family("Okara", "Rao", ("male", "A+"), ("female", "O+")), _family("Okara", "Arain", ("female", "O+"))])
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            body = (await client.get("/api/directory/family/stats/caste")).json()
+            assert ([row["caste"] for row in body["data"]], body["total_population"], body["as_of"]) == (["Rao", "Arain"], 3, None)
+
+            await rollup.rebuild(db)
+            await db.family_directory.insert_one(_family("Okara", "Rao", ("male", "B+")))  # not refreshed into the cube
+            body = (await client.get("/api/directory/family/stats/caste")).json()
+            assert (body["total_families"], body["total_population"]) == (2, 3)
+            assert body["as_of"] is not None
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
@@ -0,0 +1,71 @@
+import gzip
+import json
+from datetime import datetime
+import pytest
+from app.snapshot import DirectorySnapshot, encode_columns, decode_columns
+from app.changes import decode_token
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+ROWS = [
+    {"_id": "a1", "full_name": "Ali Raza", "city": "Lahore", "caste": "Arain", "profession": "Teacher"},
+    {"_id": "b2", "full_name": "Sana Akram", "city": "Multan", "caste": "Arain", "profession": "Doctor"},
+    {"_id": "c3", "full_name": "Usman Ali", "city": "Lahore", "caste": "Arain", "profession": "Teacher"},
+]
+
+def test_low_cardinality_columns_are_dictionary_encoded():
+    columns = encode_columns(ROWS)
+    assert columns["city"] == {"values": ["Lahore", "Multan"], "codes": [0, 1, 0]}
+    assert columns["caste"]["values"] == ["Arain"]
+    assert columns["full_name"] == ["Ali Raza", "Sana Akram", "Usman Ali"]
+
+    decoded = decode_columns(columns)
+    for original, row in zip(ROWS, decoded):
+        assert {key: row[key] for key in original} == original
+
+@pytest.mark.asyncio
+async def test_build_writes_snapshot_without_cnic(tmp_path):
+    db = mongomock_motor.AsyncMongoMockClient()["snapshot_test"]
+    await db.directory.insert_many([
+        {"full_name": f"Member {i}", "cnic": f"35202-000000{i}-1", "city": "Lahore", "updated_at": datetime.utcnow()}
+        for i in range(5)
+    ])
+
+    snapshot = DirectorySnapshot(str(tmp_path))
+    meta = await snapshot.build(db)
+    assert snapshot.meta() == meta
+    assert meta["count"] == 5
+    decode_token(meta["sync_token"])
+
+    with open(snapshot.path, "rb") as handle:
+        document = json.loads(gzip.decompress(handle.read()))
+    assert document["count"] == 5
+    assert document["sync_token"] == meta["sync_token"]
+    assert "cnic" not in document["columns"]
+    assert document["columns"]["city"]["values"] == ["Lahore"]
+
+    # ensure() reuses the snapshot already on disk
+    assert (await snapshot.ensure(db))["etag"] == meta["etag"]
+
+@pytest.mark.asyncio
+async def test_snapshot_endpoint_negotiates_gzip(tmp_path, monkeypatch):
+    from httpx import AsyncClient
+    from app.main import app
+    from app.database import database
+    from app.snapshot import directory_snapshot
+    db = mongomock_motor.AsyncMongoMockClient()["snapshot_endpoint_test"]
+    await db.directory.insert_one({"full_name": "Ali Raza", "city": "Lahore", "updated_at": datetime.utcnow()})
+    monkeypatch.setattr(database, "database", db)
+    monkeypatch.setattr(directory_snapshot, "directory", str(tmp_path))
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        gzipped = await client.get("/api/directory/snapshot", headers={"Accept-Encoding": "gzip"})
+        plain = await client.get("/api/directory/snapshot", headers={"Accept-Encoding": "identity"})
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert "content-encoding" not in plain.headers
+        assert gzipped.headers["vary"] == plain.headers["vary"] == "Accept-Encoding"
+        assert plain.json() == gzipped.json()  # httpx decodes the gzip one
+        assert plain.headers["etag"] != gzipped.headers["etag"]
+
+        revalidated = await client.get("/api/directory/snapshot", headers={"Accept-Encoding": "identity", "If-None-Match": plain.headers["etag"]})
+        assert revalidated.status_code == 304
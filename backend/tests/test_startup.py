@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+# Cold-start budget for importing the application (container start, worker boot)
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "3.0"))
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+heavy = [name for name in ("pandas", "reportlab") if name in sys.modules]
+print(elapsed)
+print(",".join(heavy))
+"""
+
+def _import_app():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(output[0]), output[1] if len(output) > 1 else ""
+
+def test_app_import_within_startup_budget():
+    elapsed, _ = _import_app()
+    assert elapsed < STARTUP_BUDGET_SECONDS, f"importing app.main took {elapsed:.2f}s (budget {STARTUP_BUDGET_SECONDS}s)"
+
+def test_export_libraries_are_imported_lazily():
+    _, heavy = _import_app()
+    assert heavy == "", f"heavy export libraries imported at startup: {heavy}"
@@ -0,0 +1,72 @@
+import pytest
+from httpx import AsyncClient
+from app.main import app
+from app.suggest import Vocabulary, suggestions
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+def test_prefix_matches_any_word_ranked_by_count():
+    vocabulary = Vocabulary()
+    for city, count in (("Lahore", 5), ("lahore ", 1), ("Layyah", 2), ("Dera Ghazi Khan", 3), ("Khanewal", 4)):
+        vocabulary.add(city, count)
+
+    assert vocabulary.suggest("la") == [{"value": "Lahore", "count": 6}, {"value": "Layyah", "count": 2}]
+    assert [s["value"] for s in vocabulary.suggest("KHAN")] == ["Khanewal", "Dera Ghazi Khan"]
+    assert vocabulary.suggest("x") == []
+
+    # Counts drop with deletes; cached completions follow
+    vocabulary.add("Khanewal", -4)
+    assert [s["value"] for s in vocabulary.suggest("khan")] == ["Dera Ghazi Khan"]
+
+def test_normalize_uses_the_most_common_spelling():
+    vocabulary = Vocabulary()
+    vocabulary.add("Rahim Yar Khan", 3)
+    vocabulary.add("rahim yar khan", 1)
+    assert vocabulary.normalize("  RAHIM   yar khan") == "Rahim Yar Khan"
+    assert vocabulary.normalize("New  Town") == "New Town"
+
+@pytest.mark.asyncio
+async def test_suggest_endpoint_serves_the_loaded_vocabulary(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient()["suggest_test"]
+    await db.directory.insert_many([{"city": "Lahore", "profession": "Doctor"}, {"city": "Lahore", "profession": "Driver"}])
+    await db.family_directory.insert_one({"city": "Lahore", "family_members": [{"profession": "Doctor"}, {"profession": None}]})
+    monkeypatch.setattr(suggestions, "vocabularies", suggestions.vocabularies)
+    await suggestions.load(db)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/directory/suggest", params={"field": "profession", "q": "d"})
+    assert response.status_code == 200
+    assert response.json()["data"]["suggestions"] == [{"value": "Doctor", "count": 2}, {"value": "Driver", "count": 1}]
+    assert suggestions.normalize("directory", {"city": "lahore", "notes": "x"}) == {"city": "Lahore", "notes": "x"}
+
+@pytest.mark.asyncio
+async def test_edits_move_the_counts_from_old_values_to_new(monkeypatch):
+    from app.auth import get_current_admin_user
+    from app.database import database
+    db = mongomock_motor.AsyncMongoMockClient()["suggest_edit_test"]
+    monkeypatch.setattr(database, "database", db)
+    family = (await db.family_directory.insert_one({
+        "city": "Lahore", "version": 1, "total_members": 2,
+        "family_members": [{"member_id": "a", "profession": "Doctor"}, {"member_id": "b", "profession": "Driver"}],
+    })).inserted_id
+    monkeypatch.setattr(suggestions, "vocabularies", suggestions.vocabularies)
+    await suggestions.load(db)
+
+    def counts(field, prefix):
+        return {s["value"]: s["count"] for s in suggestions.suggest(field, prefix)}
+
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.put(f"/api/directory/family/{family}", json={"city": "Kasur"})
+            assert response.json()["data"]["version"] == 2
+            assert (counts("city", "la"), counts("city", "ka")) == ({}, {"Kasur": 1})
+
+            await client.patch(f"/api/directory/family/{family}/members/a", json={"profession": "Teacher"})
+            member = {"name": "Sana", "age": 30, "gender": "female", "relation": "spouse", "profession": "Teacher"}
+            await client.post(f"/api/directory/family/{family}/members", json=member)
+            response = await client.delete(f"/api/directory/family/{family}/members/b")
+            assert response.json()["data"] == {"total_members": 2, "version": 5}
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+    assert (counts("profession", "d"), counts("profession", "t")) == ({}, {"Teacher": 2})
@@ -0,0 +1,55 @@
+import pytest
+from datetime import datetime
+from httpx import AsyncClient
+from app.main import app
+from app.auth import get_current_admin_user
+from app import timeseries
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["timeseries_test"]
+
+def test_bucket_boundaries():
+    moment = datetime(2024, 5, 1, 18, 30)  # a Wednesday
+    assert timeseries.bucket_start(moment, "day") == datetime(2024, 5, 1)
+    assert timeseries.bucket_start(moment, "week") == datetime(2024, 4, 29)
+    assert timeseries.bucket_start(moment, "month") == datetime(2024, 5, 1)
+    assert timeseries.next_bucket(datetime(2024, 12, 1), "month") == datetime(2025, 1, 1)
+    assert timeseries.backfill_pipeline("created_at", "week")[1]["$group"]["_id"] == {
+        "$dateTrunc": {"date": "$created_at", "unit": "week", "startOfWeek": "monday"}
+    }
+
+@pytest.mark.asyncio
+async def test_record_and_query_fill_empty_buckets(db):
+    await timeseries.record(db, "directory", datetime(2024, 5, 1, 9))
+    await timeseries.record(db, "directory", datetime(2024, 5, 1, 17))
+    await timeseries.record(db, "directory", datetime(2024, 5, 3, 12))
+    await timeseries.record(db, "directory", datetime(2024, 5, 1, 17), -1)
+
+    points = await timeseries.query(db, "directory", "day", datetime(2024, 4, 30), datetime(2024, 5, 3))
+    assert points == [
+        {"start": "2024-04-30", "count": 0},
+        {"start": "2024-05-01", "count": 1},
+        {"start": "2024-05-02", "count": 0},
+        {"start": "2024-05-03", "count": 1},
+    ]
+    points = await timeseries.query(db, "directory", "month", datetime(2024, 5, 1), datetime(2024, 5, 31))
+    assert points == [{"start": "2024-05-01", "count": 2}]
+    assert await timeseries.query(db, "family_directory", "week", datetime(2024, 5, 1), datetime(2024, 5, 1)) == [
+        {"start": "2024-04-29", "count": 0}
+    ]
+
+@pytest.mark.asyncio
+async def test_timeseries_endpoint_validates_range():
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            backwards = await client.get("/api/analytics/timeseries", params={"start": "2024-05-02", "end": "2024-05-01"})
+            too_long = await client.get("/api/analytics/timeseries", params={"granularity": "day", "start": "2020-01-01", "end": "2024-01-01"})
+        assert backwards.status_code == 400
+        assert too_long.status_code == 400
+        assert "coarser" in too_long.json()["detail"]
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
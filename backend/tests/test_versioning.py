@@ -0,0 +1,94 @@
+from datetime import datetime
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+from httpx import AsyncClient
+from app.main import app
+from app.reference import reference_data
+from app.auth import get_current_admin_user
+from app.database import database
+from app.versioning import version_filter, not_modified
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    monkeypatch.setattr(database, "database", mongomock_motor.AsyncMongoMockClient()["versioning_test"])
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+def test_preconditions():
+    assert version_filter(None) == {}
+    assert version_filter("*") == {}
+    assert version_filter('"3", "4"') == {"version": {"$in": [3, 4]}}
+    # Weak tags never satisfy If-Match
+    assert version_filter('W/"3"') == {"version": {"$in": []}}
+    assert version_filter('"3"', expected_version=5) == {"version": 5}
+    assert not_modified('W/"3"', 3)
+    assert not not_modified('"2"', 3)
+    assert not not_modified(None, 3)
+
+@pytest.mark.asyncio
+async def test_stale_write_is_rejected(client):
+    result = await database.database.directory.insert_one({"full_name": "Ali Raza", "version": 1})
+    url = f"/api/directory/{result.inserted_id}"
+
+    response = await client.put(url, json={"city": "Lahore"}, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+
+    # A second admin still holding version 1 must not overwrite the first edit
+    response = await client.put(url, json={"city": "Multan"}, headers={"If-Match": '"1"'})
+    assert response.status_code == 412
+    assert response.headers["ETag"] == '"2"'
+    response = await client.put(url, json={"city": "Multan", "version": 1})
+    assert response.status_code == 412
+
+    stored = await database.database.directory.find_one({"_id": result.inserted_id})
+    # Stored as a reference data code since the first write
+    assert reference_data.name(stored["city"]) == "Lahore" and stored["version"] == 2
+
+    response = await client.put(f"/api/directory/{ObjectId()}", json={"city": "Multan"}, headers={"If-Match": '"1"'})
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_family_etag_revalidation(client):
+    family = {
+        "head_of_family_name": "Imran Arain",
+        "family_members": [{"member_id": "m1", "name": "Imran", "age": 40, "gender": "male", "relation": "father"}],
+        "total_members": 1,
+        "address": "12 Canal Road, Lahore",
+        "city": "Lahore",
+        "district": "Lahore",
+        "province": "Punjab",
+        "country": "Pakistan",
+        "phone": "+923001234567",
+        "caste": "Arain",
+        "postal_code": None,
+        "email": None,
+        "notes": None,
+        "family_photo": None,
+        "membership_type": "member",
+        "created_at": datetime(2024, 5, 1),
+        "updated_at": datetime(2024, 5, 1),
+        "version": 1,
+    }
+    result = await database.database.family_directory.insert_one(family)
+    url = f"/api/directory/family/{result.inserted_id}"
+
+    response = await client.get(url)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"1"'
+    assert (await client.get(url, headers={"If-None-Match": '"1"'})).status_code == 304
+
+    response = await client.patch(f"{url}/members/m1", json={"age": 41}, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.json()["data"]["version"] == 2
+
+    assert (await client.get(url, headers={"If-None-Match": '"1"'})).status_code == 200
+    response = await client.put(url, json={"city": "Multan"}, headers={"If-Match": '"1"'})
+    assert response.status_code == 412
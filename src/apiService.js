@@ -189,3 +189,14 @@ export const getCommunityStrength = async () => {
     throw error;
   }
 };
+
+// EventSource can't send the Authorization header, so the live feed is opened with a single-use ticket
+export const getLiveTicket = async () => {
+  try {
+    const response = await apiClient.post('/admin/live/ticket');
+    return response.data.data.ticket;
+  } catch (error) {
+    console.error('Error fetching live ticket:', error);
+    throw error;
+  }
+};
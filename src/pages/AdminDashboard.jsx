@@ -44,7 +44,8 @@ import {
   deleteMember as deleteMemberAPI, 
   deleteContactMessage,
   loginAdmin,
-  getCommunityStrength
+  getCommunityStrength,
+  getLiveTicket
 } from '../apiService';
 
 const { Option } = Select;
@@ -154,6 +155,73 @@ const AdminDashboard = ({ language = 'en', setLanguage = () => {} }) => {
     }
   }, [isLoggedIn]);
 
+  // Counters and new contact messages are pushed by the server instead of re-fetched
+  useEffect(() => {
+    const token = localStorage.getItem('admin_token');
+    if (!isLoggedIn || !token) {
+      return undefined;
+    }
+
+    const statCounters = {
+      'Directory Members': 'directory_total',
+      'Contact Messages': 'contact_total',
+      'Community Strength': 'community_strength',
+      'Admin Users': 'admin_users',
+      'Auth Users': 'users_total'
+    };
+
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    // A ticket opens one stream, so every (re)connect fetches a new one instead of letting EventSource retry
+    const connect = async () => {
+      let ticket;
+      try {
+        ticket = await getLiveTicket();
+      } catch (error) {
+        retry = setTimeout(connect, 5000);
+        return;
+      }
+      if (closed) {
+        return;
+      }
+      source = new EventSource(`/api/admin/live?ticket=${encodeURIComponent(ticket)}`);
+
+      source.addEventListener('counters', (event) => {
+        const { counters } = JSON.parse(event.data);
+        setStats((current) => current.map((stat) => {
+          const value = counters[statCounters[stat.title]];
+          return value === undefined ? stat : { ...stat, value };
+        }));
+      });
+
+      source.addEventListener('contact_message', (event) => {
+        const { message } = JSON.parse(event.data);
+        setContactMessages((current) => [message, ...current]);
+        notification.info({
+          message: 'New contact message',
+          description: `${message.name}: ${message.subject}`
+        });
+      });
+
+      source.onerror = () => {
+        source.close();
+        retry = setTimeout(connect, 5000);
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) {
+        source.close();
+      }
+    };
+  }, [isLoggedIn]);
+
 
   const handleLogin = async (values) => {
     try {